@@ -0,0 +1,89 @@
+"""
+Benchmark: so sánh các ASYNC_MODE (threading / eventlet / gevent)
+Với mỗi mode: start server, mở N connection websocket, rồi đo
+latency round-trip create_room → room_created (p50/p99),
+cùng số thread và RSS của process server.
+
+Chạy: python benchmarks/bench_async_modes.py [--clients 200] [--probes 5]
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+import socketio
+
+sys.path.insert(0, os.path.dirname(__file__))
+from server_process import ServerProcess, percentile
+
+
+def connect_clients(url, count, timeout):
+    clients = []
+    for _ in range(count):
+        client = socketio.Client(reconnection=False)
+        try:
+            client.connect(url, transports=['websocket'], wait_timeout=timeout)
+            clients.append(client)
+        except Exception:
+            break
+    return clients
+
+
+def probe_latency(clients, probes):
+    latencies = []
+    for client in clients:
+        got = threading.Event()
+        client.on('room_created', lambda data, ev=got: ev.set())
+        for _ in range(probes):
+            got.clear()
+            start = time.perf_counter()
+            client.emit('create_room', {})
+            if got.wait(5):
+                latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run_mode(mode, n_clients, probes):
+    with ServerProcess(env={'ASYNC_MODE': mode}) as server:
+        idle = server.stats()
+        clients = connect_clients(server.url, n_clients, timeout=5)
+        time.sleep(0.5)
+        loaded = server.stats()
+        latencies = probe_latency(clients, probes)
+        for client in clients:
+            client.disconnect()
+    return {
+        'mode': mode,
+        'connected': len(clients),
+        'threads_idle': idle.get('threads', 0),
+        'threads_loaded': loaded.get('threads', 0),
+        'rss_mb': loaded.get('rss_mb', 0.0),
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--probes', type=int, default=5)
+    parser.add_argument('--modes', default='threading,eventlet,gevent')
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} | {'conns':>6} | {'thr idle':>8} | {'thr load':>8} | "
+          f"{'RSS MB':>7} | {'p50 ms':>7} | {'p99 ms':>7}")
+    print("-" * 72)
+    for mode in args.modes.split(','):
+        if mode != 'threading' and importlib.util.find_spec(mode) is None:
+            print(f"{mode:>10} | not installed (pip install {mode})")
+            continue
+        r = run_mode(mode, args.clients, args.probes)
+        print(f"{r['mode']:>10} | {r['connected']:>6} | {r['threads_idle']:>8} | "
+              f"{r['threads_loaded']:>8} | {r['rss_mb']:>7.1f} | "
+              f"{r['p50_ms']:>7.2f} | {r['p99_ms']:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
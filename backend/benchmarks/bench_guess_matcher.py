@@ -0,0 +1,87 @@
+"""
+Benchmark: guess matcher on the chat hot path
+So sánh cách cũ (strip().lower() cả 2 phía mỗi tin nhắn, chỉ khớp tuyệt đối)
+với GuessMatcher (từ khóa chuẩn hoá 1 lần, exact/close/miss) trên một luồng
+đoán trộn: đúng, không dấu, sai 1 ký tự, sai hẳn và câu chat dài.
+
+Chạy: python benchmarks/bench_guess_matcher.py [--rate 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.guess_matcher import GuessMatcher, GUESS_EXACT, GUESS_CLOSE
+
+WORDS = ['Con Mèo', 'Máy bay', 'Điện thoại', 'elephant', 'Bánh mì', 'Cầu vồng', 'giraffe']
+GUESSES_PER_WORD = 2000
+
+
+def make_guesses(word, rng):
+    plain = word.lower()
+    typo = plain[:-1] + ('x' if plain[-1] != 'x' else 'y')
+    chat = "haha không biết vẽ gì luôn á, chắc là con gì đó có bốn chân"
+    pool = [plain, plain.upper(), typo, 'cái bàn', chat, 'ok', word]
+    return [rng.choice(pool) for _ in range(GUESSES_PER_WORD)]
+
+
+def old_check(current_word, guess):
+    return guess.strip().lower() == current_word.strip().lower()
+
+
+def bench(fn, words, guesses):
+    latencies = []
+    for word, batch in zip(words, guesses):
+        state = fn(word)
+        for guess in batch:
+            start = time.perf_counter()
+            state(guess)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    total = sum(latencies)
+    return len(latencies) / total, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rate', type=int, default=10_000, help='target guesses/sec to check against')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    guesses = [make_guesses(word, rng) for word in WORDS]
+
+    def old(word):
+        return lambda guess: old_check(word, guess)
+
+    def new(word):
+        matcher = GuessMatcher(word)
+        return matcher.match
+
+    print(f"{'matcher':>14} | {'guesses/s':>10} | {'p50 us':>7} | {'p99 us':>7}")
+    print("-" * 48)
+    for name, fn in (('strip().lower', old), ('GuessMatcher', new)):
+        rate, p50, p99 = bench(fn, WORDS, guesses)
+        print(f"{name:>14} | {rate:>10.0f} | {p50 * 1e6:>7.2f} | {p99 * 1e6:>7.2f}")
+
+    # Kết quả thực tế trên luồng đoán (để thấy close/exact được nhận ra)
+    counts = {}
+    for word, batch in zip(WORDS, guesses):
+        matcher = GuessMatcher(word)
+        for guess in batch:
+            result = matcher.match(guess)
+            counts[result] = counts.get(result, 0) + 1
+    print(f"results: {counts}")
+
+    rate, _, _ = bench(new, WORDS, guesses)
+    budget = 1e6 / args.rate
+    print(f"CPU per guess {1e6 / rate:.2f} us = {100 * args.rate / rate:.1f}% of one core at {args.rate} guesses/s")
+    if rate < args.rate:
+        print(f"FAIL: below {args.rate} guesses/s ({budget:.0f} us budget)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark: chat handler latency with logging off / sync / async
+Đo chat_handler.process_message (đường đoán từ, log 'guess' mỗi tin nhắn) khi:
+
+- off:          LOG_LEVEL=INFO → dòng debug bị bỏ ngay khi so level
+- print (old):  print() nhiều field ra stdout (chuyển vào file) như trước đây
+- sync json:    format JSON + ghi file ngay trong thread handler
+- async json:   configure_logging: chỉ append tuple vào deque, thread nền ghi file
+- async 1%:     như trên + LOG_SAMPLE=chat.guess=0.01
+
+Benchmark chạy handler hết tốc lực: trên 1 CPU thread ghi log không theo kịp
+nên một phần record bị bỏ (cột dropped) — đúng thiết kế, handler không bao giờ chờ.
+
+Chạy: python benchmarks/bench_logging.py [--messages 20000] [--threads 4]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from storage import data_store
+from handlers import room_handler, chat_handler, game_handler
+from utils import logger as event_log
+
+PLAYERS = 8
+
+
+def setup_room():
+    data_store.clear_all()
+    room_id = room_handler.create_room('host')
+    for i in range(PLAYERS):
+        room_handler.add_player_to_room(room_id, 'host' if i == 0 else f"p{i}", f"Player {i}")
+    game_handler.start_game(room_id)
+    game_handler.start_round(room_id)
+    game = data_store.get_game(room_id)
+    drawer = game.drawer_id
+    return [f"p{i}" for i in range(1, PLAYERS) if f"p{i}" != drawer]
+
+
+def old_print_then_process(player_id, message):
+    # Dòng "[GUESS DEBUG]" cũ: print đồng bộ trong handler
+    player = data_store.get_player(player_id)
+    game = data_store.get_game(player.room_id)
+    print("[GUESS DEBUG]", "room:", player.room_id, "| player:", player.name,
+          "| guess:", repr(message), "| current_word:", repr(game.current_word),
+          "| state:", game.state, "| timer:", game.timer)
+    return chat_handler.process_message(player_id, message)
+
+
+def run(fn, guessers, messages, threads):
+    latencies = [[] for _ in range(threads)]
+
+    def worker(index):
+        out = latencies[index]
+        for n in range(index, messages, threads):
+            player_id = guessers[n % len(guessers)]
+            start = time.perf_counter()
+            fn(player_id, f"wrong guess {n}")
+            out.append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    merged = sorted(x for chunk in latencies for x in chunk)
+    return messages / elapsed, merged[len(merged) // 2], merged[int(len(merged) * 0.99)]
+
+
+class SyncWriter:
+    """Ghi ngay trong thread gọi (để so sánh với LogWriter)."""
+    dropped = 0
+
+    def __init__(self, path):
+        self.stream = open(path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+
+    def put(self, record):
+        line = event_log.format_record(record) + '\n'
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--messages', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    guessers = setup_room()
+    tmpdir = tempfile.mkdtemp(prefix='bench_logging_')
+    path = os.path.join(tmpdir, 'log.jsonl')
+    process = chat_handler.process_message
+
+    print(f"{args.messages} messages, {args.threads} handler threads, {os.cpu_count()} CPU(s)")
+    print(f"{'mode':>12} | {'msgs/s':>8} | {'p50 us':>7} | {'p99 us':>7} | {'log lines':>9} | {'dropped':>7}")
+    print("-" * 66)
+
+    def report(name, result, dropped=0):
+        rate, p50, p99 = result
+        lines = 0
+        if os.path.exists(path):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                lines = sum(1 for _ in f)
+            os.remove(path)
+        print(f"{name:>12} | {rate:>8.0f} | {p50 * 1e6:>7.1f} | {p99 * 1e6:>7.1f} | {lines:>9} | {dropped:>7}")
+
+    def run_async(**options):
+        event_log.configure_logging(level='DEBUG', path=path, **options)
+        result = run(process, guessers, args.messages, args.threads)
+        dropped = event_log.dropped_count()
+        event_log.shutdown_logging()
+        return result, dropped
+
+    event_log.configure_logging(level='INFO', path=path)
+    report('off', run(process, guessers, args.messages, args.threads))
+    event_log.shutdown_logging()
+
+    # stdout cũ: print từ nhiều thread vào cùng 1 TextIOWrapper (không thread-safe)
+    with open(path, 'w', encoding='utf-8') as out, contextlib.redirect_stdout(out):
+        result = run(old_print_then_process, guessers, args.messages, args.threads)
+    report('print (old)', result)
+
+    event_log.configure_logging(level='DEBUG', path=path)
+    event_log.shutdown_logging()
+    event_log._writer = SyncWriter(path)
+    result = run(process, guessers, args.messages, args.threads)
+    event_log.shutdown_logging()
+    report('sync json', result)
+
+    report('async json', *run_async())
+    report('async 1%', *run_async(sample_rates=event_log.parse_sample_rates('chat.guess=0.01')))
+
+    event_log.reset_logging()
+    os.rmdir(tmpdir)
+    data_store.clear_all()
+
+
+if __name__ == '__main__':
+    main()
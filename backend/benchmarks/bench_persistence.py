@@ -0,0 +1,102 @@
+"""
+Benchmark: khôi phục state sau restart (STATE_BACKEND_URL=file:///dir)
+Đổ N phòng (2 player + 1 game mỗi phòng) vào PersistentBackend rồi đo:
+- journal: thời gian ghi + flush, thời gian replay toàn bộ journal
+- snapshot: thời gian giữ store lock (pause) và tổng thời gian ghi
+- recovery từ snapshot (+ journal rỗng), so với pickle cả 3 dict
+- restart-to-serving: start server thật trên thư mục đó tới khi trả lời HTTP
+
+Chạy: python benchmarks/bench_persistence.py [--rooms 50000] [--no-server]
+"""
+import argparse
+import gc
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from models.game import Game
+from models.player import Player
+from models.room import Room
+from storage.persistence import PersistentBackend, FSYNC_BATCH
+from server_process import ServerProcess
+
+
+def populate(backend, rooms):
+    for i in range(rooms):
+        room_id = f"R{i:05d}"
+        host, guest = f"sid_{i}_a", f"sid_{i}_b"
+        room = Room(room_id, host)
+        room.add_player(guest)
+        backend.add_room(room)
+        backend.add_player(Player(host, f"Host {i}", room_id))
+        backend.add_player(Player(guest, f"Guest {i}", room_id))
+        game = Game(room_id)
+        game.start_game([host, guest])
+        game.start_round([host, guest], ['apple'])
+        backend.add_game(game)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=50_000)
+    parser.add_argument('--no-server', action='store_true', help='skip the restart-to-serving measurement')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='drawguess-state-')
+    try:
+        backend = PersistentBackend(directory, fsync=FSYNC_BATCH)
+        _, fill = timed(populate, backend, args.rooms)
+        _, flush = timed(backend.flush)
+        journal_bytes = backend.journal.bytes
+        backend.close()
+        print(f"rooms={args.rooms} players={2 * args.rooms} games={args.rooms}")
+        print(f"journal: {journal_bytes / 1e6:.1f} MB, fill {fill:.2f}s (incl. encode), flush {flush * 1000:.0f} ms")
+
+        replayed, replay = timed(PersistentBackend, directory, fsync=FSYNC_BATCH)
+        print(f"recovery from journal: {replay:.2f}s ({replayed.recovery['records']} records)")
+
+        info = replayed.snapshot()
+        replayed.close()
+        del replayed
+        gc.collect()
+        print(f"snapshot: {info['bytes'] / 1e6:.1f} MB, store lock held {info['paused'] * 1000:.0f} ms, "
+              f"total {info['seconds']:.2f}s")
+
+        restored, recovery = timed(PersistentBackend, directory, fsync=FSYNC_BATCH)
+        print(f"recovery from snapshot: {recovery:.2f}s")
+
+        state = (restored.rooms, restored.players, restored.games)
+        blob, dump = timed(pickle.dumps, state, pickle.HIGHEST_PROTOCOL)
+        _, load = timed(pickle.loads, blob)
+        print(f"pickle baseline: {len(blob) / 1e6:.1f} MB, dump {dump:.2f}s, load {load:.2f}s")
+        restored.close()
+
+        del restored, state
+        gc.collect()
+
+        if not args.no_server:
+            empty = tempfile.mkdtemp(prefix='drawguess-empty-')
+            for label, path in (('empty store', empty), ('restored', directory)):
+                server = ServerProcess(env={'STATE_BACKEND_URL': f"file://{path}"})
+                _, serving = timed(server.start, timeout=60)
+                server.stop()
+                print(f"restart-to-serving, {label} (python src/app.py): {serving:.2f}s")
+            shutil.rmtree(empty, ignore_errors=True)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark: per-room actors vs handler threads mutating state directly
+1000 phòng đang chơi, tải trộn: nét vẽ (~60%), chat/đoán (~30%), tick timer (~10%).
+
+- direct: N thread "handler" tự chạy thao tác (như trước khi có RoomExecutor),
+  chỉ dựa vào lock của data_store
+- actors: N thread handler chỉ submit vào RoomExecutor, W worker chạy
+
+In ra throughput (ops/s), latency submit → chạy xong (p50/p99) và kiểm tra
+thứ tự trong từng phòng.
+
+Chạy: python benchmarks/bench_room_actors.py [--rooms 1000] [--ops 200000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from storage import data_store
+from handlers import room_handler, chat_handler, game_handler
+from handlers.stroke_buffer import StrokeBuffer
+from handlers.stroke_log import StrokeLogStore
+from utils.room_executor import RoomExecutor
+
+PLAYERS_PER_ROOM = 4
+PRODUCERS = 16
+
+
+def setup_rooms(rooms):
+    data_store.clear_all()
+    room_ids = []
+    for r in range(rooms):
+        host = f"h{r}"
+        room_id = room_handler.create_room(host)
+        for p in range(PLAYERS_PER_ROOM):
+            room_handler.add_player_to_room(room_id, host if p == 0 else f"p{r}_{p}", f"P{p}")
+        game_handler.start_game(room_id)
+        game_handler.start_round(room_id)
+        room_ids.append(room_id)
+    return room_ids
+
+
+def make_ops(room_ids, total, seed=1):
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(total):
+        room_id = rng.choice(room_ids)
+        roll = rng.random()
+        if roll < 0.6:
+            ops.append(('draw', room_id, {'type': 'move', 'x': rng.randint(0, 799), 'y': rng.randint(0, 599)}))
+        elif roll < 0.9:
+            guesser = f"p{room_ids.index(room_id)}_{rng.randint(1, PLAYERS_PER_ROOM - 1)}"
+            ops.append(('chat', room_id, guesser))
+        else:
+            ops.append(('timer', room_id, rng.randint(0, 90)))
+    return ops
+
+
+class Workload:
+    def __init__(self):
+        self.stroke_buffer = StrokeBuffer()
+        self.stroke_log = StrokeLogStore()
+        self.last_seq = {}
+        self.order_errors = 0
+        self.latencies = []
+        self._lat_lock = threading.Lock()
+
+    def run(self, op, seq, submitted_at):
+        kind, room_id, arg = op
+        if kind == 'draw':
+            self.stroke_log.append(room_id, arg)
+            self.stroke_buffer.append(room_id, 'drawer', arg)
+        elif kind == 'chat':
+            chat_handler.process_message(arg, 'wrong guess')
+        else:
+            game_handler.update_timer(room_id, arg)
+        # Mỗi producer submit seq tăng dần → trong 1 phòng phải chạy đúng thứ tự
+        key = (room_id, seq[0])
+        if self.last_seq.get(key, -1) > seq[1]:
+            self.order_errors += 1
+        self.last_seq[key] = seq[1]
+        with self._lat_lock:
+            self.latencies.append(time.perf_counter() - submitted_at)
+
+
+def run_direct(ops):
+    work = Workload()
+    chunks = [ops[i::PRODUCERS] for i in range(PRODUCERS)]
+
+    def producer(index, chunk):
+        for n, op in enumerate(chunk):
+            work.run(op, (index, n), time.perf_counter())
+
+    return work, _run_producers(producer, chunks)
+
+
+def run_actors(ops, workers):
+    work = Workload()
+    executor = RoomExecutor(workers=workers)
+    chunks = [ops[i::PRODUCERS] for i in range(PRODUCERS)]
+
+    def producer(index, chunk):
+        for n, op in enumerate(chunk):
+            executor.submit(op[1], work.run, op, (index, n), time.perf_counter())
+
+    elapsed = _run_producers(producer, chunks, after=executor.wait_idle)
+    return work, elapsed
+
+
+def _run_producers(producer, chunks, after=None):
+    threads = [threading.Thread(target=producer, args=(i, chunk)) for i, chunk in enumerate(chunks)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if after:
+        after()
+    return time.perf_counter() - start
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--ops', type=int, default=200_000)
+    args = parser.parse_args()
+
+    # Nuốt output phụ (setup, lỗi task) trong lúc đo
+    with contextlib.redirect_stdout(io.StringIO()):
+        room_ids = setup_rooms(args.rooms)
+    ops = make_ops(room_ids, args.ops)
+
+    print(f"{args.rooms} rooms, {args.ops} ops, {PRODUCERS} producer threads, {os.cpu_count()} CPU(s)")
+    print(f"{'mode':>12} | {'ops/s':>9} | {'p50 ms':>7} | {'p99 ms':>7} | {'order err':>9}")
+    print("-" * 56)
+    runs = [('direct', lambda: run_direct(ops))]
+    runs += [(f"actors w={w}", lambda w=w: run_actors(ops, w)) for w in (1, 2, 4, 8)]
+    for name, fn in runs:
+        with contextlib.redirect_stdout(io.StringIO()):
+            work, elapsed = fn()
+        lat = work.latencies
+        print(f"{name:>12} | {len(ops) / elapsed:>9.0f} | {percentile(lat, 50) * 1e3:>7.2f} | "
+              f"{percentile(lat, 99) * 1e3:>7.2f} | {work.order_errors:>9}")
+    data_store.clear_all()
+
+
+if __name__ == '__main__':
+    main()
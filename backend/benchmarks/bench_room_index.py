@@ -0,0 +1,47 @@
+"""
+Benchmark: room lookups vs global player count
+Đo thời gian get_players_in_room khi tổng số player tăng dần.
+Với room index, latency phải gần như không đổi (O(players in room)).
+
+Chạy: python benchmarks/bench_room_index.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from storage import data_store
+from models.player import Player
+
+PLAYERS_PER_ROOM = 8
+LOOKUPS = 20000
+
+
+def populate(total_players):
+    data_store.clear_all()
+    for i in range(total_players):
+        room_id = f"R{i // PLAYERS_PER_ROOM:05d}"
+        data_store.add_player(Player(f"sid_{i}", f"Player {i}", room_id))
+
+
+def bench(total_players):
+    populate(total_players)
+    room_ids = [f"R{i:05d}" for i in range(total_players // PLAYERS_PER_ROOM)]
+    start = time.perf_counter()
+    for n in range(LOOKUPS):
+        data_store.get_players_in_room(room_ids[n % len(room_ids)])
+    elapsed = time.perf_counter() - start
+    return elapsed / LOOKUPS * 1e6
+
+
+def main():
+    print(f"{'players':>10} | {'us/lookup':>10}")
+    print("-" * 24)
+    for total in (1_000, 10_000, 50_000, 100_000):
+        print(f"{total:>10} | {bench(total):>10.2f}")
+    data_store.clear_all()
+
+
+if __name__ == '__main__':
+    main()
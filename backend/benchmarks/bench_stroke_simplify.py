@@ -0,0 +1,94 @@
+"""
+Benchmark: server-side stroke simplification
+Sinh nét vẽ tay giả lập (đường cong ngẫu nhiên, tốc độ thay đổi) ở 2 mức dày:
+- mouse: client throttle 16ms (~62 điểm/giây) như drawerCanvas.js
+- dense: ~240 điểm/giây (tablet / client không throttle)
+
+Với mỗi tolerance (tỉ lệ × brush size) in ra số điểm vào/ra, bytes JSON của
+canvas_update gửi cho mỗi viewer, sai số lớn nhất (pixel) và chi phí mỗi điểm.
+
+Chạy: python benchmarks/bench_stroke_simplify.py [--strokes 200] [--brush 5]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from handlers.stroke_simplifier import StrokeSimplifier, _segment_distance
+
+
+def make_strokes(count, points_per_second, rng):
+    strokes = []
+    for _ in range(count):
+        x, y = rng.uniform(100, 700), rng.uniform(100, 500)
+        angle = rng.uniform(0, 2 * math.pi)
+        turn = 0.0
+        events = [{'type': 'start', 'x': round(x, 2), 'y': round(y, 2)}]
+        duration = rng.uniform(0.3, 2.0)
+        for _ in range(int(duration * points_per_second)):
+            speed = rng.uniform(150, 900)          # pixel/giây
+            turn = 0.8 * turn + rng.uniform(-0.6, 0.6)
+            angle += turn * (60 / points_per_second)
+            step = speed / points_per_second
+            x = min(800, max(0, x + step * math.cos(angle) + rng.gauss(0, 0.3)))
+            y = min(600, max(0, y + step * math.sin(angle) + rng.gauss(0, 0.3)))
+            events.append({'type': 'move', 'x': round(x, 2), 'y': round(y, 2)})
+        events.append({'type': 'end'})
+        strokes.append(events)
+    return strokes
+
+
+def run(strokes, tolerance, brush):
+    simplifier = StrokeSimplifier(tolerance=tolerance)
+    simplifier.process('ROOM', 'drawer', {'type': 'brush_size', 'size': brush})
+    out_bytes = 0
+    max_error = 0.0
+    elapsed = 0.0
+    for events in strokes:
+        start = time.perf_counter()
+        out = []
+        for event in events:
+            out += simplifier.process('ROOM', 'drawer', event)
+        elapsed += time.perf_counter() - start
+
+        out_bytes += len(json.dumps(out, separators=(',', ':')))
+        line = [(e['x'], e['y']) for e in out if e['type'] in ('start', 'move')]
+        for event in events[1:-1]:
+            error = min(_segment_distance(event['x'], event['y'], a, b) for a, b in zip(line, line[1:]))
+            max_error = max(max_error, error)
+    stats = simplifier.stats()
+    return stats['points_in'], stats['points_out'], out_bytes, max_error, elapsed / max(1, stats['points_in'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--strokes', type=int, default=200)
+    parser.add_argument('--brush', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.strokes} strokes, brush {args.brush}px")
+    print(f"{'input':>6} | {'tol':>5} | {'pts in':>7} | {'pts out':>7} | {'out %':>6} | "
+          f"{'KB out':>7} | {'max err px':>10} | {'us/pt':>6}")
+    print('-' * 76)
+    for name, rate in (('mouse', 62), ('dense', 240)):
+        strokes = make_strokes(args.strokes, rate, random.Random(args.seed))
+        for tolerance in (0, 0.25, 0.5, 1.0):
+            points_in, points_out, out_bytes, max_error, per_point = run(strokes, tolerance, args.brush)
+            cost = f"{per_point * 1e6:>6.2f}"
+            if tolerance == 0:
+                # Tắt: process() trả lại nguyên event, không đếm điểm
+                points_in = points_out = sum(len(events) - 2 for events in strokes)
+                cost = f"{'-':>6}"
+            print(f"{name:>6} | {tolerance:>5} | {points_in:>7} | {points_out:>7} | "
+                  f"{points_out / points_in * 100:>5.1f}% | {out_bytes / 1024:>7.1f} | "
+                  f"{max_error:>10.2f} | {cost}")
+
+
+if __name__ == '__main__':
+    main()
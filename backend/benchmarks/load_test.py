@@ -0,0 +1,370 @@
+"""
+Load Generator
+Mô phỏng N phòng × M người chơi trên localhost: vẽ (Hz cấu hình được),
+chat/đoán từ, churn join/leave; báo cáo throughput, latency
+drawing_move → canvas_update (p50/p95/p99), số message nhận theo event,
+CPU và RSS của server. Replay cho người vào giữa round (canvas_replay) được
+đếm riêng, không tính vào latency.
+
+Chạy:
+    python benchmarks/load_test.py --rooms 10 --players 5 --duration 20
+    python benchmarks/load_test.py --url http://127.0.0.1:5000   # server có sẵn
+    python benchmarks/load_test.py --max-p99-ms 50                # gate CI (exit 1)
+"""
+import argparse
+import collections
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+import socketio
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from server_process import ServerProcess, percentile
+from utils.stroke_codec import decode_events
+
+CANVAS_WIDTH = 800
+CANVAS_HEIGHT = 600
+POINTS_PER_STROKE = 30
+# Nét lượn sóng (không thẳng hàng) để stroke simplifier không bỏ gần hết điểm
+POINT_STEP = 4         # px theo trục x giữa 2 điểm
+WAVE_AMPLITUDE = 12    # px
+WAVE_STEP = 2.0        # rad mỗi điểm (~3 điểm mỗi chu kỳ → simplifier giữ ~90%)
+ROW_HEIGHT = 2 * WAVE_AMPLITUDE + 6
+GUESS_WORDS = ['con mèo', 'con chó', 'ngôi nhà', 'mặt trời', 'quả táo']
+
+
+class Stats:
+    """Counters shared by every simulated client (thread-safe)."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = collections.Counter()
+        self.received = collections.Counter()
+        self.canvas_events = 0
+        self.replayed_events = 0
+        self.latencies_ms = []
+        self.pending = {}  # (room_id, x, y) -> perf_counter khi gửi
+        self.errors = collections.Counter()
+
+    def on_sent(self, event):
+        with self.lock:
+            self.sent[event] += 1
+
+    def on_received(self, event):
+        with self.lock:
+            self.received[event] += 1
+
+
+class SimPlayer:
+    """
+    One simulated browser
+
+    Attributes:
+        client (socketio.Client): Underlying client
+        room_id (str): Joined room
+        is_drawer (bool): Whether this player draws the current round
+        word (str): Current word (drawer only)
+    """
+    def __init__(self, url, stats, name):
+        self.url = url
+        self.stats = stats
+        self.name = name
+        self.room_id = None
+        self.is_drawer = False
+        self.word = None
+        self.joined = threading.Event()
+        self.created = threading.Event()
+        self.client = socketio.Client(reconnection=False)
+        self._register()
+
+    def _register(self):
+        c = self.client
+        stats = self.stats
+
+        @c.on('room_created')
+        def on_room_created(data):
+            stats.on_received('room_created')
+            self.room_id = data['room_id']
+            self.created.set()
+
+        @c.on('room_joined')
+        def on_room_joined(data):
+            stats.on_received('room_joined')
+            self.joined.set()
+
+        @c.on('round_started')
+        def on_round_started(data):
+            stats.on_received('round_started')
+            self.is_drawer = bool(data.get('is_drawer'))
+            self.word = data.get('word')
+
+        @c.on('round_ended')
+        def on_round_ended(data):
+            stats.on_received('round_ended')
+            self.is_drawer = False
+
+        @c.on('canvas_update')
+        def on_canvas_update(data):
+            stats.on_received('canvas_update')
+            self._record_canvas(data)
+
+        @c.on('canvas_replay')
+        def on_canvas_replay(data):
+            stats.on_received('canvas_replay')
+            events = decode_events(data) if isinstance(data, (bytes, bytearray)) else data
+            with stats.lock:
+                stats.replayed_events += len(events)
+
+        @c.on('error')
+        def on_error(data):
+            stats.errors[(data or {}).get('message', '?')] += 1
+
+        @c.on('*')
+        def on_any(event, *args):
+            stats.on_received(event)
+
+    def _record_canvas(self, data):
+        now = time.perf_counter()
+        if isinstance(data, (bytes, bytearray)):
+            events = decode_events(data)
+        else:
+            events = data if isinstance(data, list) else [data]
+        stats = self.stats
+        with stats.lock:
+            stats.canvas_events += len(events)
+            for event in events:
+                if not isinstance(event, dict) or event.get('type') != 'move':
+                    continue
+                sent_at = stats.pending.get((self.room_id, event.get('x'), event.get('y')))
+                if sent_at is not None:
+                    stats.latencies_ms.append((now - sent_at) * 1000)
+
+    def connect(self):
+        self.client.connect(self.url, transports=['websocket'], wait_timeout=10)
+
+    def emit(self, event, data=None):
+        try:
+            self.client.emit(event, data or {})
+        except socketio.exceptions.SocketIOError:
+            # Client vừa bị churn ngắt kết nối
+            self.stats.errors['emit_after_disconnect'] += 1
+            return
+        self.stats.on_sent(event)
+
+    def join(self, room_id):
+        self.room_id = room_id
+        self.joined.clear()
+        self.emit('join_room', {'room_id': room_id, 'player_name': self.name})
+        return self.joined.wait(10)
+
+    def disconnect(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+class SimRoom:
+    """A room with one host and M-1 guessers."""
+    def __init__(self, url, stats, index, players):
+        self.url = url
+        self.stats = stats
+        self.index = index
+        self.players = [SimPlayer(url, stats, f"R{index}P{i}") for i in range(players)]
+        self.room_id = None
+        self.seq = 0
+
+    @property
+    def host(self):
+        return self.players[0]
+
+    def setup(self):
+        for p in self.players:
+            p.connect()
+        self.host.emit('create_room')
+        if not self.host.created.wait(10):
+            raise RuntimeError('room_created not received')
+        self.room_id = self.host.room_id
+        for p in self.players:
+            p.join(self.room_id)
+
+    def start_game(self):
+        self.host.emit('start_game', {'room_id': self.room_id})
+
+    def drawer(self):
+        for p in self.players:
+            if p.is_drawer:
+                return p
+        return None
+
+    def next_point(self):
+        # (x, y) duy nhất trong phòng (mỗi hàng 1 dải riêng) → dùng làm khoá đo latency
+        self.seq += 1
+        per_row = CANVAS_WIDTH // POINT_STEP
+        row = self.seq // per_row % (CANVAS_HEIGHT // ROW_HEIGHT)
+        x = self.seq % per_row * POINT_STEP
+        y = row * ROW_HEIGHT + WAVE_AMPLITUDE + round(WAVE_AMPLITUDE * math.sin(self.seq * WAVE_STEP))
+        return x, y
+
+
+def draw_loop(room, hz, stop):
+    interval = 1.0 / hz
+    stats = room.stats
+    while not stop.is_set():
+        drawer = room.drawer()
+        if not drawer:
+            time.sleep(0.1)
+            continue
+        x, y = room.next_point()
+        drawer.emit('drawing_start', {'x': x, 'y': y})
+        for _ in range(POINTS_PER_STROKE):
+            if stop.is_set():
+                break
+            x, y = room.next_point()
+            with stats.lock:
+                stats.pending[(room.room_id, x, y)] = time.perf_counter()
+            drawer.emit('drawing_move', {'x': x, 'y': y})
+            time.sleep(interval)
+        drawer.emit('drawing_end')
+
+
+def chat_loop(rooms, rate, correct_ratio, stop):
+    interval = 1.0 / rate if rate > 0 else None
+    while interval and not stop.is_set():
+        room = random.choice(rooms)
+        guessers = [p for p in room.players if not p.is_drawer]
+        drawer = room.drawer()
+        if guessers:
+            guess = random.choice(GUESS_WORDS)
+            if drawer and drawer.word and random.random() < correct_ratio:
+                guess = drawer.word
+            random.choice(guessers).emit('send_message', {'message': guess})
+        time.sleep(interval)
+
+
+def churn_loop(rooms, url, stats, rate, stop):
+    interval = 1.0 / rate if rate > 0 else None
+    counter = 0
+    while interval and not stop.is_set():
+        time.sleep(interval)
+        room = random.choice(rooms)
+        candidates = [p for p in room.players[1:] if not p.is_drawer]
+        if not candidates:
+            continue
+        leaving = random.choice(candidates)
+        leaving.emit('leave_room')
+        leaving.disconnect()
+        room.players.remove(leaving)
+
+        counter += 1
+        newcomer = SimPlayer(url, stats, f"R{room.index}C{counter}")
+        try:
+            newcomer.connect()
+            newcomer.join(room.room_id)
+            room.players.append(newcomer)
+        except Exception:
+            stats.errors['churn_connect'] += 1
+
+
+def run(args):
+    server = None
+    url = args.url
+    if not url:
+        server = ServerProcess()
+        server.start()
+        url = server.url
+
+    stats = Stats()
+    rooms = [SimRoom(url, stats, i, args.players) for i in range(args.rooms)]
+    stop = threading.Event()
+    try:
+        for room in rooms:
+            room.setup()
+            room.start_game()
+        time.sleep(0.5)
+
+        before = server.stats() if server else {}
+        t0 = time.perf_counter()
+        workers = [threading.Thread(target=draw_loop, args=(r, args.draw_hz, stop), daemon=True)
+                   for r in rooms]
+        workers.append(threading.Thread(
+            target=chat_loop, args=(rooms, args.chat_rate, args.correct_ratio, stop), daemon=True))
+        workers.append(threading.Thread(
+            target=churn_loop, args=(rooms, url, stats, args.churn_rate, stop), daemon=True))
+        for w in workers:
+            w.start()
+
+        time.sleep(args.duration)
+        stop.set()
+        for w in workers:
+            w.join(5)
+        time.sleep(0.3)  # cho các canvas_update cuối về tới nơi
+        elapsed = time.perf_counter() - t0
+        after = server.stats() if server else {}
+        # Báo cáo trước khi teardown để không tính room_closed/player_left lúc dọn dẹp
+        return report(stats, elapsed, before, after, args)
+    finally:
+        stop.set()
+        for room in rooms:
+            for p in room.players:
+                p.disconnect()
+        if server:
+            server.stop()
+
+
+def report(stats, elapsed, before, after, args):
+    lat = stats.latencies_ms
+    sent_total = sum(stats.sent.values())
+    print(f"\n=== Load test: {args.rooms} rooms x {args.players} players, "
+          f"{args.duration}s, draw {args.draw_hz} Hz ===")
+    print(f"client → server events : {sent_total} ({sent_total / elapsed:.0f}/s)")
+    print(f"canvas events delivered: {stats.canvas_events} "
+          f"in {stats.received['canvas_update']} canvas_update messages")
+    print(f"canvas events replayed : {stats.replayed_events} "
+          f"in {stats.received['canvas_replay']} canvas_replay messages (not in latency)")
+    print(f"drawing_move latency ms: p50={percentile(lat, 50):.2f} "
+          f"p95={percentile(lat, 95):.2f} p99={percentile(lat, 99):.2f} (n={len(lat)})")
+    if before and after:
+        cpu = after['cpu_seconds'] - before['cpu_seconds']
+        print(f"server CPU             : {cpu:.2f}s ({cpu / elapsed * 100:.0f}% of one core)")
+        print(f"server RSS / threads   : {after['rss_mb']:.1f} MB / {after['threads']}")
+    print("messages received by event:")
+    for event, count in stats.received.most_common():
+        print(f"  {event:<16} {count}")
+    if stats.errors:
+        print(f"errors: {dict(stats.errors)}")
+
+    if args.max_p99_ms:
+        # Không đủ mẫu thì p99 vô nghĩa → không cho gate qua
+        if len(lat) < max(1, args.min_samples):
+            print(f"FAIL: only {len(lat)} latency samples (< {args.min_samples})")
+            return 1
+        if percentile(lat, 99) > args.max_p99_ms:
+            print(f"FAIL: p99 {percentile(lat, 99):.2f}ms > {args.max_p99_ms}ms")
+            return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw & Guess load generator")
+    parser.add_argument('--url', help='Target an already running server')
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--players', type=int, default=5)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--draw-hz', type=float, default=60)
+    parser.add_argument('--chat-rate', type=float, default=20, help='messages/s overall')
+    parser.add_argument('--correct-ratio', type=float, default=0.05)
+    parser.add_argument('--churn-rate', type=float, default=1, help='leave+join/s overall')
+    parser.add_argument('--max-p99-ms', type=float, default=0,
+                        help='Exit 1 if drawing p99 latency exceeds this')
+    parser.add_argument('--min-samples', type=int, default=100,
+                        help='With --max-p99-ms: exit 1 if fewer latency samples were collected')
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
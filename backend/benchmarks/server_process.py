@@ -0,0 +1,99 @@
+"""
+Helpers để benchmark chạy server thật (python src/app.py) trên localhost
+và đọc CPU / RSS / số thread của process đó qua /proc.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP_PATH = os.path.join(BACKEND_DIR, 'src', 'app.py')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ServerProcess:
+    """
+    A locally started game server
+
+    Attributes:
+        port (int): Listening port
+        url (str): Base URL for socketio.Client
+        proc (subprocess.Popen): Server process
+    """
+    def __init__(self, port=None, env=None, quiet=True):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = dict(os.environ, PORT=str(self.port), FLASK_ENV='production')
+        self.env.update(env or {})
+        self.quiet = quiet
+        self.proc = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self, timeout=15):
+        out = subprocess.DEVNULL if self.quiet else None
+        self.proc = subprocess.Popen(
+            [sys.executable, APP_PATH], env=self.env, cwd=BACKEND_DIR,
+            stdout=out, stderr=out,
+        )
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"server exited with code {self.proc.returncode}")
+            try:
+                urllib.request.urlopen(self.url + '/', timeout=0.5).read()
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError("server did not start in time")
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    def stats(self):
+        """
+        Read process stats from /proc
+        Returns:
+            dict: {cpu_seconds, rss_mb, threads} (empty on non-Linux)
+        """
+        pid = self.proc.pid
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f"/proc/{pid}/status") as f:
+                status = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            return {}
+        return {
+            'cpu_seconds': (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+            'rss_mb': int(status['VmRSS'].split()[0]) / 1024,
+            'threads': int(status['Threads']),
+        }
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
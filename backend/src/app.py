@@ -2,40 +2,243 @@
 Main Flask Application with Socket.IO
 Entry point for the Draw & Guess game server
 """
+import atexit
+import hmac
 import os
-from flask import Flask, request
-from flask_socketio import SocketIO, emit, join_room, leave_room
-from flask_cors import CORS
+import signal
+import sys
+import tempfile
+import time
 from dotenv import load_dotenv
 
-# Import handlers
-from handlers import room_handler, drawing_handler, chat_handler, game_handler
-from storage import data_store
-from config.constants import ROUND_TIMER_SECONDS
 # Load environment variables
 load_dotenv()
 
+# Chọn async mode + monkey patch trước khi import flask/socketio
+from config.async_mode import select_async_mode
+ASYNC_MODE = select_async_mode()
+
+from flask import Flask, Response, request
+from flask_socketio import SocketIO, emit
+from flask_cors import CORS
+
+# Import handlers
+from handlers import room_handler, drawing_handler, chat_handler, game_handler, scoreboard
+from handlers.stroke_buffer import StrokeBuffer
+from handlers.stroke_log import StrokeLogStore
+from handlers.stroke_simplifier import StrokeSimplifier
+from handlers.reaper import Reaper, KIND_PLAYER, KIND_ROOM, KIND_GAME, parse_ttls
+from models.game import GameState
+from storage import data_store
+from storage.message_bus import create_client_manager
+from storage.persistence import PersistentBackend
+from utils.scheduler import Scheduler
+from utils.room_executor import RoomExecutor
+from utils.stroke_codec import encode_events, StrokeCodecError
+from utils.guess_matcher import GUESS_EXACT, GUESS_CLOSE
+from utils.logger import configure_logging, get_logger, parse_sample_rates
+from utils import metrics
+from utils.profiler import profiler, capture_path, MODES as PROFILE_MODES
+from utils.rate_limiter import RateLimiter, parse_limits
+from utils.resume_tokens import ResumeTokens
+from config.constants import (
+    ROUND_TIMER_SECONDS,
+    ROUNDS_PER_GAME,
+    MAX_ROUNDS_PER_GAME,
+    INTERMISSION_SECONDS,
+    MIN_PLAYERS_TO_START,
+    STROKE_FLUSH_INTERVAL_MS,
+    STROKE_ENCODING,
+    STROKE_SIMPLIFY_TOLERANCE,
+    ROOM_WORKERS,
+    JOURNAL_FLUSH_MS,
+    SNAPSHOT_INTERVAL_SECONDS,
+    SNAPSHOT_JOURNAL_BYTES,
+    RECONNECT_GRACE_SECONDS,
+    REAPER_INTERVAL_SECONDS,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+)
+
+# Log JSON lines qua thread nền → handler không bao giờ chờ ghi stdout/file
+configure_logging(
+    level=os.getenv('LOG_LEVEL', LOG_LEVEL),
+    path=os.getenv('LOG_FILE') or None,
+    sample_rates=parse_sample_rates(os.getenv('LOG_SAMPLE')),
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', LOG_QUEUE_SIZE)),
+)
+log = get_logger('server')
+
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 
+# Room ID = hoán vị có khoá của bộ đếm dùng chung (xem utils/room_ids.py)
+room_handler.configure_room_ids(
+    key=os.getenv('ROOM_ID_KEY') or app.config['SECRET_KEY'],
+    shard=(os.getenv('ROOM_ID_SHARD') or '').upper() or None,
+)
+
+# Resume session sau khi mất kết nối: token ký bằng SECRET_KEY, player được
+# giữ (connected=False) trong RECONNECT_GRACE_SECONDS trước khi bị xoá
+resume_tokens = ResumeTokens(app.config['SECRET_KEY'])
+RECONNECT_GRACE = float(os.getenv('RECONNECT_GRACE_SECONDS', RECONNECT_GRACE_SECONDS))
+
 # Enable CORS
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# Initialize SocketIO with threading mode
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Nhiều server process: emit đi qua message queue (unix://... hoặc redis://...)
+_client_manager, _message_queue = create_client_manager(os.getenv('MESSAGE_QUEUE_URL'))
+_queue_options = {}
+if _client_manager:
+    _queue_options['client_manager'] = _client_manager
+if _message_queue:
+    _queue_options['message_queue'] = _message_queue
+
+# Initialize SocketIO (threading / eventlet / gevent theo ASYNC_MODE)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE, **_queue_options)
+
+# Đếm packet/bytes gửi cho client theo event (GET /metrics)
+metrics.registry.instrument_engineio(socketio.server.eio)
+
+
+def socket_event(event):
+    """Như @socketio.on(event) + metrics: số lần gọi, lỗi, wall/CPU time của handler"""
+    def decorator(handler):
+        socketio.on(event)(metrics.registry.instrument_handler(event, handler))
+        return handler
+    return decorator
+
+# Một scheduler dùng chung cho mọi deadline (round timer, flush stroke...)
+# → số thread không tăng theo số phòng đang chơi
+scheduler = Scheduler(sleep=socketio.sleep)
+scheduler.bind(socketio.start_background_task)
+
+# Mỗi phòng một hàng đợi tuần tự (actor): đoán từ, tick timer, start game,
+# nét vẽ, clear... của cùng phòng không bao giờ chạy chồng lên nhau.
+# Pool worker cố định, không tăng theo số phòng.
+# guard: với store dùng chung, mỗi lô task của phòng chạy dưới lock của phòng
+# trên store → process khác không sửa cùng Room / Game xen vào
+room_actors = RoomExecutor(workers=int(os.getenv('ROOM_WORKERS', ROOM_WORKERS)),
+                           guard=data_store.room_lock)
+room_actors.bind(socketio.start_background_task)
+
+# Token bucket theo connection + theo phòng cho event vẽ/chat (trước khi broadcast)
+rate_limiter = RateLimiter(parse_limits(os.getenv('RATE_LIMITS')))
+
+# ================== STROKE BUFFER (canvas_update batching) ==================
+# 0 = tắt batching, mỗi event được emit ngay như cũ
+STROKE_FLUSH_INTERVAL = int(
+    os.getenv('STROKE_FLUSH_INTERVAL_MS', STROKE_FLUSH_INTERVAL_MS)
+) / 1000.0
+# "binary": gửi batch dưới dạng bytes (Socket.IO binary attachment)
+BINARY_STROKES = os.getenv('STROKE_ENCODING', STROKE_ENCODING).lower() == 'binary'
+stroke_buffer = StrokeBuffer()
+stroke_log = StrokeLogStore()
+# Bỏ điểm move thừa (sai số = tỉ lệ × brush size, 0 = tắt) trước khi broadcast
+stroke_simplifier = StrokeSimplifier(
+    tolerance=float(os.getenv('STROKE_SIMPLIFY_TOLERANCE', STROKE_SIMPLIFY_TOLERANCE))
+)
+_stroke_flush_job = None
+
+
+def _encode_canvas_payload(events):
+    """List event → bytes nếu bật binary strokes (fallback JSON nếu không mã hoá được)."""
+    if BINARY_STROKES:
+        try:
+            return encode_events(events)
+        except StrokeCodecError:
+            pass
+    return events
+
+
+def _emit_canvas_batches(room_id, batches):
+    """Emit các batch [(sender_id, events)] của 1 phòng, giữ nguyên thứ tự."""
+    for sender_id, events in batches:
+        socketio.emit(
+            'canvas_update', _encode_canvas_payload(events),
+            room=room_id, skip_sid=sender_id,
+        )
+
+
+def _flush_stroke_room(room_id, release_held=True):
+    """Flush ngay các event đang chờ của 1 phòng (vd: trước khi clear)."""
+    if release_held:
+        # Điểm simplifier còn giữ của nét đang vẽ
+        for sender_id, event_data in stroke_simplifier.release_room(room_id):
+            _forward_canvas_event(room_id, sender_id, event_data)
+    _emit_canvas_batches(room_id, stroke_buffer.drain_room(room_id))
+
+
+def _release_stroke_sender(room_id, sid):
+    """Gửi nốt điểm simplifier còn giữ của 1 player rồi bỏ state của họ."""
+    for event_data in stroke_simplifier.release_sender(room_id, sid):
+        _forward_canvas_event(room_id, sid, event_data)
+
+
+def _flush_all_strokes():
+    # Flush chạy trên actor của từng phòng → không chen ngang clear/join
+    for room_id in stroke_buffer.pending_rooms():
+        room_actors.submit(room_id, _flush_stroke_room, room_id, False)
+    # Nét đang giữ điểm quá lâu (drawer dừng tay giữa nét)
+    for room_id in stroke_simplifier.stale_rooms():
+        room_actors.submit(room_id, _flush_stroke_room, room_id)
+
+
+def _post_canvas_event(room_id, sender_id, event_data):
+    """Gửi canvas event của drawer vào hàng đợi của phòng."""
+    room_actors.submit(room_id, _queue_canvas_event, room_id, sender_id, event_data)
+
+
+def _queue_canvas_event(room_id, sender_id, event_data):
+    """
+    Đưa 1 canvas event của drawer qua simplifier rồi vào buffer của phòng
+    (chạy trên actor). Flusher gửi cả list dưới dạng 1 'canvas_update' mỗi tick.
+    """
+    global _stroke_flush_job
+
+    for forwarded in stroke_simplifier.process(room_id, sender_id, event_data):
+        _forward_canvas_event(room_id, sender_id, forwarded)
+
+    if _stroke_flush_job is None and (STROKE_FLUSH_INTERVAL > 0 or stroke_simplifier.enabled):
+        _stroke_flush_job = scheduler.call_every(
+            STROKE_FLUSH_INTERVAL if STROKE_FLUSH_INTERVAL > 0 else stroke_simplifier.max_hold_seconds,
+            _flush_all_strokes,
+        )
+
+
+def _forward_canvas_event(room_id, sender_id, event_data):
+    # Ghi lại cho người vào giữa round (replay)
+    stroke_log.append(room_id, event_data)
+
+    if STROKE_FLUSH_INTERVAL <= 0:
+        payload = _encode_canvas_payload([event_data]) if BINARY_STROKES else event_data
+        socketio.emit('canvas_update', payload, room=room_id, skip_sid=sender_id)
+        return
+
+    stroke_buffer.append(room_id, sender_id, event_data)
 
 # ================== GAME TIMER & ROUND HELPERS ==================
+# Game tự chạy hết các round: round → hết giờ / mọi người đoán đúng → nghỉ
+# INTERMISSION giây → round kế tiếp (drawer lần lượt theo thứ tự join) → ...
+# → 'game_ended'. Mọi bước là callback hẹn trên scheduler dùng chung rồi chạy
+# trên actor của phòng → không có thread riêng cho mỗi game.
+# ACTIVE_TIMERS: room_id -> job đang hẹn (tick timer hoặc hết giờ nghỉ).
 ACTIVE_TIMERS = {}
-ROUND_DURATION = ROUND_TIMER_SECONDS  # giây / round
+ROUND_DURATION = int(os.getenv('ROUND_TIMER_SECONDS', ROUND_TIMER_SECONDS))  # giây / round
+ROUNDS = int(os.getenv('ROUNDS_PER_GAME', ROUNDS_PER_GAME))
+INTERMISSION = float(os.getenv('INTERMISSION_SECONDS', INTERMISSION_SECONDS))
+ROUND_TIMER_LAG = 'drawguess_round_timer_lag_seconds'
+metrics.registry.describe(ROUND_TIMER_LAG, 'histogram', 'Round timer tick delay behind schedule in seconds')
 
 def _broadcast_round_started(room_id, round_info):
     """
     Gửi sự kiện round_started cho drawer và những người còn lại
-    round_info: dict {drawer_id, word}
+    round_info: dict {drawer_id, word, round, total_rounds}
     """
     drawer_id = round_info.get("drawer_id")
     word = round_info.get("word")
+    progress = {"round": round_info.get("round"), "total_rounds": round_info.get("total_rounds")}
 
     # Lấy tên người vẽ
     drawer_player = data_store.get_player(drawer_id)
@@ -48,6 +251,7 @@ def _broadcast_round_started(room_id, round_info):
         "word": word,
         "drawer_name": drawer_name,
         "seconds": ROUND_DURATION,
+        **progress,
     }
 
     # Payload cho những người đoán: không có word
@@ -56,6 +260,7 @@ def _broadcast_round_started(room_id, round_info):
         "drawer_id": drawer_id,
         "drawer_name": drawer_name,
         "seconds": ROUND_DURATION,
+        **progress,
     }
 
     # Gửi riêng cho socket của drawer (sid là 1 room riêng)
@@ -69,89 +274,177 @@ def _broadcast_round_started(room_id, round_info):
         skip_sid=drawer_id,
     )
 
-def _start_round_timer(room_id, duration=ROUND_DURATION):
-  """
-  Chạy timer cho round hiện tại của room_id.
-  Mỗi giây emit 'timer_update', hết giờ thì end_round + 'round_ended'.
-  """
-  # Nếu đã có timer đang chạy cho room này thì bỏ qua
-  if ACTIVE_TIMERS.get(room_id):
-      return
+def _begin_round(room_id, round_info):
+    """Round mới đã được game_handler bắt đầu → xoá log nét vẽ, báo phòng, chạy timer."""
+    stroke_log.reset(room_id)
+    _broadcast_round_started(room_id, round_info)
+    _start_round_timer(room_id, round_info.get("round"))
 
-  ACTIVE_TIMERS[room_id] = True
 
-  def _timer_task(rid, dur):
-      remaining = dur
-      while remaining >= 0:
-          # Cập nhật timer trong game_state
-          game_handler.update_timer(rid, remaining)
+def _start_round_timer(room_id, round_no, duration=ROUND_DURATION):
+    """
+    Chạy timer cho round hiện tại của room_id trên scheduler dùng chung.
+    Mỗi giây emit 'timer_update', hết giờ thì _end_round.
+    """
+    # Nếu đã có timer đang chạy cho room này thì bỏ qua
+    if ACTIVE_TIMERS.get(room_id):
+        return
 
-          # Broadcast cho tất cả client trong phòng
-          socketio.emit("timer_update", {"seconds": remaining}, room=rid)
+    # Deadline tính theo mốc bắt đầu → không bị trôi theo thời gian chạy callback
+    started_at = scheduler.now()
+    ACTIVE_TIMERS[room_id] = scheduler.call_at(
+        started_at, _post_timer_tick, room_id, round_no, started_at, duration, duration
+    )
 
-          if remaining == 0:
-              break
 
-          socketio.sleep(1)
-          remaining -= 1
+def _post_timer_tick(rid, *tick):
+    """Scheduler chỉ đẩy tick vào hàng đợi của phòng, không tự sửa state."""
+    room_actors.submit(rid, _round_timer_tick, rid, *tick)
 
-      # Hết giờ → end_round
-      final_word = game_handler.end_round(rid)
-      socketio.emit(
-          "round_ended",
-          {"word": final_word},
-          room=rid,
-      )
 
-      ACTIVE_TIMERS.pop(rid, None)
+def _round_timer_tick(rid, round_no, started_at, duration, remaining):
+    # Timer đã bị dừng (phòng đóng) trong lúc tick nằm chờ trong hàng đợi
+    if rid not in ACTIVE_TIMERS:
+        return
 
-  socketio.start_background_task(_timer_task, room_id, duration)
+    # Tick chạy trễ bao lâu so với mốc dự kiến (scheduler + hàng đợi của phòng)
+    metrics.observe(ROUND_TIMER_LAG, scheduler.now() - (started_at + duration - remaining))
 
-def _handle_host_left(host_sid):
-    """
-    Khi chủ phòng rời (disconnect/leave), đóng phòng và đẩy tất cả player ra ngoài.
-    """
-    player = data_store.get_player(host_sid)
-    if not player:
+    # Cập nhật timer trong game_state (None: round này đã kết thúc sớm)
+    if game_handler.update_timer(rid, remaining, round_no) is None:
         return
 
-    room_id = player.room_id
-    if not room_id:
+    # Broadcast cho tất cả client trong phòng
+    socketio.emit("timer_update", {"seconds": remaining}, room=rid)
+
+    if remaining > 0:
+        ACTIVE_TIMERS[rid] = scheduler.call_at(
+            started_at + (duration - remaining + 1),
+            _post_timer_tick, rid, round_no, started_at, duration, remaining - 1,
+        )
         return
 
-    room = data_store.get_room(room_id)
-    if not room:
+    _end_round(rid, "timeout")
+
+
+def _end_round(room_id, reason):
+    """
+    Kết thúc round đang chạy rồi hẹn round kế tiếp sau giờ nghỉ
+    (hoặc kết thúc game nếu đã hết round / không đủ người)
+    reason: "timeout" | "all_guessed" | "drawer_left" | "not_enough_players"
+    """
+    game = data_store.get_game(room_id)
+    if not game or game.state_code != GameState.PLAYING:
         return
+    _cancel_round_timer(room_id)
+
+    final_word = game_handler.end_round(room_id)
+    has_next = game.has_next_round(data_store.count_players_in_room(room_id))
+    socketio.emit(
+        "round_ended",
+        {
+            "word": final_word,
+            "reason": reason,
+            "round": game.current_round,
+            "total_rounds": game.total_rounds,
+            "next_round_in": INTERMISSION if has_next else None,
+        },
+        room=room_id,
+    )
 
-    # Nếu có hàm is_host trong Room thì check luôn cho chắc
-    if hasattr(room, "is_host") and not room.is_host(host_sid):
+    if has_next:
+        ACTIVE_TIMERS[room_id] = scheduler.call_later(INTERMISSION, _post_next_round, room_id)
+    else:
+        _finish_game(room_id)
+
+
+def _post_next_round(room_id):
+    room_actors.submit(room_id, _next_round, room_id)
+
+
+def _next_round(room_id):
+    """Hết giờ nghỉ: round kế tiếp, hoặc 'game_ended' nếu không còn đủ người."""
+    if ACTIVE_TIMERS.pop(room_id, None) is None:
         return
+    outcome, info = game_handler.advance(room_id)
+    if outcome == game_handler.NEXT_ROUND:
+        _begin_round(room_id, info)
+    elif outcome == game_handler.GAME_OVER:
+        _emit_game_ended(room_id, info)
 
-    # Lấy toàn bộ players trong phòng
-    players = data_store.get_players_in_room(room_id) or []
 
-    # Thông báo cho cả phòng là phòng đã đóng
+def _finish_game(room_id):
+    _emit_game_ended(room_id, game_handler.finish_game(room_id))
+
+
+def _emit_game_ended(room_id, results):
     socketio.emit(
-        "room_closed",
+        "game_ended",
         {
             "room_id": room_id,
-            "reason": "host_left",
+            "results": results,
+            "winners": [row["id"] for row in results if row["rank"] == 1],
         },
         room=room_id,
     )
 
-    # Cho từng socket rời room + xóa player
-    for p in players:
-        try:
-            leave_room(room_id, sid=p.id)
-        except Exception as ex:
-            print(f"[room_closed] leave_room error for {p.id}: {ex}")
-        data_store.remove_player(p.id)
-
-    # Xóa room (game nếu mày có API remove_game thì có thể thêm sau)
-    data_store.remove_room(room_id)
 
-    print(f"[room_closed] Room {room_id} closed because host {host_sid} left")
+def _after_player_left(room_id, player_id):
+    """Người rời phòng giữa round: drawer rời / còn quá ít người / mọi người còn lại đã đoán đúng → kết thúc round."""
+    game = data_store.get_game(room_id)
+    if not game or game.state_code != GameState.PLAYING:
+        return
+    if player_id == game.drawer_id:
+        _end_round(room_id, "drawer_left")
+    elif data_store.count_players_in_room(room_id) < MIN_PLAYERS_TO_START:
+        _end_round(room_id, "not_enough_players")
+    elif game_handler.all_guessed(room_id):
+        _end_round(room_id, "all_guessed")
+
+
+def _cancel_round_timer(room_id):
+    call = ACTIVE_TIMERS.pop(room_id, None)
+    if call:
+        call.cancel()
+
+
+def _stop_round_timer(room_id):
+    """Huỷ timer của phòng (nếu có)."""
+    _cancel_round_timer(room_id)
+    # Tick đang chạy trên actor có thể vừa hẹn tick mới → huỷ thêm lần nữa sau nó
+    if room_actors.current_room() != room_id:
+        room_actors.submit(room_id, _cancel_round_timer, room_id)
+
+def _forget_room_if_gone(room_id):
+    """Phòng đã bị xoá (người cuối rời) → dọn buffer/log nét vẽ của phòng."""
+    if not data_store.get_room(room_id):
+        _stop_round_timer(room_id)
+        rate_limiter.forget_room(room_id)
+        stroke_simplifier.discard_room(room_id)
+        stroke_buffer.discard_room(room_id)
+        stroke_log.discard(room_id)
+
+def _broadcast_player_left(room_id, player_id, player_name):
+    """
+    'player_left' cho phòng, kèm delta bảng điểm (chỉ dòng của người rời).
+    Tăng version + emit trên actor của phòng → version tới client đúng thứ tự.
+    """
+    if room_actors.current_room() != room_id:
+        room_actors.submit(room_id, _broadcast_player_left, room_id, player_id, player_name)
+        return
+    score_update = scoreboard.record(
+        room_id, [scoreboard.change_row(player_id, flags=(scoreboard.FLAG_LEFT,))]
+    )
+    socketio.emit(
+        'player_left',
+        {
+            'player_id': player_id,
+            'player_name': player_name,
+            'scoreboard': score_update,
+        },
+        room=room_id,
+    )
+    _after_player_left(room_id, player_id)
 
 def _close_room_for_host(host_sid):
     """
@@ -173,16 +466,22 @@ def _close_room_for_host(host_sid):
         # không phải host thì không đóng phòng ở đây
         return
 
-    # dừng timer nếu có
-    ACTIVE_TIMERS.pop(room_id, None)
+    _close_room(room_id, "host_left")
 
-    # lấy danh sách player trong phòng (trước khi xoá)
-    
+
+def _close_room(room_id, reason):
+    """Đóng hẳn phòng: 'room_closed' cho cả phòng, dọn timer/buffer, xoá room + player + game."""
+    # dừng timer nếu có
+    _stop_round_timer(room_id)
+    rate_limiter.forget_room(room_id)
+    stroke_simplifier.discard_room(room_id)
+    stroke_buffer.discard_room(room_id)
+    stroke_log.discard(room_id)
 
     # thông báo cho toàn bộ phòng (mọi người chuyển về lobby)
     socketio.emit(
         "room_closed",
-        {"room_id": room_id, "reason": "host_left"},
+        {"room_id": room_id, "reason": reason},
         room=room_id,
     )
     players = room_handler.get_room_players(room_id)  # list dict {id, name, ...}
@@ -192,14 +491,172 @@ def _close_room_for_host(host_sid):
         if not pid:
             continue
         try:
-            leave_room(room_id, sid=pid)
+            # Không cần request context → gọi được từ actor của phòng (reaper)
+            socketio.server.leave_room(pid, room_id, namespace='/')
         except Exception:
             pass
-        
 
     room_handler.close_room(room_id)
 
 
+def _drop_player(sid):
+    """Player rời hẳn (disconnect / reaper): host → đóng phòng, còn lại → player_left."""
+    player = data_store.get_player(sid)
+    if not player:
+        return
+
+    room_id = player.room_id
+    room = data_store.get_room(room_id) if room_id else None
+
+    # Nếu là host → đóng phòng luôn
+    if room and room.host_id == sid:
+        _close_room_for_host(sid)
+        return
+
+    # còn lại: player thường, logic cũ
+    room_id, player_name = room_handler.remove_player_from_room(sid)
+
+    if room_id:
+        _release_stroke_sender(room_id, sid)
+        socketio.server.leave_room(sid, room_id, namespace='/')
+        _forget_room_if_gone(room_id)
+
+        # Notify other players
+        _broadcast_player_left(room_id, sid, player_name)
+
+
+# ================== REAPER (TTL) ==================
+# Dọn player mất socket không có 'disconnect', phòng/game bỏ hoang (handlers/reaper.py).
+# Mỗi process chỉ theo dõi phòng/player nó tạo ra (socket của player nằm ở process này).
+REAPER_INTERVAL = float(os.getenv('REAPER_INTERVAL_SECONDS', REAPER_INTERVAL_SECONDS))
+reaper = Reaper(
+    parse_ttls(os.getenv('REAPER_TTLS')),
+    is_connected=lambda sid: socketio.server.manager.is_connected(sid, '/'),
+)
+_reaper_job = None
+REAP_ACTIONS = {
+    KIND_PLAYER: lambda sid, reason: _drop_player(sid),
+    KIND_ROOM: _close_room,
+    KIND_GAME: lambda room_id, reason: data_store.remove_game(room_id),
+}
+
+
+def _track(kind, key):
+    """Đưa object vào reaper; tick reaper bắt đầu chạy ở lần track đầu tiên."""
+    global _reaper_job
+    if REAPER_INTERVAL <= 0:
+        return
+    reaper.track(kind, key)
+    if _reaper_job is None:
+        _reaper_job = scheduler.call_every(REAPER_INTERVAL, _reap_tick)
+
+
+def _reap_tick():
+    """Scheduler chỉ lấy các entry tới hạn; kiểm tra + dọn chạy trên actor của phòng."""
+    for kind, key in reaper.due():
+        room_id = key
+        if kind == KIND_PLAYER:
+            player = data_store.get_player(key)
+            room_id = player.room_id if player and player.room_id else key
+        room_actors.submit(room_id, _reap, kind, key)
+
+
+def _reap(kind, key):
+    reason = reaper.check(kind, key)
+    if reason is None:
+        return
+    log.info('reaped', kind=kind, key=key, reason=reason)
+    REAP_ACTIONS[kind](key, reason)
+
+
+# ================== PERSISTENCE ==================
+# STATE_BACKEND_URL=file:///dir (storage/persistence.py): 1 background task
+# ghi journal theo lô mỗi JOURNAL_FLUSH_MS và snapshot định kỳ / khi journal lớn.
+JOURNAL_FLUSH_INTERVAL = int(os.getenv('JOURNAL_FLUSH_MS', JOURNAL_FLUSH_MS)) / 1000.0
+SNAPSHOT_INTERVAL = float(os.getenv('SNAPSHOT_INTERVAL_SECONDS', SNAPSHOT_INTERVAL_SECONDS))
+SNAPSHOT_JOURNAL_MAX = int(os.getenv('SNAPSHOT_JOURNAL_BYTES', SNAPSHOT_JOURNAL_BYTES))
+JOURNAL_FLUSH_SECONDS = 'drawguess_journal_flush_seconds'
+SNAPSHOT_PAUSE_SECONDS = 'drawguess_snapshot_pause_seconds'
+metrics.registry.describe(JOURNAL_FLUSH_SECONDS, 'histogram', 'Journal batch write + fsync time in seconds')
+metrics.registry.describe(
+    SNAPSHOT_PAUSE_SECONDS, 'histogram', 'Time the store lock is held while taking a snapshot in seconds',
+)
+
+
+def _persistence_loop(state):
+    last_snapshot = time.monotonic()
+    while True:
+        socketio.sleep(JOURNAL_FLUSH_INTERVAL)
+        try:
+            started = time.perf_counter()
+            state.flush()
+            metrics.observe(JOURNAL_FLUSH_SECONDS, time.perf_counter() - started)
+
+            due = SNAPSHOT_INTERVAL > 0 and time.monotonic() - last_snapshot >= SNAPSHOT_INTERVAL
+            if due or state.journal.bytes >= SNAPSHOT_JOURNAL_MAX:
+                info = state.snapshot()
+                last_snapshot = time.monotonic()
+                metrics.observe(SNAPSHOT_PAUSE_SECONDS, info['paused'])
+                log.info('snapshot', **info)
+        except OSError as ex:
+            log.error('persistence_failed', error=repr(ex))
+
+
+def _restore_sessions(state):
+    """
+    State vừa load từ đĩa: socket cũ đều đã mất → player chờ 'resume' trong
+    grace, phòng/game được reaper theo dõi lại, game đang dở chạy tiếp từ giờ nghỉ.
+
+    Chạy trước khi nhận kết nối nên sửa thẳng object mà không ghi journal:
+    connected / round đang dở được suy ra lại ở mỗi lần khởi động.
+    """
+    for room_id in list(state.rooms):
+        _track(KIND_ROOM, room_id)
+
+    for room_id, game in list(state.games.items()):
+        _track(KIND_GAME, room_id)
+        if game.state_code == GameState.PLAYING:
+            # Canvas + timer của round đã mất theo process cũ, chưa ai kết nối để nhận 'round_ended'
+            game.end_round()
+        if game.state_code == GameState.ROUND_ENDED:
+            ACTIVE_TIMERS[room_id] = scheduler.call_later(INTERMISSION, _post_next_round, room_id)
+
+    waiting = []
+    for sid, player in list(state.players.items()):
+        if RECONNECT_GRACE <= 0:
+            _drop_player(sid)
+        elif player.room_id not in state.rooms:
+            data_store.remove_player(sid)
+        else:
+            player.connected = False
+            waiting.append((sid, player.room_id))
+    # 1 job cho cả lô thay vì 1 timer / player (không track reaper: last_active_ts
+    # có thể đã cũ hơn TTL sau thời gian tắt)
+    if waiting:
+        scheduler.call_later(RECONNECT_GRACE, _expire_restored_sessions, waiting)
+
+
+def _expire_restored_sessions(sessions):
+    for sid, room_id in sessions:
+        player = data_store.get_player(sid)
+        if player is not None and not player.connected:
+            _post_grace_expired(sid, room_id)
+
+
+def _start_persistence():
+    state = data_store.get_backend()
+    if not isinstance(state, PersistentBackend):
+        return
+    log.info('state_recovered', directory=state.directory, **state.recovery)
+    metrics.gauge('drawguess_journal_bytes', lambda: state.journal.bytes, 'Journal bytes since the last snapshot')
+    _restore_sessions(state)
+    socketio.start_background_task(_persistence_loop, state)
+
+    # Flush phần journal còn trong buffer khi tắt; SIGTERM mặc định không chạy atexit
+    atexit.register(state.close)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+
 # ================== END HELPERS ==================
 
 @app.route('/')
@@ -207,129 +664,313 @@ def index():
     """Health check endpoint"""
     return {'status': 'ok', 'message': 'Draw & Guess Server is running'}
 
-@socketio.on('connect')
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics (text format)"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# Gauge tính lúc scrape: O(1) mỗi cái, không duyệt phòng
+metrics.gauge('drawguess_rooms', lambda: data_store.counts()[0], 'Rooms in the state store')
+metrics.gauge('drawguess_players', lambda: data_store.counts()[1], 'Players in the state store')
+metrics.gauge('drawguess_games', lambda: data_store.counts()[2], 'Games in the state store')
+metrics.gauge('drawguess_round_timers', lambda: len(ACTIVE_TIMERS), 'Round timers running in this process')
+metrics.gauge('drawguess_reaper_tracked', lambda: len(reaper), 'Rooms, players and games watched by the TTL reaper')
+
+# ================== PROFILING ==================
+# Sampling profiler theo yêu cầu: PROFILE_SECONDS=N capture N giây từ lúc start,
+# hoặc POST /admin/profile (cần ADMIN_TOKEN). Không capture = không tốn gì.
+PROFILE_DIR = os.getenv('PROFILE_DIR') or tempfile.gettempdir()
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+
+def _admin_authorized():
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(ADMIN_TOKEN) and scheme.lower() == 'bearer' and \
+        hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """
+    GET: trạng thái capture; POST ?seconds=30&mode=cpu|wall: bắt đầu capture
+    Header: Authorization: Bearer <ADMIN_TOKEN> (không đặt ADMIN_TOKEN = tắt route)
+    """
+    if not ADMIN_TOKEN:
+        return {'error': 'Not found'}, 404
+    if not _admin_authorized():
+        return {'error': 'Unauthorized'}, 401
+    if request.method == 'GET':
+        return profiler.status()
+
+    mode = request.args.get('mode', PROFILE_MODES[0])
+    try:
+        seconds = float(request.args.get('seconds', 30))
+    except ValueError:
+        return {'error': 'seconds must be a number'}, 400
+    if mode not in PROFILE_MODES or seconds <= 0:
+        return {'error': f"seconds must be > 0 and mode one of {list(PROFILE_MODES)}"}, 400
+
+    capture = profiler.start(seconds, capture_path(PROFILE_DIR), mode)
+    if capture is None:
+        return {'error': 'A capture is already running', **profiler.status()}, 409
+    return capture, 202
+
+
+if float(os.getenv('PROFILE_SECONDS') or 0) > 0:
+    profiler.start(float(os.getenv('PROFILE_SECONDS')), capture_path(PROFILE_DIR),
+                   os.getenv('PROFILE_MODE') or PROFILE_MODES[0])
+
+@socket_event('connect')
 def handle_connect():
     """Handle client connection"""
-    print(f"Client connected: {request.sid}")
+    log.info('connect', sid=request.sid)
     emit('connected', {'message': 'Connected to server'})
 
-@socketio.on('disconnect')
+@socket_event('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    print(f"Client disconnected: {request.sid}")
+    sid = request.sid
+    log.info('disconnect', sid=sid)
+    rate_limiter.forget(sid)
 
-    # kiểm tra player & room
-    player = data_store.get_player(request.sid)
+    player = data_store.get_player(sid)
     if not player:
         return
+    room_id = player.room_id or sid
+    room_actors.call(room_id, _disconnect, room_id, sid)
 
-    room_id = player.room_id
-    room = data_store.get_room(room_id) if room_id else None
 
-    # Nếu là host → đóng phòng luôn
-    if room and room.host_id == request.sid:
-        _close_room_for_host(request.sid)
+def _disconnect(room_id, sid):
+    """Socket của player đã đóng (chạy trên actor của phòng)."""
+    player = data_store.get_player(sid)
+    if not player:
+        return
+    if player.room_id and player.room_id != room_id:
+        # Vừa đổi phòng trước khi tới lượt → xử lý trên actor của phòng mới
+        room_actors.submit(player.room_id, _disconnect, player.room_id, sid)
         return
 
-    # còn lại: player thường, logic cũ
-    room_id, player_name = room_handler.remove_player_from_room(request.sid)
+    # Mất kết nối tạm thời → giữ player (và phòng nếu là host) chờ 'resume'
+    if RECONNECT_GRACE > 0:
+        player = room_handler.mark_disconnected(sid)
+        if player:
+            # Nét đang vẽ dở kết thúc ở đây; resume bắt đầu với state mới
+            _release_stroke_sender(player.room_id, sid)
+            _broadcast_player_disconnected(player)
+            scheduler.call_later(RECONNECT_GRACE, _post_grace_expired, sid, player.room_id)
+            return
 
-    if room_id:
-        leave_room(room_id)
+    _drop_player(sid)
 
-        # Lấy danh sách player còn lại trong phòng
-        players_after = room_handler.get_room_players(room_id)
 
-        # Notify other players
-        socketio.emit(
-            'player_left',
-            {
-                'player_id': request.sid,
-                'player_name': player_name,
-                'players': players_after,
-            },
-            room=room_id,
-        )
+def _broadcast_player_disconnected(player):
+    """'player_disconnected' cho phòng, kèm delta bảng điểm (dòng của người mất kết nối)."""
+    if room_actors.current_room() != player.room_id:
+        room_actors.submit(player.room_id, _broadcast_player_disconnected, player)
+        return
+    score_update = scoreboard.record(player.room_id, [scoreboard.change_row(
+        player.id, score=player.score, flags=(scoreboard.FLAG_DISCONNECTED,)
+    )])
+    socketio.emit('player_disconnected', {
+        'player_id': player.id,
+        'player_name': player.name,
+        'reconnect_grace': RECONNECT_GRACE,
+        'scoreboard': score_update,
+    }, room=player.room_id)
 
 
+def _post_grace_expired(sid, room_id):
+    room_actors.submit(room_id, _grace_expired, sid)
+
+
+def _grace_expired(sid):
+    """Hết grace mà chưa resume (sid cũ vẫn còn, connected=False) → xoá như disconnect cũ."""
+    player = data_store.get_player(sid)
+    if player is None or player.connected:
+        return
+    log.info('session_expired', sid=sid, room=player.room_id)
+    _drop_player(sid)
+
+
+@socket_event('resume')
+def handle_resume(data=None):
+    """Socket mới của player vừa mất kết nối: {token} từ 'room_joined' / 'resumed'"""
+    session = resume_tokens.verify((data or {}).get('token'))
+    if session is None:
+        emit('resume_failed', {'reason': 'invalid_token'})
+        return
+    old_sid, room_id = session
+    room_actors.submit(room_id, _resume, room_id, old_sid, request.sid)
+
 
-@socketio.on('create_room')
+def _resume(room_id, old_sid, sid):
+    """Gắn Player cũ vào sid mới rồi gửi lại state đã lỡ (chạy trên actor của phòng)."""
+    # Event đang chờ mang skip_sid = sid cũ → gửi trước khi đổi id
+    _flush_stroke_room(room_id)
+    player = room_handler.resume_player(old_sid, sid, room_id)
+    if player is None:
+        socketio.emit('resume_failed', {'reason': 'expired'}, room=sid)
+        return
+    log.info('resume', sid=sid, previous=old_sid, room=room_id)
+
+    socketio.server.leave_room(old_sid, room_id, namespace='/')
+    socketio.server.enter_room(sid, room_id, namespace='/')
+    stroke_simplifier.release_sender(room_id, old_sid)
+    rate_limiter.forget(old_sid)
+    rate_limiter.set_room(sid, room_id)
+    _track(KIND_PLAYER, sid)
+
+    # Cả phòng chỉ nhận 1 delta: dòng cũ đổi sang id mới (không gửi lại cả danh sách)
+    score_update = scoreboard.record(room_id, [
+        scoreboard.change_row(sid, score=player.score, flags=(scoreboard.FLAG_RESUMED,),
+                              name=player.name, previous_id=old_sid),
+        scoreboard.change_row(old_sid, flags=(scoreboard.FLAG_LEFT,)),
+    ])
+    socketio.emit('player_resumed', {
+        'player_id': sid,
+        'previous_id': old_sid,
+        'player_name': player.name,
+        'scoreboard': score_update,
+    }, room=room_id, skip_sid=sid)
+
+    socketio.emit('resumed', _session_state(room_id, sid), room=sid)
+    replay = stroke_log.replay(room_id)
+    if replay:
+        socketio.emit('canvas_replay', replay, room=sid)
+
+    # Socket cũ chưa bị phát hiện là đã chết (resume trước ping timeout) → đóng nó
+    if socketio.server.manager.is_connected(old_sid, '/'):
+        socketio.server.disconnect(old_sid, namespace='/')
+
+
+def _session_state(room_id, sid):
+    """Payload 'resumed': bảng điểm đầy đủ, round đang chạy, token mới."""
+    room = data_store.get_room(room_id)
+    snapshot = scoreboard.snapshot(room_id) or {'players': [], 'version': 0}
+    state = {
+        'room_id': room_id,
+        'player_id': sid,
+        'is_host': bool(room and room.is_host(sid)),
+        'players': snapshot['players'],
+        'scoreboard_version': snapshot['version'],
+        'resume_token': resume_tokens.issue(sid, room_id),
+        'reconnect_grace': RECONNECT_GRACE,
+        'round': None,
+    }
+    game = data_store.get_game(room_id)
+    if game and game.state_code == GameState.PLAYING:
+        drawer = data_store.get_player(game.drawer_id)
+        state['round'] = {
+            'drawer_id': game.drawer_id,
+            'drawer_name': drawer.name if drawer else "Người chơi",
+            'is_drawer': game.drawer_id == sid,
+            'seconds': game.timer,
+            'round': game.current_round,
+            'total_rounds': game.total_rounds,
+        }
+        if game.drawer_id == sid:
+            state['round']['word'] = game.current_word
+    return state
+
+
+@socket_event('create_room')
 def handle_create_room(data=None):
     """Handle room creation"""
     host_id = request.sid
-    print(f"create_room from {host_id}, data={data}")
-
+    # room_id chưa được gửi cho ai → trước 'room_created' không có việc nào khác của phòng
     room_id = room_handler.create_room(host_id)
+    room_actors.call(room_id, _room_created, room_id, host_id)
 
-    # Host join luôn socket room
-    join_room(room_id)
 
-    emit('room_created', {'room_id': room_id})
+def _room_created(room_id, host_id):
+    """Host vào socket room của phòng mới (chạy trên actor của phòng)."""
+    log.info('create_room', sid=host_id, room=room_id)
+    socketio.server.enter_room(host_id, room_id, namespace='/')
+    rate_limiter.set_room(host_id, room_id)
+    _track(KIND_ROOM, room_id)
 
+    socketio.emit('room_created', {'room_id': room_id}, room=host_id)
 
-@socketio.on('join_room')
+
+@socket_event('join_room')
 def handle_join_room(data):
     """Handle player joining a room"""
     room_id = data.get('room_id')
     player_name = data.get('player_name', 'Anonymous')
-    
+
+    room_actors.submit(room_id, _join_room, room_id, request.sid, player_name)
+
+
+def _join_room(room_id, sid, player_name):
+    """Join chạy trên actor của phòng → replay khớp đúng với các nét vẽ sau đó."""
     success, error, room_data = room_handler.add_player_to_room(
-        room_id, request.sid, player_name
+        room_id, sid, player_name
     )
-    
+
     if not success:
-        emit('error', {'message': error})
+        socketio.emit('error', {'message': error}, room=sid)
         return
-    
-    join_room(room_id)
-    players_list = room_handler.get_room_players(room_id)
-    
+
+    # Gửi nốt nét đang chờ trước khi join → replay không bị lặp event
+    _flush_stroke_room(room_id)
+    socketio.server.enter_room(sid, room_id, namespace='/')
+    rate_limiter.set_room(sid, room_id)
+    _track(KIND_PLAYER, sid)
+    _track(KIND_ROOM, room_id)
+
+    # Cả phòng chỉ nhận dòng của người mới; người mới nhận snapshot đầy đủ
+    score_update = scoreboard.record(room_id, [scoreboard.change_row(
+        sid, score=0, flags=(scoreboard.FLAG_JOINED,), name=player_name
+    )])
     socketio.emit('player_joined', {
         'player': {
-            'id': request.sid,
+            'id': sid,
             'name': player_name,
             'score': 0
         },
-        'players': players_list,
+        'scoreboard': score_update,
     }, room=room_id
     )
-    
-    emit('room_joined', room_data)
 
-@socketio.on('leave_room')
+    snapshot = scoreboard.snapshot(room_id)
+    if snapshot:
+        room_data['players'] = snapshot['players']
+        room_data['scoreboard_version'] = snapshot['version']
+    if RECONNECT_GRACE > 0:
+        # Mất kết nối → socket mới gửi 'resume' với token này
+        room_data['resume_token'] = resume_tokens.issue(sid, room_id)
+        room_data['reconnect_grace'] = RECONNECT_GRACE
+    socketio.emit('room_joined', room_data, room=sid)
+
+    # Người vào giữa round nhận lại toàn bộ nét vẽ hiện tại trong 1 payload
+    # (event riêng, không lẫn với nét vẽ live của 'canvas_update')
+    replay = stroke_log.replay(room_id)
+    if replay:
+        socketio.emit('canvas_replay', replay, room=sid)
+
+@socket_event('leave_room')
 def handle_leave_room(data=None):
     """Handle player leaving a room (user click leave)"""
-    player = data_store.get_player(request.sid)
+    sid = request.sid
+    player = data_store.get_player(sid)
     if not player:
         return
-    room_id = player.room_id
-    room = data_store.get_room(player.room_id) if player.room_id else None
-
-       # Nếu là host → đóng phòng
-    if room and room.host_id == request.sid:
-        _close_room_for_host(request.sid)
+    if not player.room_id:
+        _drop_player(sid)
         return
+    room_actors.call(player.room_id, _leave_room, player.room_id, sid)
 
-    # 🔹 Player thường → logic cũ của mày
-    room_id, player_name = room_handler.remove_player_from_room(request.sid)
 
-    if room_id:
-        leave_room(room_id)
-
-        players_after = room_handler.get_room_players(room_id)
-
-        socketio.emit(
-            'player_left',
-            {
-                'player_id': request.sid,
-                'player_name': player_name,
-                'players': players_after,
-            },
-            room=room_id,
-        )
+def _leave_room(room_id, sid):
+    """Host rời → đóng phòng, player thường → player_left (chạy trên actor của phòng)."""
+    player = data_store.get_player(sid)
+    if not player or player.room_id != room_id:
+        return  # đã rời / đổi phòng trước khi tới lượt
+    _drop_player(sid)
+    rate_limiter.set_room(sid, None)
 
 
-@socketio.on('kick_player')
+@socket_event('kick_player')
 def handle_kick_player(data):
     """
     Host kick 1 player ra khỏi room
@@ -345,31 +986,40 @@ def handle_kick_player(data):
     if target_id == requester_id:
         emit("error", {"message": "Chủ phòng không thể kick chính mình"})
         return
-    if ACTIVE_TIMERS.get(room_id):
-        emit(
-            "error",
-            {"message": "Không thể kick người chơi khi vòng chơi đang diễn ra."},
-        )
+    room_actors.call(room_id, _kick_player, room_id, requester_id, target_id)
+
+
+def _kick_player(room_id, requester_id, target_id):
+    """Kiểm tra + kick chạy trên actor của phòng (không chen giữa tick / đoán từ)."""
+    def reject(message):
+        socketio.emit("error", {"message": message}, room=requester_id)
+
+    # Chỉ chặn trong lúc round đang chạy (giờ nghỉ giữa 2 round vẫn kick được)
+    game = data_store.get_game(room_id)
+    if game and game.state_code == GameState.PLAYING:
+        reject("Không thể kick người chơi khi vòng chơi đang diễn ra.")
         return
     # 1. Chỉ host mới có quyền kick
     if not room_handler.is_room_host(room_id, requester_id):
-        emit("error", {"message": "Chỉ chủ phòng mới có quyền kick người chơi"})
+        reject("Chỉ chủ phòng mới có quyền kick người chơi")
         return
 
     # 2. Kiểm tra target có trong room
     if not room_handler.room_has_player(room_id, target_id):
-        emit("error", {"message": "Người chơi không thuộc phòng này"})
+        reject("Người chơi không thuộc phòng này")
         return
 
     # 3. Gỡ player khỏi room + storage
     kicked_room_id, kicked_name = room_handler.remove_player_from_room(target_id)
 
     if not kicked_room_id:
-        emit("error", {"message": "Không thể kick người chơi này"})
+        reject("Không thể kick người chơi này")
         return
 
     # Cho socket target rời room socket.io
-    leave_room(kicked_room_id, sid=target_id)
+    _release_stroke_sender(kicked_room_id, target_id)
+    socketio.server.leave_room(target_id, kicked_room_id, namespace='/')
+    rate_limiter.set_room(target_id, None)
 
     # 4. Gửi event riêng cho người bị kick
     socketio.emit(
@@ -383,46 +1033,52 @@ def handle_kick_player(data):
     )
 
     # 5. Gửi event player_left cho cả phòng để cập nhật list & scoreboard
-    players_after = room_handler.get_room_players(kicked_room_id)
-    socketio.emit(
-        "player_left",
-        {
-            "player_id": target_id,
-            "player_name": kicked_name,
-            "players": players_after,         # 🔥 để GameUI updatePlayersList
-        },
-        room=kicked_room_id,
-    )
+    _broadcast_player_left(kicked_room_id, target_id, kicked_name)
 
 # ============= GAME EVENTS =============
-@socketio.on('start_game')
+@socket_event('start_game')
 def handle_start_game(data):
     room_id = data.get('room_id')
     if not room_id:
         emit('error', {'message': 'room_id is required'})
         return
 
-    if ACTIVE_TIMERS.get(room_id):
-        emit('error', {
+    rounds = data.get('rounds', ROUNDS)
+    if not isinstance(rounds, int) or isinstance(rounds, bool) or not 1 <= rounds <= MAX_ROUNDS_PER_GAME:
+        emit('error', {'message': f'rounds phải từ 1 đến {MAX_ROUNDS_PER_GAME}'})
+        return
+
+    # Chạy trên actor của phòng → không chồng với tick timer / đoán từ
+    room_actors.submit(room_id, _start_game, room_id, request.sid, rounds)
+
+
+def _start_game(room_id, sid, rounds=ROUNDS):
+    # Round đang chạy hoặc đang nghỉ giữa 2 round → game trước chưa kết thúc
+    game = data_store.get_game(room_id)
+    if game and game.state_code in (GameState.PLAYING, GameState.ROUND_ENDED):
+        socketio.emit('error', {
             'message': 'Round hiện tại đang chạy, không thể bắt đầu lại.'
-        })
+        }, room=sid)
         return
 
-    success, error = game_handler.start_game(room_id)
+    success, error = game_handler.start_game(room_id, rounds)
     if not success:
-        emit('error', {'message': error or 'Cannot start game'})
+        socketio.emit('error', {'message': error or 'Cannot start game'}, room=sid)
         return
+    _track(KIND_GAME, room_id)
 
-    # Lấy danh sách players trong phòng cho scoreboard
-    players = room_handler.get_room_players(room_id)
+    # Lấy danh sách players trong phòng cho scoreboard (kèm version hiện tại)
+    snapshot = scoreboard.snapshot(room_id) or {'players': [], 'version': 0}
 
     # báo cho tất cả client trong phòng: game đã start
     socketio.emit(
         'game_started',
         {
             'room_id': room_id,
-            'players': players,
+            'players': snapshot['players'],
+            'scoreboard_version': snapshot['version'],
             'seconds': ROUND_DURATION,   # 90 giây
+            'total_rounds': data_store.get_game(room_id).total_rounds,
         },
         room=room_id
     )
@@ -432,83 +1088,124 @@ def handle_start_game(data):
         socketio.emit('error', {'message': 'Cannot start round'}, room=room_id)
         return
 
-    _broadcast_round_started(room_id, round_info)
-    _start_round_timer(room_id)
+    _begin_round(room_id, round_info)
 
 # ============= DRAWING EVENTS =============
-@socketio.on('drawing_start')
-def handle_drawing_start(data):
-    """Handle drawing start event"""
-    room_id, event_data = drawing_handler.broadcast_drawing_start(
-        request.sid, data.get('x'), data.get('y')
-    )
-    
+# Mỗi canvas event: (sid, data) → (room_id, event_data) của drawing_handler
+CANVAS_EVENTS = {
+    'drawing_start': lambda sid, data: drawing_handler.broadcast_drawing_start(sid, data.get('x'), data.get('y')),
+    'drawing_move': lambda sid, data: drawing_handler.broadcast_drawing_move(sid, data.get('x'), data.get('y')),
+    'drawing_end': lambda sid, data: drawing_handler.broadcast_drawing_end(sid),
+    'change_color': lambda sid, data: drawing_handler.broadcast_color_change(sid, data.get('color')),
+    'change_brush_size': lambda sid, data: drawing_handler.broadcast_brush_size_change(sid, data.get('size')),
+}
+
+
+def _apply_canvas_event(event, sid, data):
+    room_id, event_data = CANVAS_EVENTS[event](sid, data)
     if room_id:
-        socketio.emit('canvas_update', event_data, room=room_id, include_self=False)
+        _post_canvas_event(room_id, sid, event_data)
+
+
+def _rate_limited(event, data):
+    """
+    Token bucket của request.sid (+ phòng) cho event policy drop (chat)
+    Returns:
+        bool: True nếu event bị chặn (đã bỏ)
+    """
+    sid = request.sid
+    if rate_limiter.acquire(sid, event):
+        return False
+    if rate_limiter.should_notify(sid, event):
+        emit('rate_limited', {'event': event, 'retry_after': round(rate_limiter.retry_after(sid, event), 3)})
+    return True
 
-@socketio.on('drawing_move')
+
+def _handle_canvas_event(event, data):
+    """
+    Token bucket của request.sid (+ phòng) rồi áp dụng event vẽ / style.
+    Bị chặn → gộp (move, màu, cỡ bút) hoặc xếp hàng (start/end), gửi khi có token.
+    Còn event chờ thì event mới xếp sau (vd. điểm cuối trước drawing_end); chỉ
+    _flush_pending nhả hàng chờ, mỗi token 1 event.
+    Giữ lock của connection để thread handler và scheduler flush gửi đúng thứ tự.
+    """
+    sid = request.sid
+    with rate_limiter.lock(sid):
+        if not rate_limiter.has_pending(sid) and rate_limiter.acquire(sid, event):
+            _apply_canvas_event(event, sid, data)
+        elif rate_limiter.defer(sid, event, data):
+            scheduler.call_later(rate_limiter.retry_after(sid, event), _flush_pending, sid)
+
+
+def _flush_pending(sid):
+    """Hết thời gian chờ token → gửi event chờ lâu nhất (1 token), hẹn lại cho phần còn lại."""
+    lock = rate_limiter.lock(sid, create=False)
+    if lock is None:
+        return      # đã disconnect (forget) → không tạo lại state
+    with lock:
+        released = rate_limiter.release(sid)
+        if released is not None:
+            _apply_canvas_event(released[0], sid, released[1])
+        event = rate_limiter.pending_event(sid)
+        if event is not None:
+            scheduler.call_later(rate_limiter.retry_after(sid, event), _flush_pending, sid)
+
+
+@socket_event('drawing_start')
+def handle_drawing_start(data):
+    """Handle drawing start event (bị chặn → xếp hàng, không gộp)"""
+    _handle_canvas_event('drawing_start', data)
+
+@socket_event('drawing_move')
 def handle_drawing_move(data):
-    """Handle drawing move event"""
-    room_id, event_data = drawing_handler.broadcast_drawing_move(
-        request.sid, data.get('x'), data.get('y')
-    )
-    
-    if room_id:
-        socketio.emit('canvas_update', event_data, room=room_id, include_self=False)
+    """Handle drawing move event (bị chặn → chỉ giữ điểm mới nhất)"""
+    _handle_canvas_event('drawing_move', data)
 
-@socketio.on('drawing_end')
+@socket_event('drawing_end')
 def handle_drawing_end(data):
-    """Handle drawing end event"""
-    room_id, event_data = drawing_handler.broadcast_drawing_end(request.sid)
-    
-    if room_id:
-        socketio.emit('canvas_update', event_data, room=room_id, include_self=False)
+    """Handle drawing end event (bị chặn → xếp hàng, không gộp)"""
+    _handle_canvas_event('drawing_end', data)
 
-@socketio.on('change_color')
+@socket_event('change_color')
 def handle_change_color(data):
-    """Handle color change event"""
-    room_id, event_data = drawing_handler.broadcast_color_change(
-        request.sid, data.get('color')
-    )
-    
-    if room_id:
-        socketio.emit('canvas_update', event_data, room=room_id, include_self=False)
+    """Handle color change event (bị chặn → chỉ giữ màu mới nhất)"""
+    _handle_canvas_event('change_color', data)
 
-@socketio.on('change_brush_size')
+@socket_event('change_brush_size')
 def handle_change_brush_size(data):
-    """Handle brush size change event"""
-    room_id, event_data = drawing_handler.broadcast_brush_size_change(
-        request.sid, data.get('size')
-    )
-    
-    if room_id:
-        socketio.emit('canvas_update', event_data, room=room_id, include_self=False)
+    """Handle brush size change event (bị chặn → chỉ giữ cỡ mới nhất)"""
+    _handle_canvas_event('change_brush_size', data)
 
-@socketio.on('clear_canvas')
+@socket_event('clear_canvas')
 def handle_clear_canvas(data=None):
     """Handle canvas clear event (drawer bấm nút xóa)"""
 
     sid = request.sid
-    print("[clear_canvas] from sid:", sid, "data=", data)
-
     player = data_store.get_player(sid)
     if not player:
-        print("[clear_canvas] player not found for sid", sid)
+        log.debug('clear_canvas_rejected', sid=sid, reason='unknown_player')
         return
 
     room_id = player.room_id
     if not room_id:
-        print("[clear_canvas] player has no room", player.id)
+        log.debug('clear_canvas_rejected', sid=sid, reason='no_room')
         return
 
-    print(f"[clear_canvas] broadcast to room {room_id} (player {player.name})")
+    log.debug('clear_canvas', sid=sid, room=room_id)
+    room_actors.submit(room_id, _clear_canvas, room_id, player.id)
+
+
+def _clear_canvas(room_id, player_id):
+    # Nét vẽ còn trong buffer phải tới viewer trước lệnh clear
+    _flush_stroke_room(room_id)
+    stroke_log.reset(room_id)
 
     # 1) Gửi tín hiệu xóa canvas cho tất cả viewer trong phòng
     socketio.emit(
         "canvas_update",
         {
             "type": "clear",
-            "player_id": player.id,
+            "player_id": player_id,
         },
         room=room_id,
     )
@@ -518,7 +1215,7 @@ def handle_clear_canvas(data=None):
         "canvas_cleared",
         {
             "room_id": room_id,
-            "player_id": player.id,
+            "player_id": player_id,
         },
         room=room_id,
     )
@@ -526,45 +1223,87 @@ def handle_clear_canvas(data=None):
 
 
 # ============= CHAT / GUESS EVENTS =============
-@socketio.on('send_message')
+@socket_event('send_message')
 def handle_send_message(data):
     """Handle chat/guess message"""
+    if _rate_limited('send_message', data):
+        return
     message = data.get('message', '')
-    
-    room_id, message_data, is_correct_guess = chat_handler.process_message(
-        request.sid, message
-    )
+
+    player = data_store.get_player(request.sid)
+    if not player or not player.room_id:
+        return
+
+    # Đoán từ cộng điểm → chạy trên actor của phòng, cùng hàng với tick timer
+    room_actors.submit(player.room_id, _process_message, request.sid, message)
+
+
+def _process_message(sid, message):
+    room_id, message_data, guess_result, score_update = chat_handler.process_guess(sid, message)
+    is_correct_guess = guess_result == GUESS_EXACT
 
     if room_id and message_data:
         if is_correct_guess:
-            socketio.emit('chat_message', message_data, room=request.sid)
+            socketio.emit('chat_message', message_data, room=sid)
         else:
             socketio.emit('chat_message', message_data, room=room_id)
 
+    # Gần đúng (sai 1 ký tự) → chỉ báo riêng cho người đoán
+    if room_id and guess_result == GUESS_CLOSE:
+        socketio.emit('close_guess', {'message': message_data['message']}, room=sid)
+
     
     if room_id and is_correct_guess:
-        # Lấy lại danh sách player sau khi đã update score
-        players = room_handler.get_room_players(room_id)
-
         # Lấy từ khóa hiện tại để thông báo (nếu cần)
         game = data_store.get_game(room_id)
         current_word = game.current_word if game else None
 
-        # Cập nhật bảng điểm cho TẤT CẢ (mọi người đều thấy điểm thay đổi)
-        socketio.emit('scores_updated', {'players': players}, room=room_id)
+        # Cập nhật bảng điểm cho TẤT CẢ: chỉ các dòng đổi điểm (người đoán + người vẽ)
+        if score_update:
+            socketio.emit('scores_updated', score_update, room=room_id)
 
         # 🔥 Thông báo đoán đúng CHỈ CHO CHÍNH NGƯỜI ĐÓ
         socketio.emit(
             'correct_guess',
             {
-                'player_id': request.sid,
+                'player_id': sid,
                 'player_name': message_data.get('player_name'),
                 'word': current_word,
             },
-            room=request.sid,   # khác chỗ này: trước là room=room_id
+            room=sid,   # khác chỗ này: trước là room=room_id
         )
 
+        # Mọi người (trừ người vẽ) đã đoán đúng → không chờ hết giờ
+        if score_update and game_handler.all_guessed(room_id):
+            _end_round(room_id, "all_guessed")
+
+
+@socket_event('scoreboard_resync')
+def handle_scoreboard_resync(data=None):
+    """Client thấy version bảng điểm bị nhảy cóc → gửi lại toàn bộ bảng điểm"""
+    player = data_store.get_player(request.sid)
+    if not player or not player.room_id:
+        return
+
+    snapshot = scoreboard.snapshot(player.room_id)
+    if snapshot:
+        emit('scoreboard_snapshot', snapshot)
+
+
+_start_persistence()
+
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
-    socketio.run(app, host='0.0.0.0', port=port, debug=True)
+    debug = os.getenv('FLASK_ENV', 'development') == 'development'
+    print(f"Starting server on port {port} (async_mode={socketio.async_mode}, debug={debug})")
+    socketio.run(
+        app,
+        host='0.0.0.0',
+        port=port,
+        debug=debug,
+        # Reloader = 2 process cùng import app → cùng mở 1 thư mục journal
+        use_reloader=debug and not isinstance(data_store.get_backend(), PersistentBackend),
+        # Werkzeug dev server chỉ dùng cho threading mode
+        allow_unsafe_werkzeug=(socketio.async_mode == 'threading'),
+    )
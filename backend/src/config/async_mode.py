@@ -0,0 +1,41 @@
+"""
+Async Mode Selection
+Chọn mô hình concurrency của Socket.IO server qua biến môi trường ASYNC_MODE:
+- threading: mỗi connection là 1 OS thread (mặc định, không cần thêm package)
+- eventlet:  green threads (pip install eventlet)
+- gevent:    green threads (pip install gevent gevent-websocket)
+
+Phải gọi select_async_mode() TRƯỚC khi import flask / flask_socketio,
+vì eventlet/gevent cần monkey patch socket, threading, time...
+"""
+import os
+
+SUPPORTED_ASYNC_MODES = ('threading', 'eventlet', 'gevent')
+DEFAULT_ASYNC_MODE = 'threading'
+
+
+def select_async_mode(requested=None):
+    """
+    Resolve and prepare the async mode
+    Args:
+        requested: Mode name (defaults to $ASYNC_MODE)
+    Returns:
+        str: Mode actually usable ('threading' if the requested one is unavailable)
+    """
+    mode = (requested or os.getenv('ASYNC_MODE') or DEFAULT_ASYNC_MODE).strip().lower()
+    if mode not in SUPPORTED_ASYNC_MODES:
+        print(f"[async_mode] Unknown ASYNC_MODE={mode!r}, falling back to {DEFAULT_ASYNC_MODE}")
+        return DEFAULT_ASYNC_MODE
+
+    try:
+        if mode == 'eventlet':
+            import eventlet
+            eventlet.monkey_patch()
+        elif mode == 'gevent':
+            from gevent import monkey
+            monkey.patch_all()
+    except ImportError:
+        print(f"[async_mode] {mode} is not installed, falling back to {DEFAULT_ASYNC_MODE}")
+        return DEFAULT_ASYNC_MODE
+
+    return mode
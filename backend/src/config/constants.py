@@ -4,14 +4,22 @@ Game Constants Configuration
 # Game timing
 ROUND_TIMER_SECONDS = 90
 MIN_PLAYERS_TO_START = 2
+ROUNDS_PER_GAME = 1             # số vòng, mỗi vòng mọi người vẽ 1 lượt
+MAX_ROUNDS_PER_GAME = 10        # giới hạn 'rounds' host gửi kèm start_game
+INTERMISSION_SECONDS = 5        # nghỉ giữa 2 round (hiện từ khoá, bảng điểm)
 
 # Scoring
 SCORE_CORRECT_GUESS = 100
 SCORE_DRAWER_WHEN_GUESSED = 50
 
+# Guessing
+GUESS_CLOSE_DISTANCE = 1    # sai tối đa 1 ký tự → báo "close"
+GUESS_CLOSE_MIN_LENGTH = 4  # từ ngắn hơn không báo close
+
 # Room settings
 MAX_PLAYERS_PER_ROOM = 10
 ROOM_ID_LENGTH = 6
+RECONNECT_GRACE_SECONDS = 30  # giữ player mất kết nối chờ 'resume' (0 = xoá ngay như cũ)
 
 # Canvas settings
 CANVAS_WIDTH = 800
@@ -34,3 +42,55 @@ COLORS = [
     "#FFC0CB"   # Pink
 ]
 
+
+# Network settings
+STROKE_FLUSH_INTERVAL_MS = 25  # batch canvas_update mỗi ~1 frame (0 = tắt)
+STROKE_ENCODING = "json"       # "json" | "binary" (utils/stroke_codec.py)
+STROKE_LOG_MAX_BYTES = 256 * 1024  # replay cho người vào giữa round, mỗi phòng
+STROKE_LOG_COMPACT_EVENTS = 128    # số event trước khi nén tail vào snapshot
+
+# Concurrency
+ROOM_WORKERS = 4  # số worker chạy hàng đợi (actor) của các phòng
+STORE_LOCK_SECONDS = 10  # lock phòng trên store dùng chung: chờ tối đa / tự hết hạn sau chừng này
+
+# Persistence (STATE_BACKEND_URL=file:///dir, storage/persistence.py)
+JOURNAL_FSYNC = "batch"            # "always" (mỗi thay đổi) | "batch" (mỗi lần flush) | "off"
+JOURNAL_FLUSH_MS = 50              # ghi + fsync journal theo lô; crash mất tối đa chừng này
+JOURNAL_BATCH_BYTES = 1 << 20      # buffer lớn hơn thì ghi luôn, không chờ flush
+SNAPSHOT_INTERVAL_SECONDS = 300    # snapshot định kỳ (xoá journal đã cover)
+SNAPSHOT_JOURNAL_BYTES = 64 << 20  # journal lớn hơn thì snapshot sớm
+
+# Logging
+LOG_LEVEL = "INFO"       # DEBUG | INFO | WARNING | ERROR
+LOG_QUEUE_SIZE = 10000   # record chờ thread ghi log; đầy thì bỏ (không chặn handler)
+LOG_FLUSH_INTERVAL_MS = 50  # thread ghi log ngủ bao lâu khi hàng đợi rỗng
+
+# Profiling (utils/profiler.py)
+PROFILE_SAMPLE_INTERVAL_MS = 10  # sampling profiler lấy mẫu ~100 lần/giây
+PROFILE_MAX_SECONDS = 300        # giới hạn một lần capture
+
+# Rate limiting (utils/rate_limiter.py): nhóm -> (tokens/giây, burst), 0 = tắt
+RATE_LIMITS = {
+    'draw': (90, 60),          # drawing_start/move/end (client gửi move mỗi 16ms ≈ 62/s)
+    'style': (10, 10),         # change_color / change_brush_size (client debounce 120ms)
+    'chat': (3, 8),            # send_message
+    'room.draw': (180, 120),   # cả phòng cộng lại
+    'room.style': (20, 20),
+    'room.chat': (30, 40),
+}
+
+# Stroke simplification (handlers/stroke_simplifier.py)
+STROKE_SIMPLIFY_TOLERANCE = 0.5   # sai số tối đa = tỉ lệ × brush size (0 = tắt)
+STROKE_SIMPLIFY_MAX_HOLD = 8      # số điểm giữ lại tối đa trước khi gửi
+STROKE_SIMPLIFY_MAX_HOLD_MS = 100  # điểm giữ lâu hơn thì gửi ở tick flush kế tiếp
+
+# Reaper (handlers/reaper.py): giây không hoạt động trước khi bị dọn, 0 = không dọn
+REAPER_TTLS = {
+    'player': 300,         # socket đã mất mà không có 'disconnect'
+    'room': 1800,          # phòng đang chơi / đã chơi xong mà không ai làm gì
+    'room.waiting': 600,   # phòng chờ không ai bắt đầu
+    'game': 600,           # game còn lại sau khi phòng đã bị xoá
+}
+REAPER_INTERVAL_SECONDS = 5   # tick của reaper trên scheduler (0 = tắt)
+REAPER_BATCH = 500            # entry tối đa xét mỗi tick
+ACTIVITY_RESOLUTION_SECONDS = 15  # touch() chỉ ghi mốc mới khi lệch hơn → ít lần update_player
@@ -15,6 +15,10 @@ sys.path.insert(0, PROJECT_ROOT)
 from storage import data_store
 from models.game import Game
 from handlers import game_handler  # FIX IMPORT
+from utils.guess_matcher import GUESS_EXACT, GUESS_MISS
+from utils.logger import get_logger
+
+log = get_logger("chat")
 
 def process_message(player_id: str, message: str):
     """
@@ -22,14 +26,27 @@ def process_message(player_id: str, message: str):
     Returns:
         (room_id, message_data, is_correct_guess)
     """
+    room_id, message_data, result, _ = process_guess(player_id, message)
+    return room_id, message_data, result == GUESS_EXACT
+
+
+def process_guess(player_id: str, message: str):
+    """
+    Như process_message nhưng trả về kết quả so khớp đầy đủ
+    Returns:
+        (room_id, message_data, result, score_update): result là 'exact' | 'close' | 'miss',
+        score_update là delta bảng điểm cần broadcast (None nếu không ai được cộng điểm)
+    """
     player = data_store.get_player(player_id)
     if not player:
-        return None, None, False
+        return None, None, GUESS_MISS, None
+    if player.touch():
+        data_store.update_player(player)
 
     room_id = player.room_id
     text = (message or "").strip()
     if not text:
-        return room_id, None, False
+        return room_id, None, GUESS_MISS, None
 
     # Chat bình thường
     message_data = {
@@ -42,28 +59,27 @@ def process_message(player_id: str, message: str):
     # Lấy game của phòng
     game = data_store.get_game(room_id)
     if not game:
-        return room_id, message_data, False
+        return room_id, message_data, GUESS_MISS, None
 
-    # Debug đoán từ
-    print(
-        "[GUESS DEBUG]",
-        "room:", room_id,
-        "| player:", player.name,
-        "| guess:", repr(text),
-        "| current_word:", repr(game.current_word),
-        "| state:", getattr(game, "state", None),
-        "| timer:", getattr(game, "timer", None),
+    # Debug đoán từ (DEBUG + sampling theo LOG_SAMPLE, ghi ở thread nền)
+    log.debug(
+        "guess",
+        room=room_id,
+        player=player.name,
+        guess=text,
+        current_word=game.current_word,
+        state=getattr(game, "state", None),
+        timer=getattr(game, "timer", None),
     )
 
     if getattr(game, "state", None) != "playing":
-        return room_id, message_data, False
+        return room_id, message_data, GUESS_MISS, None
     drawer_id = getattr(game, "drawer_id", None) or getattr(
         game, "current_drawer_id", None
     )
     if player_id == drawer_id:
         # người vẽ chat từ khoá vẫn chỉ là chat thường
-        return room_id, message_data, False
-    is_correct = game_handler.check_guess(room_id, player_id, text)
-
-    return room_id, message_data, bool(is_correct)
+        return room_id, message_data, GUESS_MISS, None
+    result, score_update = game_handler.match_guess(room_id, player_id, text)
 
+    return room_id, message_data, result, score_update
@@ -21,6 +21,9 @@ def get_player_room(player_id):
     """
     player = data_store.get_player(player_id)
     if player:
+        # Mốc hoạt động cho reaper (chỉ ghi lại vài chục giây một lần)
+        if player.touch():
+            data_store.update_player(player)
         return player.room_id
     return None
 
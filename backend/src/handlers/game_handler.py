@@ -11,12 +11,26 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from storage import data_store
-from models.game import Game
-from utils.word_list import load_word_list  # ← DÙNG UTIL ĐÃ VIẾT
-
-from config.constants import MIN_PLAYERS_TO_START
-
-def start_game(room_id):
+from models.game import Game, GameState
+from handlers import scoreboard
+from utils.word_list import get_deck
+from utils.guess_matcher import GUESS_EXACT, GUESS_MISS
+
+from config.constants import MIN_PLAYERS_TO_START, ROUNDS_PER_GAME
+
+# Kết quả của advance(): round tiếp theo đã bắt đầu / game đã kết thúc
+NEXT_ROUND = 'round'
+GAME_OVER = 'finished'
+
+def start_game(room_id, rounds=ROUNDS_PER_GAME):
+    """
+    Start a new game: điểm của mọi người về 0, round 1 chưa bắt đầu
+    Args:
+        room_id: Room identifier
+        rounds: Số vòng (mỗi vòng mọi người vẽ 1 lượt)
+    Returns:
+        tuple: (success, error message)
+    """
     room = data_store.get_room(room_id)
     if not room:
         return False, "Room not found"
@@ -25,8 +39,16 @@ def start_game(room_id):
         return False, f"Không đủ người chơi (tối thiểu {MIN_PLAYERS_TO_START})"
 
 
+    if room.touch():
+        data_store.update_room(room)
+
+    for player in data_store.get_players_in_room(room_id):
+        player.score = 0
+        player.reset_round_state()
+        data_store.update_player(player)
+
     game = Game(room_id)
-    game.start_game(room.players)
+    game.start_game(room.players, rounds)
 
     data_store.add_game(game)
     return True, None
@@ -39,17 +61,26 @@ def start_round(room_id):
     if not game or not room:
         return None
 
-    # 🔹 Load word list từ utils/word_list.py
-    word_list = load_word_list()
-    if not word_list:
+    # 🔹 Bộ từ (đã cache) của phòng → không đọc file khi bắt đầu round
+    word_deck = get_deck(room_id)
+    if not word_deck:
         # Không có từ nào → không start round
         return None
 
-    # Game sẽ tự chọn drawer & word từ word_list
-    result = game.start_round(room.players, word_list)
+    # Game sẽ tự chọn drawer & rút word từ deck (không lặp từ)
+    result = game.start_round(room.players, word_deck)
+    game.touch()
+
+    # Ai đã đoán đúng ở round trước lại được đoán
+    for player in data_store.get_players_in_room(room_id):
+        is_drawer = player.id == game.drawer_id
+        if player.guessed_correctly or player.is_drawer != is_drawer:
+            player.reset_round_state()
+            player.set_drawer(is_drawer)
+            data_store.update_player(player)
 
     data_store.add_game(game)
-    return result  # {drawer_id, word}
+    return result  # {drawer_id, word, round, total_rounds}
 
 def end_round(room_id):
     """Finish the round and return the word"""
@@ -58,46 +89,123 @@ def end_round(room_id):
         return None
 
     word = game.end_round()
+    game.touch()
 
     data_store.add_game(game)
     return word
 
-def check_guess(room_id, player_id, guess):
-    """Check if player's guess is correct"""
+def advance(room_id):
+    """
+    Leave the intermission: start the next round, or finish the game after
+    the last round / when too few players are left
+    Returns:
+        tuple: (NEXT_ROUND, round_info) | (GAME_OVER, results) | (None, None)
+               if the game is gone or not between rounds
+    """
     game = data_store.get_game(room_id)
-    if not game:
-        return False
-    is_correct = game.check_guess(guess)
-    if not is_correct:
-        return False
+    if not game or game.state_code != GameState.ROUND_ENDED:
+        return None, None
+
+    if game.has_next_round(data_store.count_players_in_room(room_id)):
+        round_info = start_round(room_id)
+        if round_info:
+            return NEXT_ROUND, round_info
+    return GAME_OVER, finish_game(room_id)
+
+
+def finish_game(room_id):
+    """
+    End the game and rank the players
+    Returns:
+        list: [{id, name, score, rank}] by score (bằng điểm thì cùng hạng)
+    """
+    game = data_store.get_game(room_id)
+    if game:
+        game.finish()
+        game.touch()
+        data_store.add_game(game)
+
+    results = []
+    players = sorted(data_store.get_players_in_room(room_id), key=lambda p: -p.score)
+    for position, player in enumerate(players, 1):
+        if player.is_drawer:
+            player.set_drawer(False)
+            data_store.update_player(player)
+        rank = results[-1]['rank'] if results and results[-1]['score'] == player.score else position
+        results.append({'id': player.id, 'name': player.name, 'score': player.score, 'rank': rank})
+    return results
 
-    
-    calculate_scores(room_id, player_id)
 
-    player = data_store.get_player(player_id)
-    if player:
-        try:
-            player.mark_guessed()
-            data_store.update_player(player)
-        except AttributeError:
-            pass
+def all_guessed(room_id):
+    """Whether every connected guesser of the running round has found the word"""
+    game = data_store.get_game(room_id)
+    if not game or game.state_code != GameState.PLAYING:
+        return False
+    return game.all_guessed(data_store.get_players_in_room(room_id))
 
-    return True
+
+def check_guess(room_id, player_id, guess):
+    """Check if player's guess is correct"""
+    result, _ = match_guess(room_id, player_id, guess)
+    return result == GUESS_EXACT
+
+
+def match_guess(room_id, player_id, guess):
+    """
+    Classify a guess and score it when exact
+    Returns:
+        tuple: (result: 'exact' | 'close' | 'miss',
+                score_update: scoreboard delta to broadcast, None if nothing scored)
+    """
+    # Hai người đoán đúng cùng lúc không được cộng điểm đè lên nhau
+    with data_store.transaction(room_id):
+        game = data_store.get_game(room_id)
+        if not game:
+            return GUESS_MISS, None
+        result = game.match_guess(guess)
+        if result != GUESS_EXACT:
+            return result, None
+
+        player = data_store.get_player(player_id)
+        if player and player.guessed_correctly:
+            # Đã đoán đúng trong round này → không cộng điểm lần nữa
+            return result, None
+
+        changes = calculate_scores(room_id, player_id)
+
+        player = data_store.get_player(player_id)
+        if player:
+            try:
+                player.mark_guessed()
+                data_store.update_player(player)
+            except AttributeError:
+                pass
+
+        # Version tăng cùng transaction với điểm → thứ tự version khớp thứ tự cộng điểm
+        score_update = scoreboard.record(room_id, changes) if changes else None
+
+    return result, score_update
 
 def calculate_scores(room_id, guesser_id):
-    """Add points for drawer and guesser"""
+    """
+    Add points for drawer and guesser
+    Returns:
+        list: scoreboard rows of the players whose score changed (empty if none)
+    """
     game = data_store.get_game(room_id)
     if not game:
-        return False
+        return []
 
     drawer_id = getattr(game, "current_drawer_id", None) or getattr(game, "drawer_id", None)
     if not drawer_id:
-        return False
+        return []
 
     drawer = data_store.get_player(drawer_id)
     guesser = data_store.get_player(guesser_id)
     if not drawer or not guesser:
-        return False
+        return []
+
+    before = {drawer.id: drawer.score, guesser.id: guesser.score}
 
     # Hàm này sẽ tự cộng điểm cho drawer & guesser
     game.calculate_scores(drawer, guesser)
@@ -107,13 +215,27 @@ def calculate_scores(room_id, guesser_id):
     if guesser:
         data_store.update_player(guesser)
 
-    return True
-
-def update_timer(room_id, seconds):
-    """Update countdown timer"""
+    return [
+        scoreboard.change_row(
+            player.id,
+            delta=player.score - before[player.id],
+            score=player.score,
+            flags=(scoreboard.FLAG_GUESSED,) if player is guesser else (),
+        )
+        for player in (guesser, drawer)
+    ]
+
+def update_timer(room_id, seconds, round_no=None):
+    """
+    Update countdown timer
+    Args:
+        round_no: Round của tick; tick cũ (round đã kết thúc sớm) trả về None
+    """
     game = data_store.get_game(room_id)
     if not game:
         return None
+    if round_no is not None and (game.current_round != round_no or game.state_code != GameState.PLAYING):
+        return None
 
     game.timer = seconds
     data_store.add_game(game)
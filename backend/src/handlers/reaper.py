@@ -0,0 +1,211 @@
+"""
+Reaper
+Dọn phòng / player / game không còn hoạt động để process chạy lâu không
+phình bộ nhớ:
+- player: socket đã mất mà không có 'disconnect' (mốc hoạt động cũ và sid
+  không còn kết nối)
+- room: không ai join/rời/vẽ/chat quá TTL (phòng chờ có TTL ngắn hơn)
+- game: vẫn còn trong data_store sau khi phòng đã bị xoá
+
+Mỗi object được track một lần (lúc tạo / join) với hạn = mốc + TTL trong
+một heap. Mỗi tick chỉ pop các entry đã tới hạn rồi đọc lại mốc
+last_active_ts trên object: còn hoạt động thì hẹn lại theo mốc mới, hết hạn
+thì trả về cho app.py đóng phòng / bỏ player. touch() không đụng tới heap, nên
+chi phí là O(entry tới hạn) mỗi tick (mỗi object còn sống bị xét lại nhiều
+nhất 1 lần mỗi TTL), không duyệt toàn bộ state.
+
+    REAPER_TTLS="player=300,room=1800,room.waiting=600,game=600"   (0 = không dọn)
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from config.constants import REAPER_TTLS, REAPER_BATCH
+from models.game import GameState
+from models.room import RoomState
+from storage import data_store
+from utils import metrics
+
+KIND_PLAYER = 'player'
+KIND_ROOM = 'room'
+KIND_GAME = 'game'
+
+REASON_ORPHAN = 'orphan'   # player mất socket / game mất phòng
+REASON_IDLE = 'idle'
+REASON_EMPTY = 'empty'     # phòng không còn player nào trong store
+
+REAPER_EVICTIONS_TOTAL = 'drawguess_reaper_evictions_total'
+metrics.registry.describe(
+    REAPER_EVICTIONS_TOTAL, 'counter',
+    'Objects evicted by the TTL reaper, by kind (room|player|game) and reason (orphan|idle|empty)',
+)
+
+
+def _room_active(room):
+    """Phòng đang chơi: game đang chạy / nghỉ giữa 2 round (game_handler không đổi Room.state_code)."""
+    if room.state_code != RoomState.WAITING:
+        return True
+    game = data_store.get_game(room.id)
+    return game is not None and game.state_code in (GameState.PLAYING, GameState.ROUND_ENDED)
+
+
+class Reaper:
+    """
+    Expiry heap over last-activity timestamps
+
+    Attributes:
+        ttls (dict): {'player', 'room', 'room.waiting', 'game'} -> seconds (0 = never)
+        batch (int): Max entries popped by one due() call
+        evictions (dict): {(kind, reason): count}
+    """
+    def __init__(self, ttls=None, clock=time.time, is_connected=None, batch=REAPER_BATCH):
+        self.ttls = dict(REAPER_TTLS if ttls is None else ttls)
+        self.clock = clock
+        # sid -> bool: socket còn kết nối với process này không
+        self.is_connected = is_connected or (lambda sid: False)
+        self.batch = max(1, batch)
+        self.evictions = {}
+        self._heap = []
+        self._armed = {}   # (kind, key) -> hạn của entry còn hiệu lực trong heap
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._labels = {}
+
+    def __len__(self):
+        return len(self._armed)
+
+    def _first_ttl(self, kind):
+        """Shortest enabled TTL of a kind (room: room / room.waiting), 0 if none."""
+        ttls = [self.ttls.get(kind, 0)]
+        if kind == KIND_ROOM:
+            ttls.append(self.ttls.get('room.waiting', 0))
+        ttls = [ttl for ttl in ttls if ttl > 0]
+        return min(ttls) if ttls else 0
+
+    def _arm(self, kind, key, deadline):
+        entry = (kind, key)
+        with self._lock:
+            if entry in self._armed:
+                return
+            self._armed[entry] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._seq), kind, key))
+
+    # ================== TRACKING ==================
+    def track(self, kind, key):
+        """
+        Start watching an object (no-op if already watched or its TTL is 0)
+        Args:
+            kind: KIND_PLAYER | KIND_ROOM | KIND_GAME
+            key: sid / room_id
+        """
+        ttl = self._first_ttl(kind)
+        if ttl > 0:
+            self._arm(kind, key, self.clock() + ttl)
+
+    def due(self, now=None):
+        """
+        Pop entries whose deadline has passed (tối đa `batch` entry)
+        Returns:
+            list: [(kind, key)] to pass to check(), oldest first
+        """
+        now = self.clock() if now is None else now
+        popped = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now and len(popped) < self.batch:
+                deadline, _, kind, key = heapq.heappop(heap)
+                entry = (kind, key)
+                if self._armed.get(entry) != deadline:
+                    continue
+                del self._armed[entry]
+                popped.append(entry)
+        return popped
+
+    # ================== CHECKS ==================
+    def check(self, kind, key, now=None):
+        """
+        Re-read an object popped by due(): re-arm it or decide to evict it
+        Args:
+            kind: KIND_PLAYER | KIND_ROOM | KIND_GAME
+            key: sid / room_id
+        Returns:
+            str|None: Eviction reason (caller evicts), None if kept or already gone
+        """
+        now = self.clock() if now is None else now
+        if kind == KIND_PLAYER:
+            reason = self._check_player(key, now)
+        elif kind == KIND_ROOM:
+            reason = self._check_room(key, now)
+        else:
+            reason = self._check_game(key, now)
+        if reason is not None:
+            self._count(kind, reason)
+        return reason
+
+    def _keep(self, kind, key, deadline, now, ttl):
+        # Đã quá hạn mà vẫn giữ (vd. socket còn sống) → xét lại sau 1 TTL nữa
+        self._arm(kind, key, deadline if deadline > now else now + ttl)
+
+    def _check_player(self, sid, now):
+        player = data_store.get_player(sid)
+        ttl = self.ttls.get(KIND_PLAYER, 0)
+        if player is None or ttl <= 0:
+            return None
+        deadline = player.last_active_ts + ttl
+        if deadline > now or self.is_connected(sid):
+            self._keep(KIND_PLAYER, sid, deadline, now, ttl)
+            return None
+        return REASON_ORPHAN
+
+    def _check_room(self, room_id, now):
+        room = data_store.get_room(room_id)
+        if room is None:
+            return None
+        ttl = self.ttls.get(KIND_ROOM if _room_active(room) else 'room.waiting', 0)
+        if ttl <= 0:
+            # TTL của trạng thái này tắt → xem lại khi trạng thái có thể đã đổi
+            self.track(KIND_ROOM, room_id)
+            return None
+        # Phòng còn sống nếu chính nó hoặc bất kỳ player nào còn hoạt động
+        players = data_store.get_players_in_room(room_id)
+        last_active = max([room.last_active_ts] + [player.last_active_ts for player in players])
+        deadline = last_active + ttl
+        if deadline > now:
+            self._keep(KIND_ROOM, room_id, deadline, now, ttl)
+            return None
+        return REASON_IDLE if players else REASON_EMPTY
+
+    def _check_game(self, room_id, now):
+        game = data_store.get_game(room_id)
+        ttl = self.ttls.get(KIND_GAME, 0)
+        if game is None or ttl <= 0:
+            return None
+        if data_store.get_room(room_id) is None:
+            return REASON_ORPHAN
+        # Game của phòng còn sống bị dọn cùng phòng → chỉ xem lại sau mỗi TTL
+        self._keep(KIND_GAME, room_id, game.last_active_ts + ttl, now, ttl)
+        return None
+
+    def _count(self, kind, reason):
+        key = (kind, reason)
+        self.evictions[key] = self.evictions.get(key, 0) + 1
+        labels = self._labels.get(key)
+        if labels is None:
+            labels = self._labels.setdefault(key, (('kind', kind), ('reason', reason)))
+        metrics.inc(REAPER_EVICTIONS_TOTAL, labels)
+
+
+def parse_ttls(spec, defaults=REAPER_TTLS):
+    """'player=300,room.waiting=0' → defaults với các TTL được ghi đè (giây, 0 = không dọn)"""
+    ttls = dict(defaults)
+    for item in (spec or '').split(','):
+        name, sep, value = item.partition('=')
+        name = name.strip()
+        if not sep or not name:
+            continue
+        try:
+            ttls[name] = max(0.0, float(value))
+        except ValueError:
+            continue
+    return ttls
@@ -2,7 +2,6 @@
 Room Handler
 Manages room creation, joining, and leaving operations
 """
-import uuid
 import sys
 import os
 
@@ -12,6 +11,28 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from models.room import Room
 from models.player import Player
 from storage import data_store
+from utils.word_list import release_deck
+from utils.room_ids import RoomIdAllocator
+
+
+def _sequence_name(shard):
+    return 'room_id' if shard is None else f'room_id:{shard}'
+
+
+_room_ids = RoomIdAllocator(next_value=lambda: data_store.next_sequence(_sequence_name(None)))
+
+
+def configure_room_ids(key, shard=None):
+    """
+    Set the room ID permutation key and optional shard prefix
+    Args:
+        key: Secret (mọi process dùng chung state phải dùng cùng key)
+        shard: One [A-Z0-9] character fixed as the first ID character, or None
+    """
+    global _room_ids
+    name = _sequence_name(shard)
+    _room_ids = RoomIdAllocator(key=key, shard=shard,
+                                next_value=lambda: data_store.next_sequence(name))
 
 
 def create_room(host_id):
@@ -22,12 +43,15 @@ def create_room(host_id):
     Returns:
         str: Room ID of created room
     """
-    room_id = str(uuid.uuid4())[:6].upper()
+    with data_store.transaction():
+        # ID không trùng cho tới khi bộ đếm quay vòng; kiểm tra thêm để
+        # add_room không bao giờ ghi đè một phòng còn sống
+        room_id = _room_ids.allocate(in_use=data_store.get_room)
 
-    # Tạo Room với host_id
-    room = Room(room_id, host_id)
+        # Tạo Room với host_id
+        room = Room(room_id, host_id)
 
-    data_store.add_room(room)
+        data_store.add_room(room)
     return room_id
 
 
@@ -42,27 +66,31 @@ def add_player_to_room(room_id, player_id, player_name):
     Returns:
         tuple: (success: bool, error_message: str|None, room_data: dict|None)
     """
-    # Validate room exists
-    room = data_store.get_room(room_id)
-    if not room:
-        return False, 'Room not found', None
-    old_player = data_store.get_player(player_id)
-    if old_player:
-        old_room_id = old_player.room_id
-        if old_room_id and old_room_id != room_id:
-            old_room = data_store.get_room(old_room_id)
-            if old_room:
-                old_room.remove_player(player_id)
-            # và giữ hoặc xoá player cũ tùy design, ở đây tao xoá luôn cho sạch:
-            data_store.remove_player(player_id)
-    player = Player(player_id, player_name, room_id)
-    
-    # Add player to storage
-    data_store.add_player(player)
-    
-    # Add player to room
-    room.add_player(player_id)
-    
+    with data_store.transaction(room_id):
+        # Validate room exists
+        room = data_store.get_room(room_id)
+        if not room:
+            return False, 'Room not found', None
+        old_player = data_store.get_player(player_id)
+        if old_player:
+            old_room_id = old_player.room_id
+            if old_room_id and old_room_id != room_id:
+                old_room = data_store.get_room(old_room_id)
+                if old_room:
+                    old_room.remove_player(player_id)
+                    data_store.update_room(old_room)
+                # và giữ hoặc xoá player cũ tùy design, ở đây tao xoá luôn cho sạch:
+                data_store.remove_player(player_id)
+        player = Player(player_id, player_name, room_id)
+
+        # Add player to storage
+        data_store.add_player(player)
+
+        # Add player to room
+        room.add_player(player_id)
+        room.touch()
+        data_store.update_room(room)
+
     # Get all players in room for response
     players_list = get_room_players(room_id)
     
@@ -82,30 +110,89 @@ def remove_player_from_room(player_id):
     Returns:
         tuple: (room_id: str|None, player_name: str|None)
     """
-    # Get player
     player = data_store.get_player(player_id)
     if not player:
         return None, None
-    
-    room_id = player.room_id
-    player_name = player.name
-    
-    # Get room
-    room = data_store.get_room(room_id)
-    if room:
-        # Remove player from room
-        room.remove_player(player_id)
-        
-        # Remove empty rooms
-        if room.get_player_count() == 0:
-            data_store.remove_room(room_id)
-    
-    # Remove player from storage
-    data_store.remove_player(player_id)
-    
+
+    with data_store.transaction(player.room_id):
+        # Đọc lại dưới lock của phòng (process khác có thể vừa sửa player)
+        player = data_store.get_player(player_id)
+        if not player:
+            return None, None
+
+        room_id = player.room_id
+        player_name = player.name
+
+        # Get room
+        room = data_store.get_room(room_id)
+        room_gone = False
+        if room:
+            # Remove player from room
+            room.remove_player(player_id)
+
+            # Remove empty rooms (cùng game của phòng, không để lại game trong data_store)
+            if room.get_player_count() == 0:
+                data_store.remove_room(room_id)
+                data_store.remove_game(room_id)
+                room_gone = True
+            else:
+                room.touch()
+                data_store.update_room(room)
+
+        # Remove player from storage
+        data_store.remove_player(player_id)
+
+    if room_gone:
+        release_deck(room_id)
+
     return room_id, player_name
 
 
+def mark_disconnected(player_id):
+    """
+    Keep a player whose socket dropped, marked offline (grace period chờ resume)
+    Args:
+        player_id: Player identifier (socket_id vừa disconnect)
+    Returns:
+        Player object, or None if the player is not in a room
+    """
+    player = data_store.get_player(player_id)
+    if not player or not player.room_id:
+        return None
+
+    with data_store.transaction(player.room_id):
+        player = data_store.get_player(player_id)
+        if not player or not player.room_id or not data_store.get_room(player.room_id):
+            return None
+        player.connected = False
+        data_store.update_player(player)
+    return player
+
+
+def resume_player(old_id, new_id, room_id):
+    """
+    Rebind a player of a room to a new socket (event 'resume')
+    Args:
+        old_id: socket_id cũ (trong resume token)
+        new_id: socket_id mới
+        room_id: Room identifier (trong resume token)
+    Returns:
+        Player object under new_id, or None if the session is gone
+        (hết grace / đã rời phòng) or new_id is already a player
+    """
+    with data_store.transaction(room_id):
+        player = data_store.get_player(old_id)
+        if not player or player.room_id != room_id or not data_store.get_room(room_id):
+            return None
+        if old_id != new_id and data_store.get_player(new_id):
+            return None
+        player = data_store.rename_player(old_id, new_id)
+        player.connected = True
+        player.touch()
+        data_store.update_player(player)
+    return player
+
+
 def get_room_players(room_id):
     """
     Get all players in a room as dictionary list
@@ -147,25 +234,8 @@ def close_room(room_id: str):
     Đóng hẳn 1 room:
     - Xoá room khỏi data_store
     - Xoá toàn bộ player thuộc room đó
-    - (Tuỳ) Xoá luôn game nếu data_store có quản lý game
+    - Xoá luôn game của room
     """
-    room = data_store.get_room(room_id)
-    if not room:
-        return
-
-    # copy list vì room.players sẽ thay đổi khi remove
-    player_ids = list(room.players)
-
-    # Xoá tất cả player thuộc room
-    for pid in player_ids:
-        data_store.remove_player(pid)
-
-    # Nếu data_store có quản lý game, có thể xoá luôn:
-    try:
-        data_store.remove_game(room_id)
-    except Exception:
-        # nếu chưa implement remove_game thì bỏ qua
-        pass
-
-    # Xoá room cuối cùng
-    data_store.remove_room(room_id)
+    # Room, players và game được xoá cùng lúc (atomic với MemoryBackend)
+    data_store.close_room(room_id)
+    release_deck(room_id)
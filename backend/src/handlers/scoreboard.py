@@ -0,0 +1,77 @@
+"""
+Scoreboard
+Bảng điểm gửi theo delta thay vì cả danh sách player.
+
+Mỗi phòng có một version (Room.score_version) tăng 1 sau mỗi thay đổi được
+broadcast (đoán đúng, join, leave, mất kết nối, resume). Event chỉ chứa các dòng thay đổi:
+    {'room_id', 'version', 'changes': [{'id', 'delta', 'score', 'flags'}]}
+Client áp dụng khi version == version của nó + 1; nếu thấy nhảy cóc (mất
+event) thì gửi 'scoreboard_resync' để nhận lại toàn bộ bảng (snapshot).
+Mỗi dòng mang cả điểm tuyệt đối nên áp dụng lại một dòng cũ không làm sai điểm.
+Gọi record() và emit kết quả trên actor của phòng (room_actors trong app.py)
+để các version tới client theo đúng thứ tự tăng dần.
+"""
+from storage import data_store
+
+FLAG_JOINED = 'joined'
+FLAG_LEFT = 'left'
+FLAG_GUESSED = 'guessed'
+FLAG_DISCONNECTED = 'disconnected'  # mất kết nối, đang chờ resume
+FLAG_RESUMED = 'resumed'            # id mới của player ở 'previous_id'
+
+
+def change_row(player_id, delta=0, score=None, flags=(), name=None, previous_id=None):
+    """
+    Build one changed row
+    Args:
+        player_id: Player identifier
+        delta: Points gained by this change
+        score: Score after the change (None for players who left)
+        flags: FLAG_* values describing the change
+        name: Display name (only needed for joined / resumed players)
+        previous_id: Old identifier of a resumed player
+    Returns:
+        dict: {'id', 'delta', 'score', 'flags'[, 'name'][, 'previous_id']}
+    """
+    row = {'id': player_id, 'delta': delta, 'score': score, 'flags': list(flags)}
+    if name is not None:
+        row['name'] = name
+    if previous_id is not None:
+        row['previous_id'] = previous_id
+    return row
+
+
+def record(room_id, changes):
+    """
+    Bump the room's scoreboard version for a set of changed rows
+    Args:
+        room_id: Room identifier
+        changes: Rows from change_row()
+    Returns:
+        dict: {'room_id', 'version', 'changes'} to broadcast, None if the room is gone
+    """
+    with data_store.transaction(room_id):
+        room = data_store.get_room(room_id)
+        if not room:
+            return None
+        room.score_version += 1
+        data_store.update_room(room)
+        version = room.score_version
+
+    return {'room_id': room_id, 'version': version, 'changes': changes}
+
+
+def snapshot(room_id):
+    """
+    Full scoreboard at the current version (join / resync)
+    Returns:
+        dict: {'room_id', 'version', 'players'}, None if the room is gone
+    """
+    with data_store.transaction(room_id):
+        room = data_store.get_room(room_id)
+        if not room:
+            return None
+        players = [player.to_dict() for player in data_store.get_players_in_room(room_id)]
+        version = room.score_version
+
+    return {'room_id': room_id, 'version': version, 'players': players}
@@ -0,0 +1,85 @@
+"""
+Stroke Buffer
+Gom các canvas event (start/move/end/color/brush_size) theo phòng
+để app.py flush thành một 'canvas_update' dạng list mỗi tick.
+"""
+import threading
+
+
+class StrokeBuffer:
+    """
+    Per-room buffer of pending canvas events
+
+    Attributes:
+        pending (dict): room_id -> list of (sender_id, event_data), in arrival order
+    """
+    def __init__(self):
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def append(self, room_id, sender_id, event_data):
+        """
+        Queue one canvas event for a room
+        Args:
+            room_id: Room identifier
+            sender_id: Socket id of the drawer (excluded from the broadcast)
+            event_data: Event dict from drawing_handler
+        """
+        with self._lock:
+            events = self.pending.get(room_id)
+            if events is None:
+                events = self.pending[room_id] = []
+            events.append((sender_id, event_data))
+
+    def drain_room(self, room_id):
+        """
+        Take all pending events of one room
+        Args:
+            room_id: Room identifier
+        Returns:
+            list: Batches [(sender_id, [event_data, ...]), ...] in order
+        """
+        with self._lock:
+            events = self.pending.pop(room_id, None)
+        return _group_by_sender(events) if events else []
+
+    def drain(self):
+        """
+        Take pending events of every room
+        Returns:
+            list: [(room_id, [(sender_id, [event_data, ...]), ...]), ...]
+        """
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        return [(room_id, _group_by_sender(events)) for room_id, events in pending.items()]
+
+    def pending_rooms(self):
+        """
+        Rooms that currently have events waiting
+        Returns:
+            list: Room identifiers
+        """
+        with self._lock:
+            return list(self.pending)
+
+    def discard_room(self, room_id):
+        """Drop pending events of a room (room closed)."""
+        with self._lock:
+            self.pending.pop(room_id, None)
+
+
+def _group_by_sender(events):
+    """
+    Split an ordered event list into consecutive runs per sender, so each
+    run can be emitted with skip_sid=sender while keeping global order.
+    """
+    batches = []
+    current_sender = None
+    current = None
+    for sender_id, event_data in events:
+        if sender_id != current_sender or current is None:
+            current_sender = sender_id
+            current = []
+            batches.append((sender_id, current))
+        current.append(event_data)
+    return batches
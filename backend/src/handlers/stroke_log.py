@@ -0,0 +1,151 @@
+"""
+Stroke Log
+Lưu lại nét vẽ của round hiện tại theo phòng để người vào giữa chừng
+(hoặc reconnect) nhận 1 payload replay thay vì canvas trắng.
+
+Mỗi phòng có:
+- tail: các event mới nhất (list dict), giới hạn theo số event
+- snapshot: các event cũ đã được nén bằng utils/stroke_codec (bytes)
+Khi tail đầy sẽ được compaction vào snapshot. Tổng dung lượng mỗi phòng
+bị chặn bởi max_bytes; vượt quá thì ngừng ghi và đánh dấu truncated.
+"""
+import threading
+
+from utils.stroke_codec import encode_events, StrokeCodecError
+from config.constants import STROKE_LOG_MAX_BYTES, STROKE_LOG_COMPACT_EVENTS
+
+# Cận trên số byte một event chiếm sau khi encode (start/move tuyệt đối)
+MAX_ENCODED_EVENT_BYTES = 5
+
+
+class RoomStrokeLog:
+    """
+    Stroke log of one room
+
+    Attributes:
+        snapshot (bytearray): Compacted events (stroke_codec format)
+        tail (list): Recent events not compacted yet
+        truncated (bool): Whether events were dropped because of the cap
+    """
+    __slots__ = ('snapshot', 'tail', 'truncated')
+
+    def __init__(self):
+        self.snapshot = bytearray()
+        self.tail = []
+        self.truncated = False
+
+    def size_bytes(self):
+        """Upper bound of the encoded size (snapshot + tail)."""
+        return len(self.snapshot) + len(self.tail) * MAX_ENCODED_EVENT_BYTES
+
+
+class StrokeLogStore:
+    """
+    Bounded per-room stroke logs
+
+    Attributes:
+        max_bytes (int): Cap of encoded bytes per room
+        compact_every (int): Tail length that triggers compaction
+    """
+    def __init__(self, max_bytes=STROKE_LOG_MAX_BYTES, compact_every=STROKE_LOG_COMPACT_EVENTS):
+        self.max_bytes = max_bytes
+        self.compact_every = compact_every
+        self.logs = {}
+        self._lock = threading.Lock()
+
+    def append(self, room_id, event_data):
+        """
+        Record one canvas event of a room
+        Returns:
+            bool: False if the event was dropped (cap reached / not encodable)
+        """
+        with self._lock:
+            log = self.logs.get(room_id)
+            if log is None:
+                log = self.logs[room_id] = RoomStrokeLog()
+            if log.size_bytes() + MAX_ENCODED_EVENT_BYTES > self.max_bytes:
+                log.truncated = True
+                return False
+            log.tail.append(event_data)
+            if len(log.tail) >= self.compact_every:
+                self._compact(log)
+            return True
+
+    def reset(self, room_id):
+        """Start an empty log (clear_canvas / new round)."""
+        with self._lock:
+            self.logs.pop(room_id, None)
+
+    discard = reset
+
+    def replay(self, room_id):
+        """
+        Build the replay payload of a room
+        Returns:
+            bytes|None: stroke_codec payload, None if nothing was drawn
+        """
+        with self._lock:
+            log = self.logs.get(room_id)
+            if log is None:
+                return None
+            self._compact(log)
+            if not log.snapshot:
+                return None
+            return encode_events([]) + bytes(log.snapshot)
+
+    def stats(self):
+        """
+        Memory accounting over all rooms
+        Returns:
+            dict: {rooms, bytes, max_room_bytes, truncated_rooms}
+        """
+        with self._lock:
+            sizes = [log.size_bytes() for log in self.logs.values()]
+            truncated = sum(1 for log in self.logs.values() if log.truncated)
+        return {
+            'rooms': len(sizes),
+            'bytes': sum(sizes),
+            'max_room_bytes': max(sizes, default=0),
+            'truncated_rooms': truncated,
+        }
+
+    def _compact(self, log):
+        if not log.tail:
+            return
+        events = _drop_superseded_styles(log.tail)
+        log.tail = []
+        try:
+            encoded = encode_events(events)
+        except StrokeCodecError:
+            # Bỏ các event lỗi (toạ độ không hợp lệ...) thay vì mất cả tail
+            encoded = encode_events([e for e in events if _encodable(e)])
+        # Bỏ byte version: mỗi chunk bắt đầu bằng toạ độ tuyệt đối nên nối được
+        log.snapshot += encoded[1:]
+
+
+def _encodable(event_data):
+    try:
+        encode_events([event_data])
+        return True
+    except StrokeCodecError:
+        return False
+
+
+def _drop_superseded_styles(events):
+    """
+    Remove color/brush_size events overridden before any point is drawn
+    (vd: drawer bấm qua nhiều màu liên tiếp).
+    """
+    result = []
+    pending = {}
+    for event_data in events:
+        kind = event_data.get('type')
+        if kind in ('color', 'brush_size'):
+            pending[kind] = event_data
+            continue
+        if pending:
+            result.extend(pending.values())
+            pending = {}
+        result.append(event_data)
+    result.extend(pending.values())
+    return result
@@ -0,0 +1,255 @@
+"""
+Stroke Simplifier
+Bỏ bớt điểm 'move' thừa của nét đang vẽ trước khi broadcast cho cả phòng.
+
+Hai bước, chạy tuần tự trên actor của phòng khi từng event tới:
+1. Lọc khoảng cách: điểm cách điểm trước < tolerance/2 thì bỏ (chỉ nhớ lại làm
+   điểm cuối, gửi khi kết thúc nét)
+2. Douglas–Peucker tăng dần: giữ các điểm từ anchor (điểm gửi gần nhất) tới
+   điểm mới; chừng nào mọi điểm đang giữ còn cách đoạn anchor → điểm mới không
+   quá tolerance/2 thì chúng thừa. Điểm mới làm lệch → gửi điểm ngay trước nó
+   làm anchor mới. Mỗi đoạn gửi đi thoả đúng tiêu chí của RDP.
+Cộng lại, mọi điểm nhận được cách nét gửi đi không quá tolerance.
+
+tolerance = STROKE_SIMPLIFY_TOLERANCE × brush size (nét to thì sai số vài
+pixel không nhìn thấy). Điểm không bị giữ quá STROKE_SIMPLIFY_MAX_HOLD điểm /
+STROKE_SIMPLIFY_MAX_HOLD_MS (tick flush của app.py), và mọi event khác (end, màu, cỡ bút, clear) luôn
+đẩy hết điểm đang giữ ra trước → thứ tự event không đổi.
+"""
+import math
+import threading
+import time
+
+from config.constants import (
+    DEFAULT_BRUSH_SIZE,
+    STROKE_SIMPLIFY_TOLERANCE,
+    STROKE_SIMPLIFY_MAX_HOLD,
+    STROKE_SIMPLIFY_MAX_HOLD_MS,
+)
+from utils import metrics
+
+STROKE_POINTS_IN_TOTAL = 'drawguess_stroke_points_in_total'
+STROKE_POINTS_OUT_TOTAL = 'drawguess_stroke_points_out_total'
+metrics.registry.describe(STROKE_POINTS_IN_TOTAL, 'counter', 'Drawing move points received by the stroke simplifier')
+metrics.registry.describe(STROKE_POINTS_OUT_TOTAL, 'counter', 'Drawing move points forwarded by the stroke simplifier')
+
+
+class _StrokeState:
+    """In-flight stroke of one drawer."""
+    __slots__ = ('brush', 'anchor', 'held', 'skipped', 'held_since')
+
+    def __init__(self, brush=DEFAULT_BRUSH_SIZE):
+        self.brush = brush
+        self.anchor = None     # (x, y) gửi gần nhất
+        self.held = []         # move event chưa gửi (đã qua lọc khoảng cách)
+        self.skipped = None    # move event cuối bị lọc khoảng cách
+        self.held_since = None
+
+
+class StrokeSimplifier:
+    """
+    Per-room, per-drawer point reduction
+
+    Attributes:
+        tolerance (float): Allowed deviation as a fraction of the brush size (0 = tắt)
+        max_hold (int): Points held before the newest one is sent anyway
+        max_hold_seconds (float): Held points older than this are reported by stale_rooms()
+        points_in (int): Move events seen by the simplifier
+        points_out (int): Move events it forwarded
+    """
+    def __init__(self, tolerance=STROKE_SIMPLIFY_TOLERANCE, max_hold=STROKE_SIMPLIFY_MAX_HOLD,
+                 max_hold_ms=STROKE_SIMPLIFY_MAX_HOLD_MS, clock=time.monotonic):
+        self.tolerance = tolerance
+        self.max_hold = max(1, max_hold)
+        self.max_hold_seconds = max_hold_ms / 1000.0
+        self.clock = clock
+        self.points_in = 0
+        self.points_out = 0
+        self.rooms = {}      # room_id -> {sender_id: _StrokeState}
+        self.holding = {}    # (room_id, sender_id) -> state đang giữ điểm
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.tolerance > 0
+
+    def process(self, room_id, sender_id, event_data):
+        """
+        Feed one canvas event of a drawer
+        Args:
+            room_id: Room identifier
+            sender_id: Drawer socket id
+            event_data: Event dict from drawing_handler
+        Returns:
+            list: Events to forward now, in order (có thể rỗng)
+        """
+        kind = event_data.get('type')
+        if not self.enabled or (kind == 'move' and not _is_point(event_data)):
+            return [event_data]
+
+        with self._lock:
+            strokes = self.rooms.get(room_id)
+            state = strokes.get(sender_id) if strokes else None
+            if state is None:
+                if kind not in ('start', 'move', 'brush_size'):
+                    return [event_data]
+                if strokes is None:
+                    strokes = self.rooms[room_id] = {}
+                state = strokes[sender_id] = _StrokeState()
+
+            if kind == 'move':
+                self.points_in += 1
+                metrics.inc(STROKE_POINTS_IN_TOTAL)
+                out = self._add_point(state, event_data)
+            else:
+                out = self._release(state)
+                out.append(event_data)
+                if kind == 'start' and _is_point(event_data):
+                    state.anchor = (event_data['x'], event_data['y'])
+                elif kind == 'brush_size':
+                    size = event_data.get('size')
+                    if isinstance(size, (int, float)) and size > 0:
+                        state.brush = size
+                elif kind in ('end', 'clear'):
+                    state.anchor = None
+
+            if state.held_since is None:
+                self.holding.pop((room_id, sender_id), None)
+            else:
+                self.holding[(room_id, sender_id)] = state
+            forwarded = sum(1 for e in out if e.get('type') == 'move')
+            self._count_out(forwarded)
+        return out
+
+    def _add_point(self, state, event_data):
+        point = (event_data['x'], event_data['y'])
+        if state.anchor is None:
+            # Không thấy 'start' (vd. start bị gộp) → điểm đầu tiên làm anchor
+            state.anchor = point
+            return [event_data]
+
+        # Nửa sai số cho bước lọc, nửa cho RDP → tổng không quá tolerance × brush
+        tolerance = self.tolerance * state.brush / 2
+        held = state.held
+        last_point = (held[-1]['x'], held[-1]['y']) if held else state.anchor
+        if math.dist(point, last_point) < tolerance:
+            state.skipped = event_data
+            if state.held_since is None:
+                state.held_since = self.clock()
+            return []
+        state.skipped = None
+
+        anchor = state.anchor
+        if not all(_segment_distance(p['x'], p['y'], anchor, point) <= tolerance for p in held):
+            # Điểm mới làm lệch → điểm trước nó là đỉnh cần giữ
+            corner = held[-1]
+            state.anchor = (corner['x'], corner['y'])
+            state.held = [event_data]
+            state.held_since = self.clock()
+            return [corner]
+
+        held.append(event_data)
+        if len(held) >= self.max_hold:
+            state.anchor = point
+            state.held = []
+            state.held_since = None
+            return [event_data]
+        if state.held_since is None:
+            state.held_since = self.clock()
+        return []
+
+    def _release(self, state):
+        """Held point (+ last filtered point) to send before any other event."""
+        out = []
+        if state.held:
+            last = state.held[-1]
+            state.anchor = (last['x'], last['y'])
+            out.append(last)
+        if state.skipped is not None:
+            out.append(state.skipped)
+            state.anchor = (state.skipped['x'], state.skipped['y'])
+        state.held = []
+        state.skipped = None
+        state.held_since = None
+        return out
+
+    def release_room(self, room_id):
+        """
+        Flush every held point of a room (tick flush, trước khi clear / replay)
+        Returns:
+            list: [(sender_id, event_data), ...]
+        """
+        released = []
+        with self._lock:
+            for sender_id, state in (self.rooms.get(room_id) or {}).items():
+                if state.held_since is None:
+                    continue
+                self.holding.pop((room_id, sender_id), None)
+                for event_data in self._release(state):
+                    released.append((sender_id, event_data))
+            self._count_out(len(released))
+        return released
+
+    def release_sender(self, room_id, sender_id):
+        """
+        Flush and forget one drawer of a room (rời phòng / mất kết nối / resume sang sid mới)
+        Returns:
+            list: Held events of that drawer, in order
+        """
+        with self._lock:
+            strokes = self.rooms.get(room_id)
+            state = strokes.pop(sender_id, None) if strokes else None
+            if state is None:
+                return []
+            if not strokes:
+                del self.rooms[room_id]
+            self.holding.pop((room_id, sender_id), None)
+            released = self._release(state)
+            self._count_out(len(released))
+        return released
+
+    def stale_rooms(self):
+        """Rooms with points held longer than max_hold_seconds."""
+        deadline = self.clock() - self.max_hold_seconds
+        with self._lock:
+            return list({
+                room_id for (room_id, _), state in self.holding.items()
+                if state.held_since <= deadline
+            })
+
+    def discard_room(self, room_id):
+        """Drop the strokes of a room (room closed)."""
+        with self._lock:
+            for sender_id in self.rooms.pop(room_id, None) or ():
+                self.holding.pop((room_id, sender_id), None)
+
+    def _count_out(self, forwarded):
+        if forwarded:
+            self.points_out += forwarded
+            metrics.inc(STROKE_POINTS_OUT_TOTAL, (), forwarded)
+
+    def stats(self):
+        """{'points_in', 'points_out', 'ratio'}: ratio = out / in"""
+        points_in, points_out = self.points_in, self.points_out
+        return {
+            'points_in': points_in,
+            'points_out': points_out,
+            'ratio': points_out / points_in if points_in else 1.0,
+        }
+
+
+def _is_point(event_data):
+    x, y = event_data.get('x'), event_data.get('y')
+    return isinstance(x, (int, float)) and isinstance(y, (int, float))
+
+
+def _segment_distance(x, y, a, b):
+    """Distance from (x, y) to the segment a-b."""
+    ax, ay = a
+    dx, dy = b[0] - ax, b[1] - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(x - ax, y - ay)
+    t = ((x - ax) * dx + (y - ay) * dy) / length_sq
+    t = 0.0 if t < 0 else 1.0 if t > 1 else t
+    return math.hypot(x - (ax + t * dx), y - (ay + t * dy))
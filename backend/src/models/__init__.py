@@ -3,7 +3,7 @@ Models Module
 Data models for the game
 """
 from .player import Player
-from .room import Room
-from .game import Game
+from .room import Room, RoomState
+from .game import Game, GameState
 
-__all__ = ['Player', 'Room', 'Game']
+__all__ = ['Player', 'Room', 'RoomState', 'Game', 'GameState']
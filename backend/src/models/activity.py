@@ -0,0 +1,29 @@
+"""
+Activity timestamps
+Mốc last_active_ts (reaper) được làm tròn xuống theo ACTIVITY_RESOLUTION_SECONDS
+và mọi object chạm trong cùng khoảng dùng chung một object float → mỗi
+Room / Player / Game chỉ tốn thêm 1 slot (8 bytes) thay vì 1 float (24 bytes).
+"""
+import time
+
+from config.constants import ACTIVITY_RESOLUTION_SECONDS
+
+_current = (None, None)   # (số thứ tự khoảng, mốc float dùng chung)
+
+
+def activity_now(now=None):
+    """
+    Current activity timestamp (epoch seconds, rounded down to the resolution)
+    Args:
+        now: Override for time.time() (tests)
+    Returns:
+        float: Shared timestamp object for the current window
+    """
+    global _current
+    now = time.time() if now is None else now
+    window = now // ACTIVITY_RESOLUTION_SECONDS
+    current_window, value = _current
+    if window != current_window:
+        value = window * ACTIVITY_RESOLUTION_SECONDS
+        _current = (window, value)
+    return value
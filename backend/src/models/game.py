@@ -3,51 +3,111 @@ Game Model - Game State Machine
 TODO: Implement Game class for managing game state and rounds
 (Thành viên 2)
 """
+import itertools
 import random
+from enum import IntEnum
+
 from config.constants import (
     SCORE_CORRECT_GUESS,
     SCORE_DRAWER_WHEN_GUESSED,
     ROUND_TIMER_SECONDS,
+    ROUNDS_PER_GAME,
+    MIN_PLAYERS_TO_START,
 )
+from models.activity import activity_now
+from utils.guess_matcher import GuessMatcher, GUESS_EXACT, GUESS_MISS
+
+
+class GameState(IntEnum):
+    """Game state machine (lưu dạng int, API vẫn dùng chuỗi)"""
+    WAITING = 0
+    PLAYING = 1
+    ROUND_ENDED = 2   # nghỉ giữa 2 round
+    FINISHED = 3
+
+    @property
+    def label(self):
+        return _GAME_STATE_LABELS[self]
+
+
+_GAME_STATE_LABELS = ('waiting', 'playing', 'round_ended', 'finished')
+_GAME_STATE_BY_LABEL = {label: GameState(i) for i, label in enumerate(_GAME_STATE_LABELS)}
+
+
 class Game:
     """
     Manages game state and rounds
-    
+
+    waiting → playing → round_ended → playing → ... → finished
+    Mỗi round 1 người vẽ, lần lượt theo thứ tự join; game kết thúc sau
+    total_rounds round hoặc khi không còn đủ người chơi.
+
     Attributes:
         room_id (str): Associated room ID
-        current_round (int): Current round number
-        state (str): Current game state
+        current_round (int): Current round number (1-based, 0 before the first round)
+        total_rounds (int): Rounds in this game
+        state (str): Current game state ('waiting', 'playing', 'round_ended', 'finished')
+        state_code (GameState): Same state as a small int
         current_word (str): Current word to guess
         drawer_id (str): ID of current drawer
+        drawer_index (int): Join-order position of drawer_id when picked (rotation
+                            tiếp tục đúng chỗ kể cả khi drawer đã rời phòng)
         timer (int): Remaining seconds in current round
+        matcher (GuessMatcher): Normalized current_word, built at start_round
+        last_active_ts (float): Last round start/end or correct guess (epoch seconds, reaper)
     """
+    __slots__ = ('room_id', 'current_round', 'total_rounds', 'state_code', 'current_word', 'drawer_id',
+                 'drawer_index', 'timer', 'matcher', 'last_active_ts')
+
     def __init__(self, room_id):
         self.room_id = room_id
         self.current_round = 0
-        self.state = "waiting"
+        self.total_rounds = 0
+        self.state_code = GameState.WAITING
         self.current_word = None
         self.drawer_id = None
+        self.drawer_index = -1
         self.timer = 0
-        
-    # TODO: Implement methods
-    # - start_game(players)
-    # - start_round(players, word_list)
-    # - end_round()
-    # - select_drawer(players)
-    # - select_word(word_list)
-    # - check_guess(guess, word)
-    # - calculate_scores()
-
-    def start_game(self, players):
+        self.matcher = None
+        self.last_active_ts = activity_now()
+
+    @property
+    def state(self):
+        return self.state_code.label
+
+    @state.setter
+    def state(self, value):
+        self.state_code = _GAME_STATE_BY_LABEL[value] if isinstance(value, str) else GameState(value)
+
+    def touch(self, now=None):
+        """
+        Record activity
+        Returns:
+            bool: True if last_active_ts moved (caller persists the object)
+        """
+        now = activity_now(now)
+        if now == self.last_active_ts:
+            return False
+        self.last_active_ts = now
+        return True
+
+    def start_game(self, players, rounds=ROUNDS_PER_GAME):
         """
         Start game with list of player IDs
+        Args:
+            players: Player IDs in join order
+            rounds: Số vòng; mỗi vòng mọi người vẽ 1 lượt → total_rounds = rounds × số người
         """
-        if len(players) < 2:
+        if len(players) < MIN_PLAYERS_TO_START:
             return False
 
         self.current_round = 1
-        self.state = "playing"
+        self.total_rounds = max(1, rounds) * len(players)
+        self.drawer_id = None
+        self.drawer_index = -1
+        self.state_code = GameState.PLAYING
         return True
+
     def start_round(self, players, word_list):
         """
         Start a new round
@@ -55,46 +115,114 @@ class Game:
         if not players:
             return None
 
-        # select drawer
-        self.drawer_id = self.select_drawer(players)
+        # Round đầu dùng current_round do start_game đặt, các round sau tăng dần
+        if self.state_code == GameState.ROUND_ENDED:
+            self.current_round += 1
 
-        # pick word
+        # select drawer (lần lượt theo thứ tự join)
+        self.drawer_id = self.next_drawer(players)
+
+        # pick word (chuẩn hoá 1 lần cho cả round)
         self.current_word = self.select_word(word_list)
+        self.matcher = GuessMatcher(self.current_word) if self.current_word else None
 
         # set timer
         self.timer = ROUND_TIMER_SECONDS  # default
 
-        self.state = "playing"
+        self.state_code = GameState.PLAYING
         return {
             "drawer_id": self.drawer_id,
-            "word": self.current_word
+            "word": self.current_word,
+            "round": self.current_round,
+            "total_rounds": self.total_rounds,
         }
     def end_round(self):
         """
         End the current round
         """
-        self.state = "round_ended"
+        self.state_code = GameState.ROUND_ENDED
         return self.current_word
+
+    def has_next_round(self, player_count):
+        """
+        Whether another round follows the one that just ended
+        Args:
+            player_count: Players still in the room
+        """
+        return self.current_round < self.total_rounds and player_count >= MIN_PLAYERS_TO_START
+
+    def finish(self):
+        """End the game (hết round hoặc không đủ người)"""
+        self.state_code = GameState.FINISHED
+        self.current_word = None
+        self.matcher = None
+        self.timer = 0
+
+    def next_drawer(self, players):
+        """
+        Next drawer in join order, wrapping around
+        Args:
+            players: Player IDs in join order (PlayerSet / list)
+        Returns:
+            str: Player ID, None if there are no players
+        """
+        order = list(players)
+        if not order:
+            return None
+        try:
+            index = order.index(self.drawer_id) + 1
+        except ValueError:
+            # Drawer trước đã rời phòng → người đứng sau nó giờ nằm ở đúng vị trí cũ
+            index = max(0, self.drawer_index)
+        index %= len(order)
+        self.drawer_index = index
+        return order[index]
+
+    def all_guessed(self, players):
+        """
+        Whether every connected guesser has found the word (kết thúc round sớm)
+        Args:
+            players: Player objects of the room
+        """
+        guessers = [p for p in players if p.id != self.drawer_id and p.connected]
+        return bool(guessers) and all(p.guessed_correctly for p in guessers)
     def select_drawer(self, players):
         """
         Select random drawer from players
         """
-        return random.choice(players) if players else None
+        if not players:
+            return None
+        # players có thể là PlayerSet (không index được) → lấy theo vị trí, không copy
+        return next(itertools.islice(players, random.randrange(len(players)), None))
     def select_word(self, word_list):
         """
-        Select random word from wordlist
+        Select a word: draw from a WordDeck (O(1), no repeats)
+        or pick randomly from a plain list
         """
         if not word_list:
             return None
+        if hasattr(word_list, "draw"):
+            return word_list.draw()
         return random.choice(word_list)
     def check_guess(self, guess: str) -> bool:
         """
-        So sánh guess với current_word (case-insensitive)
+        So sánh guess với current_word (không phân biệt hoa thường / dấu)
         """
-        if not self.current_word:
-            return False
+        return self.match_guess(guess) == GUESS_EXACT
 
-        return guess.strip().lower() == self.current_word.strip().lower()
+    def match_guess(self, guess: str) -> str:
+        """
+        Classify a guess against current_word
+        Returns:
+            str: 'exact' | 'close' | 'miss' (utils/guess_matcher)
+        """
+        if not self.current_word:
+            return GUESS_MISS
+        matcher = self.matcher
+        if matcher is None or matcher.answer != self.current_word:
+            # current_word được gán trực tiếp (không qua start_round)
+            matcher = self.matcher = GuessMatcher(self.current_word)
+        return matcher.match(guess)
     
     def calculate_scores(self, drawer: "Player", guesser: "Player"):
         """
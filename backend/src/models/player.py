@@ -3,6 +3,10 @@ Player Model
 TODO: Implement Player class
 (Thành viên 2)
 """
+import sys
+
+from models.activity import activity_now
+
 
 class Player:
     """
@@ -14,16 +18,24 @@ class Player:
         score (int): Player's current score
         room_id (str): ID of the room player is in
         is_drawer (bool): Whether player is currently drawing
+        last_active_ts (float): Last event received from the player (epoch seconds, reaper)
     """
+    # __slots__: không có __dict__ riêng cho mỗi player (~100k player / process)
+    __slots__ = ('id', 'name', 'score', 'room_id', 'is_drawer', 'guessed_correctly', 'connected',
+                 'last_active_ts')
+
     def __init__(self, player_id, name, room_id):
         self.id = player_id
         self.name = name
         self.score = 0
-        self.room_id = room_id
+        # room_id đến từ data của client (mỗi lần join 1 chuỗi mới) → intern
+        # để mọi player trong phòng dùng chung 1 object
+        self.room_id = sys.intern(room_id) if isinstance(room_id, str) else room_id
 
         self.is_drawer = False
         self.guessed_correctly = False   # NEW: dùng trong check_guess
         self.connected = True            # NEW: offline/online tracking
+        self.last_active_ts = activity_now()
     
     def add_score(self, points):
         """
@@ -40,6 +52,18 @@ class Player:
             is_drawer: Boolean indicating drawer status
         """
         self.is_drawer = is_drawer
+    def touch(self, now=None):
+        """
+        Record activity
+        Returns:
+            bool: True if last_active_ts moved (caller persists the object)
+        """
+        now = activity_now(now)
+        if now == self.last_active_ts:
+            return False
+        self.last_active_ts = now
+        return True
+
     def mark_guessed(self):
         """Mark the player as having guessed correctly."""
         self.guessed_correctly = True
@@ -2,11 +2,58 @@
 Room Model
 Manages game rooms and their players
 """
+import sys
+import time
 from datetime import datetime
+from enum import IntEnum
+
 from config.constants import (
     MAX_PLAYERS_PER_ROOM,
     MIN_PLAYERS_TO_START,
 )
+from models.activity import activity_now
+
+
+class RoomState(IntEnum):
+    """Room lifecycle state (lưu dạng int, API vẫn dùng chuỗi)"""
+    WAITING = 0
+    PLAYING = 1
+    ENDED = 2
+
+    @property
+    def label(self):
+        return _ROOM_STATE_LABELS[self]
+
+
+_ROOM_STATE_LABELS = ('waiting', 'playing', 'ended')
+_ROOM_STATE_BY_LABEL = {label: RoomState(i) for i, label in enumerate(_ROOM_STATE_LABELS)}
+
+
+class PlayerSet(dict):
+    """
+    Insertion-ordered set of player ids (join order)
+
+    Dựa trên dict nên add / discard / membership đều O(1), còn thứ tự join
+    (kế thừa host, chọn drawer) vẫn giữ nguyên. Duyệt trực tiếp không cần copy.
+    """
+    __slots__ = ()
+
+    def __init__(self, player_ids=()):
+        super().__init__(dict.fromkeys(player_ids))
+
+    def add(self, player_id):
+        self[player_id] = None
+
+    def discard(self, player_id):
+        self.pop(player_id, None)
+
+    def first(self):
+        """Earliest joined player id (None if empty)."""
+        return next(iter(self), None)
+
+    def __repr__(self):
+        return f"PlayerSet({list(self)!r})"
+
 
 class Room:
     """
@@ -14,27 +61,48 @@ class Room:
     
     Attributes:
         id (str): Unique room identifier
-        players (list): List of player IDs in the room
-        game_state (str): Current game state
-        created_at (datetime): Room creation timestamp
+        players (PlayerSet): Player IDs in the room, in join order
+        game_state (str): Current game state ('waiting', 'playing', 'ended')
+        state_code (RoomState): Same state as a small int
+        created_ts (float): Room creation time (epoch seconds)
+        created_at (datetime): Room creation timestamp (derived)
+        score_version (int): Scoreboard version, +1 on every broadcast change
+        last_active_ts (float): Last join/leave/game activity (epoch seconds, reaper)
     """
+    __slots__ = ('id', 'host_id', 'players', 'current_game', 'state_code', 'created_ts',
+                 'max_players', 'score_version', 'last_active_ts')
+
     def __init__(self, room_id, host_id):
-        self.id = room_id
+        self.id = sys.intern(room_id)
         self.host_id = host_id              # NEW: chủ phòng
-        self.players = [host_id]            # Host vào trước
+        self.players = PlayerSet((host_id,))  # Host vào trước
         self.current_game = None            # NEW: Game object
-        self.game_state = 'waiting'         # waiting, playing, ended
-        self.created_at = datetime.now()
+        self.state_code = RoomState.WAITING
+        self.created_ts = time.time()
+        self.last_active_ts = activity_now()
 
         self.max_players = MAX_PLAYERS_PER_ROOM               # NEW: giới hạn tối đa
+        self.score_version = 0
     
+    @property
+    def game_state(self):
+        return self.state_code.label
+
+    @game_state.setter
+    def game_state(self, value):
+        self.state_code = _ROOM_STATE_BY_LABEL[value] if isinstance(value, str) else RoomState(value)
+
+    @property
+    def created_at(self):
+        return datetime.fromtimestamp(self.created_ts)
+
     def add_player(self, player_id):
         """Add a player to the room."""
         if len(self.players) >= self.max_players:
             return False
 
         if player_id not in self.players:
-            self.players.append(player_id)
+            self.players.add(player_id)
             return True
 
         return False
@@ -42,15 +110,27 @@ class Room:
     def remove_player(self, player_id):
         """Remove a player from the room."""
         if player_id in self.players:
-            self.players.remove(player_id)
+            self.players.discard(player_id)
 
-            # Nếu host rời → chuyển quyền host cho người tiếp theo
+            # Nếu host rời → chuyển quyền host cho người vào sớm nhất còn lại
             if player_id == self.host_id and self.players:
-                self.host_id = self.players[0]
+                self.host_id = self.players.first()
 
             return True
 
         return False
+    def touch(self, now=None):
+        """
+        Record activity
+        Returns:
+            bool: True if last_active_ts moved (caller persists the object)
+        """
+        now = activity_now(now)
+        if now == self.last_active_ts:
+            return False
+        self.last_active_ts = now
+        return True
+
     def is_host(self, player_id):
         """Check if a player is the room host."""
         return player_id == self.host_id
@@ -66,11 +146,11 @@ class Room:
     def set_game(self, game_obj):
         """Assign a game instance to this room."""
         self.current_game = game_obj
-        self.game_state = "playing"
+        self.state_code = RoomState.PLAYING
 
     def end_game(self):
         self.current_game = None
-        self.game_state = "waiting"
+        self.state_code = RoomState.WAITING
     def to_dict(self, include_players=False):
         data = {
             'id': self.id,
@@ -81,6 +161,6 @@ class Room:
         }
 
         if include_players:
-            data['players'] = self.players
+            data['players'] = list(self.players)
 
         return data
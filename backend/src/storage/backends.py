@@ -0,0 +1,469 @@
+"""
+Storage Backends
+Nơi data_store thực sự lưu rooms / players / games.
+
+- MemoryBackend: dict trong process (mặc định)
+- KeyValueBackend: lưu object đã pickle trên một key-value store dùng chung
+  (Redis, hoặc broker Unix-socket trong storage/message_bus.py) để nhiều
+  server process cùng thấy một trạng thái phòng. Đọc-sửa-ghi Room / Game
+  chỉ an toàn khi giữ lock của phòng trên store (room_lock / transaction).
+- PersistentBackend (storage/persistence.py): MemoryBackend + journal và
+  snapshot trên đĩa, restart process không mất state.
+"""
+import contextlib
+import itertools
+import pickle
+import threading
+
+from config.constants import STORE_LOCK_SECONDS
+from utils.logger import get_logger
+
+log = get_logger('storage')
+
+
+class MemoryBackend:
+    """
+    In-process storage, safe to share between handler threads and the scheduler
+
+    Mọi thao tác chạy dưới một RLock. Các hàm get_all_* / get_players_in_room
+    trả về bản copy nên caller duyệt thoải mái trong khi thread khác ghi.
+    Handler cần đọc-sửa-ghi nhiều bước thì bọc trong ``with transaction():``.
+
+    Attributes:
+        rooms (dict): room_id -> Room
+        players (dict): socket_id -> Player
+        games (dict): room_id -> Game
+        room_players (dict): room_id -> {player_id: None} (ordered set, join order)
+    """
+    def __init__(self):
+        self.rooms = {}
+        self.players = {}
+        self.games = {}
+        self.room_players = {}
+        self.sequences = {}   # name -> giá trị cuối (next_sequence)
+        self.lock = threading.RLock()
+
+    def transaction(self, room_id=None):
+        """Context manager holding the store lock (re-entrant, mọi phòng dùng chung)."""
+        return self.lock
+
+    def room_lock(self, room_id):
+        """
+        Lock serializing one room across processes
+        Trong 1 process actor của phòng đã chạy tuần tự → không cần gì thêm.
+        """
+        return contextlib.nullcontext()
+
+    # Room index helpers (gọi khi đang giữ lock)
+    def _index_player(self, player_id, room_id):
+        if room_id is None:
+            return
+        bucket = self.room_players.get(room_id)
+        if bucket is None:
+            bucket = self.room_players[room_id] = {}
+        bucket[player_id] = None
+
+    def _unindex_player(self, player_id, room_id):
+        # Bucket rỗng bị xoá để index không lớn hơn số phòng còn sống
+        bucket = self.room_players.get(room_id)
+        if bucket is None:
+            return
+        bucket.pop(player_id, None)
+        if not bucket:
+            del self.room_players[room_id]
+
+    # Rooms
+    def get_room(self, room_id):
+        return self.rooms.get(room_id)
+
+    def add_room(self, room):
+        with self.lock:
+            self.rooms[room.id] = room
+
+    def update_room(self, room):
+        # Object đã được sửa tại chỗ, không cần ghi lại
+        pass
+
+    def remove_room(self, room_id):
+        with self.lock:
+            self.rooms.pop(room_id, None)
+            # Bucket của phòng đi cùng phòng (không để lại trong index / snapshot)
+            self.room_players.pop(room_id, None)
+
+    def get_all_rooms(self):
+        with self.lock:
+            return dict(self.rooms)
+
+    def close_room(self, room_id):
+        with self.lock:
+            room = self.rooms.pop(room_id, None)
+            bucket = self.room_players.pop(room_id, {})
+            # Duyệt thẳng index + Room.players (không copy); id trùng ở lần 2 đã bị xoá
+            member_ids = itertools.chain(bucket, room.players if room is not None else ())
+            removed = []
+            for player_id in member_ids:
+                player = self.players.get(player_id)
+                if player is None or player.room_id != room_id:
+                    continue
+                del self.players[player_id]
+                removed.append(player)
+            self.games.pop(room_id, None)
+            return removed
+
+    # Players
+    def get_player(self, player_id):
+        return self.players.get(player_id)
+
+    def add_player(self, player):
+        with self.lock:
+            old = self.players.get(player.id)
+            if old is not None and old.room_id != player.room_id:
+                self._unindex_player(player.id, old.room_id)
+            self.players[player.id] = player
+            self._index_player(player.id, player.room_id)
+
+    def update_player(self, player):
+        self.add_player(player)
+
+    def remove_player(self, player_id):
+        with self.lock:
+            player = self.players.pop(player_id, None)
+            if player is not None:
+                self._unindex_player(player_id, player.room_id)
+
+    def move_player(self, player_id, room_id):
+        with self.lock:
+            player = self.players.get(player_id)
+            if player is None or player.room_id == room_id:
+                return player
+            target = self.rooms.get(room_id)
+            if target is not None and not target.has_player(player_id):
+                if not target.add_player(player_id):
+                    return None  # phòng đích đã đầy
+            source = self.rooms.get(player.room_id)
+            if source is not None:
+                source.remove_player(player_id)
+            self._unindex_player(player_id, player.room_id)
+            player.room_id = room_id
+            self._index_player(player_id, room_id)
+            return player
+
+    def rename_player(self, old_id, new_id):
+        with self.lock:
+            player = self.players.pop(old_id, None)
+            if player is None:
+                return None
+            player.id = new_id
+            self.players[new_id] = player
+            bucket = self.room_players.get(player.room_id)
+            if bucket is not None:
+                self.room_players[player.room_id] = _renamed(bucket, old_id, new_id)
+            room = self.rooms.get(player.room_id)
+            if room is not None:
+                _rename_in_room(room, old_id, new_id)
+            game = self.games.get(player.room_id)
+            if game is not None and game.drawer_id == old_id:
+                game.drawer_id = new_id
+            return player
+
+    def get_all_players(self):
+        with self.lock:
+            return dict(self.players)
+
+    def get_players_in_room(self, room_id):
+        with self.lock:
+            bucket = self.room_players.get(room_id)
+            if not bucket:
+                return []
+            players = self.players
+            return [players[player_id] for player_id in bucket]
+
+    def count_players_in_room(self, room_id):
+        bucket = self.room_players.get(room_id)
+        return len(bucket) if bucket else 0
+
+    def counts(self):
+        """(rooms, players, games) without copying anything (metrics)."""
+        return len(self.rooms), len(self.players), len(self.games)
+
+    # Games
+    def get_game(self, room_id):
+        return self.games.get(room_id)
+
+    def add_game(self, game):
+        with self.lock:
+            self.games[game.room_id] = game
+
+    def remove_game(self, room_id):
+        with self.lock:
+            self.games.pop(room_id, None)
+
+    def next_sequence(self, name):
+        with self.lock:
+            value = self.sequences[name] = self.sequences.get(name, 0) + 1
+            return value
+
+    def clear_all(self):
+        with self.lock:
+            self.rooms.clear()
+            self.players.clear()
+            self.games.clear()
+            self.room_players.clear()
+
+
+def _renamed(ordered, old_id, new_id):
+    """Copy of an ordered id dict with old_id replaced in place."""
+    return {new_id if key == old_id else key: None for key in ordered}
+
+
+def _rename_in_room(room, old_id, new_id):
+    """Swap a player id in Room.players / host_id (giữ thứ tự join)"""
+    if not room.has_player(old_id):
+        return False
+    players = _renamed(room.players, old_id, new_id)
+    room.players.clear()
+    room.players.update(players)
+    if room.host_id == old_id:
+        room.host_id = new_id
+    return True
+
+
+ROOM_LOCK_PREFIX = 'lock:room:'
+ROOMS_KEY = 'rooms'
+PLAYERS_KEY = 'players'
+GAMES_KEY = 'games'
+JOIN_SEQ_KEY = 'room_players:seq'
+ROOM_PLAYERS_PREFIX = 'room_players:'
+SEQUENCE_PREFIX = 'seq:'
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class KeyValueBackend:
+    """
+    Shared storage on a Redis-compatible client
+
+    The client must provide the redis-py methods hget/hmget/hset/hdel/
+    hgetall/hlen/incr/delete/keys/lock (redis.Redis or message_bus.BrokerClient).
+    Objects are pickled; callers write mutated objects back with
+    add_*/update_* (như game_handler vẫn làm với add_game).
+
+    Mỗi lệnh đơn lẻ là atomic trên server, chuỗi đọc-sửa-ghi thì không: 2 process
+    cùng sửa 1 Room / Game sẽ ghi đè nhau. Vì vậy mọi thay đổi của 1 phòng phải
+    chạy dưới room_lock(room_id) — lock trên chính store, giữ qua cả actor của
+    phòng (RoomExecutor guard) và qua transaction(room_id). Lock hết hạn sau
+    STORE_LOCK_SECONDS nếu process giữ nó chết.
+    """
+    def __init__(self, client, lock_seconds=STORE_LOCK_SECONDS):
+        self.client = client
+        self.lock_seconds = lock_seconds
+        self._held = threading.local()   # tên lock thread này đang giữ (re-entrant)
+
+    def transaction(self, room_id=None):
+        """Lock of room_id (phòng mới tạo / không thuộc phòng nào thì không cần lock)."""
+        if room_id is None:
+            return contextlib.nullcontext()
+        return self.room_lock(room_id)
+
+    @contextlib.contextmanager
+    def room_lock(self, room_id):
+        """
+        Lock of one room on the shared store, re-entrant within a thread
+        Raises:
+            TimeoutError: không lấy được lock sau lock_seconds
+        """
+        name = ROOM_LOCK_PREFIX + room_id
+        held = getattr(self._held, 'names', None)
+        if held is None:
+            held = self._held.names = set()
+        if name in held:
+            yield
+            return
+        lock = self.client.lock(name, timeout=self.lock_seconds, blocking_timeout=self.lock_seconds)
+        if not lock.acquire():
+            raise TimeoutError(f"store lock {name} not acquired in {self.lock_seconds}s")
+        held.add(name)
+        try:
+            yield
+        finally:
+            held.discard(name)
+            try:
+                lock.release()
+            except Exception as ex:
+                # Hết hạn trước khi xong → process khác có thể đã sửa phòng song song
+                log.warning('store_lock_expired', lock=name, error=str(ex))
+
+    def _load(self, key, field):
+        raw = self.client.hget(key, field)
+        return pickle.loads(raw) if raw is not None else None
+
+    def _save(self, key, field, obj):
+        self.client.hset(key, field, pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+
+    def _load_all(self, key):
+        return {
+            _text(field): pickle.loads(raw)
+            for field, raw in self.client.hgetall(key).items()
+        }
+
+    # Room index helpers (hash room_players:<room_id> → thứ tự join)
+    def _index_player(self, player_id, room_id):
+        if room_id is None:
+            return
+        self.client.hset(ROOM_PLAYERS_PREFIX + room_id, player_id, self.client.incr(JOIN_SEQ_KEY))
+
+    def _unindex_player(self, player_id, room_id):
+        if room_id is None:
+            return
+        self.client.hdel(ROOM_PLAYERS_PREFIX + room_id, player_id)
+
+    # Rooms
+    def get_room(self, room_id):
+        return self._load(ROOMS_KEY, room_id)
+
+    def add_room(self, room):
+        self._save(ROOMS_KEY, room.id, room)
+
+    update_room = add_room
+
+    def remove_room(self, room_id):
+        self.client.delete(ROOM_PLAYERS_PREFIX + room_id)
+        self.client.hdel(ROOMS_KEY, room_id)
+
+    def get_all_rooms(self):
+        return self._load_all(ROOMS_KEY)
+
+    def close_room(self, room_id):
+        removed = [p for p in self.get_players_in_room(room_id) if p.room_id == room_id]
+        if removed:
+            self.client.hdel(PLAYERS_KEY, *[p.id for p in removed])
+        self.client.delete(ROOM_PLAYERS_PREFIX + room_id)
+        self.client.hdel(GAMES_KEY, room_id)
+        self.client.hdel(ROOMS_KEY, room_id)
+        return removed
+
+    # Players
+    def get_player(self, player_id):
+        return self._load(PLAYERS_KEY, player_id)
+
+    def add_player(self, player):
+        old = self.get_player(player.id)
+        if old is not None and old.room_id != player.room_id:
+            self._unindex_player(player.id, old.room_id)
+        self._save(PLAYERS_KEY, player.id, player)
+        if old is None or old.room_id != player.room_id:
+            self._index_player(player.id, player.room_id)
+
+    update_player = add_player
+
+    def remove_player(self, player_id):
+        player = self.get_player(player_id)
+        if player is not None:
+            self.client.hdel(PLAYERS_KEY, player_id)
+            self._unindex_player(player_id, player.room_id)
+
+    def move_player(self, player_id, room_id):
+        player = self.get_player(player_id)
+        if player is None or player.room_id == room_id:
+            return player
+        target = self.get_room(room_id)
+        if target is not None and not target.has_player(player_id):
+            if not target.add_player(player_id):
+                return None
+            self.add_room(target)
+        source = self.get_room(player.room_id) if player.room_id else None
+        if source is not None and source.remove_player(player_id):
+            self.add_room(source)
+        self._unindex_player(player_id, player.room_id)
+        player.room_id = room_id
+        self._save(PLAYERS_KEY, player_id, player)
+        self._index_player(player_id, room_id)
+        return player
+
+    def rename_player(self, old_id, new_id):
+        player = self.get_player(old_id)
+        if player is None:
+            return None
+        player.id = new_id
+        room_id = player.room_id
+        if room_id is not None:
+            # Giữ nguyên thứ tự join: id mới nhận lại số thứ tự của id cũ
+            seq = self.client.hget(ROOM_PLAYERS_PREFIX + room_id, old_id)
+            if seq is not None:
+                self.client.hset(ROOM_PLAYERS_PREFIX + room_id, new_id, seq)
+                self.client.hdel(ROOM_PLAYERS_PREFIX + room_id, old_id)
+            room = self.get_room(room_id)
+            if room is not None and _rename_in_room(room, old_id, new_id):
+                self.add_room(room)
+            game = self.get_game(room_id)
+            if game is not None and game.drawer_id == old_id:
+                game.drawer_id = new_id
+                self.add_game(game)
+        self._save(PLAYERS_KEY, new_id, player)
+        self.client.hdel(PLAYERS_KEY, old_id)
+        return player
+
+    def get_all_players(self):
+        return self._load_all(PLAYERS_KEY)
+
+    def get_players_in_room(self, room_id):
+        members = self.client.hgetall(ROOM_PLAYERS_PREFIX + room_id)
+        if not members:
+            return []
+        ordered = [_text(pid) for pid, _ in sorted(members.items(), key=lambda item: int(item[1]))]
+        raws = self.client.hmget(PLAYERS_KEY, ordered)
+        return [pickle.loads(raw) for raw in raws if raw is not None]
+
+    def count_players_in_room(self, room_id):
+        return self.client.hlen(ROOM_PLAYERS_PREFIX + room_id)
+
+    def counts(self):
+        return (self.client.hlen(ROOMS_KEY), self.client.hlen(PLAYERS_KEY),
+                self.client.hlen(GAMES_KEY))
+
+    # Games
+    def get_game(self, room_id):
+        return self._load(GAMES_KEY, room_id)
+
+    def add_game(self, game):
+        self._save(GAMES_KEY, game.room_id, game)
+
+    def remove_game(self, room_id):
+        self.client.hdel(GAMES_KEY, room_id)
+
+    def next_sequence(self, name):
+        return int(self.client.incr(SEQUENCE_PREFIX + name))
+
+    def clear_all(self):
+        keys = [ROOMS_KEY, PLAYERS_KEY, GAMES_KEY, JOIN_SEQ_KEY]
+        keys += self.client.keys(ROOM_PLAYERS_PREFIX + '*')
+        self.client.delete(*keys)
+
+
+def create_backend(url=None):
+    """
+    Build a backend from a URL
+    Args:
+        url: '' / None → MemoryBackend
+             'unix:///path/to.sock' → broker của storage/message_bus.py
+             'redis://host:port/db' → Redis (cần package redis)
+             'file:///path/to/dir?fsync=batch' → PersistentBackend (fsync: always | batch | off)
+    Returns:
+        MemoryBackend | KeyValueBackend | PersistentBackend
+    """
+    if not url:
+        return MemoryBackend()
+    if url.startswith('file://'):
+        from urllib.parse import parse_qsl
+        from .persistence import PersistentBackend
+        path, _, query = url[len('file://'):].partition('?')
+        return PersistentBackend(path, **dict(parse_qsl(query)))
+    if url.startswith('unix://'):
+        from .message_bus import BrokerClient
+        return KeyValueBackend(BrokerClient(url))
+    if url.startswith(('redis://', 'rediss://')):
+        import redis
+        return KeyValueBackend(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported state backend URL: {url}")
@@ -1,12 +1,62 @@
 """
 Data Store Module
-Centralized in-memory storage for all game data
+Centralized storage for all game data
+
+Mặc định lưu trong memory của process (MemoryBackend). Đặt biến môi trường
+STATE_BACKEND_URL (unix://... hoặc redis://...) để nhiều server process
+dùng chung trạng thái phòng (xem storage/backends.py).
+
+Luôn đọc / ghi qua các hàm bên dưới: dữ liệu nằm trong backend hiện tại
+(get_backend()), có thể đổi bằng set_backend().
 """
+import os
+
+from .backends import create_backend
+
+_backend = create_backend(os.getenv('STATE_BACKEND_URL'))
+
+
+def get_backend():
+    """
+    Get the active storage backend
+    Returns:
+        MemoryBackend or KeyValueBackend
+    """
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Switch the storage backend (tests / multi-process setups)
+    Args:
+        backend: MemoryBackend or KeyValueBackend
+    """
+    global _backend
+    _backend = backend
+
+
+def transaction(room_id=None):
+    """
+    Hold the store lock for a multi-step read-modify-write (re-entrant)
+    Args:
+        room_id: Phòng bị sửa; trên backend dùng chung đây là lock của phòng đó
+                 trên store (None = không cần lock giữa các process)
+
+    Usage:
+        with data_store.transaction(room_id):
+            room = data_store.get_room(room_id)
+            room.add_player(player_id)
+            data_store.update_room(room)
+    """
+    return _backend.transaction(room_id)
 
-# In-memory storage
-rooms = {}  # room_id -> Room object
-players = {}  # socket_id -> Player object
-games = {}  # room_id -> Game object (for future use)
+
+def room_lock(room_id):
+    """
+    Serialize one room across server processes (guard của actor phòng)
+    No-op trên backend trong process (actor đã chạy tuần tự).
+    """
+    return _backend.room_lock(room_id)
 
 
 # Room operations
@@ -18,7 +68,7 @@ def get_room(room_id):
     Returns:
         Room object or None
     """
-    return rooms.get(room_id)
+    return _backend.get_room(room_id)
 
 
 def add_room(room):
@@ -27,7 +77,16 @@ def add_room(room):
     Args:
         room: Room object
     """
-    rooms[room.id] = room
+    _backend.add_room(room)
+
+
+def update_room(room):
+    """
+    Persist changes made to a room object (no-op for in-memory storage)
+    Args:
+        room: Room object
+    """
+    _backend.update_room(room)
 
 
 def remove_room(room_id):
@@ -36,17 +95,29 @@ def remove_room(room_id):
     Args:
         room_id: Room identifier
     """
-    if room_id in rooms:
-        del rooms[room_id]
+    # Index bucket của phòng bị xoá cùng lúc; Player còn trỏ tới phòng này
+    # không còn được liệt kê (dùng close_room để xoá luôn player)
+    _backend.remove_room(room_id)
 
 
 def get_all_rooms():
     """
     Get all rooms
     Returns:
-        Dictionary of all rooms
+        Dictionary of all rooms (snapshot)
     """
-    return rooms
+    return _backend.get_all_rooms()
+
+
+def close_room(room_id):
+    """
+    Remove a room together with its players and game in one step
+    Args:
+        room_id: Room identifier
+    Returns:
+        list: Player objects that were removed
+    """
+    return _backend.close_room(room_id)
 
 
 # Player operations
@@ -58,7 +129,7 @@ def get_player(player_id):
     Returns:
         Player object or None
     """
-    return players.get(player_id)
+    return _backend.get_player(player_id)
 
 
 def add_player(player):
@@ -67,7 +138,7 @@ def add_player(player):
     Args:
         player: Player object
     """
-    players[player.id] = player
+    _backend.add_player(player)
 
 
 def remove_player(player_id):
@@ -76,17 +147,43 @@ def remove_player(player_id):
     Args:
         player_id: Player identifier
     """
-    if player_id in players:
-        del players[player_id]
+    _backend.remove_player(player_id)
+
+
+def move_player(player_id, room_id):
+    """
+    Move a stored player to another room in one step: room index and the
+    Room objects' player lists are updated together
+    Args:
+        player_id: Player identifier
+        room_id: Target room identifier
+    Returns:
+        Player object, or None if the player does not exist / target room is full
+    """
+    return _backend.move_player(player_id, room_id)
+
+
+def rename_player(old_id, new_id):
+    """
+    Rebind a stored player to a new id (socket mới khi resume session):
+    room index, Room.players (giữ thứ tự join), host_id và drawer của game
+    được đổi cùng lúc
+    Args:
+        old_id: Current player identifier (socket_id cũ)
+        new_id: New player identifier
+    Returns:
+        Player object, or None if old_id does not exist
+    """
+    return _backend.rename_player(old_id, new_id)
 
 
 def get_all_players():
     """
     Get all players
     Returns:
-        Dictionary of all players
+        Dictionary of all players (snapshot)
     """
-    return players
+    return _backend.get_all_players()
 
 
 def get_players_in_room(room_id):
@@ -95,12 +192,44 @@ def get_players_in_room(room_id):
     Args:
         room_id: Room identifier
     Returns:
-        List of Player objects
+        List of Player objects (join order)
+    """
+    return _backend.get_players_in_room(room_id)
+
+
+def count_players_in_room(room_id):
+    """
+    Count stored players in a specific room without building a list
+    Args:
+        room_id: Room identifier
+    Returns:
+        int: Number of players
+    """
+    return _backend.count_players_in_room(room_id)
+
+
+def counts():
+    """
+    Count stored objects in O(1) (metrics scrape)
+    Returns:
+        tuple: (rooms, players, games)
+    """
+    return _backend.counts()
+
+
+def next_sequence(name):
+    """
+    Next value of a named counter, atomic across threads (and across
+    processes on shared backends); clear_all() does not reset it
+    Args:
+        name: Counter name ('room_id'...)
+    Returns:
+        int: 1, 2, 3...
     """
-    return [player for player in players.values() if player.room_id == room_id]
+    return _backend.next_sequence(name)
 
 
-# Game operations (for future use)
+# Game operations
 def get_game(room_id):
     """
     Get game by room ID
@@ -109,7 +238,7 @@ def get_game(room_id):
     Returns:
         Game object or None
     """
-    return games.get(room_id)
+    return _backend.get_game(room_id)
 
 
 def add_game(game):
@@ -118,7 +247,7 @@ def add_game(game):
     Args:
         game: Game object
     """
-    games[game.room_id] = game
+    _backend.add_game(game)
 
 
 def remove_game(room_id):
@@ -127,9 +256,20 @@ def remove_game(room_id):
     Args:
         room_id: Room identifier
     """
-    if room_id in games:
-        del games[room_id]
+    _backend.remove_game(room_id)
+
 
 def update_player(player):
-    return 
-   
\ No newline at end of file
+    """
+    Persist changes made to a player object (score, guessed flag...)
+    Args:
+        player: Player object
+    """
+    _backend.update_player(player)
+
+
+def clear_all():
+    """
+    Drop every room, player, game and index entry (used by tests)
+    """
+    _backend.clear_all()
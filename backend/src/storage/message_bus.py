@@ -0,0 +1,382 @@
+"""
+Message Bus
+Pub/sub + key-value dùng chung giữa nhiều server process.
+
+- Broker: server nhỏ trên Unix socket, thay thế Redis khi chạy local
+  (hỗ trợ đúng tập lệnh mà KeyValueBackend và UnixSocketManager cần).
+- BrokerClient: client với tên method giống redis-py (hget, hset, publish,
+  lock...).
+- UnixSocketManager: Socket.IO client manager (PubSubManager) chạy trên broker,
+  để emit từ một process tới được socket gắn vào process khác.
+
+Chạy broker riêng:
+    python -m storage.message_bus /tmp/drawguess.sock
+Rồi start mỗi server với:
+    STATE_BACKEND_URL=unix:///tmp/drawguess.sock
+    MESSAGE_QUEUE_URL=unix:///tmp/drawguess.sock
+"""
+import fnmatch
+import os
+import pickle
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import uuid
+
+import socketio
+
+_HEADER = struct.Struct('>I')
+
+
+def unix_path(url):
+    """'unix:///tmp/x.sock' → '/tmp/x.sock'"""
+    return url[len('unix://'):] if url.startswith('unix://') else url
+
+
+def _send_frame(sock, obj):
+    data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError('broker connection closed')
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv_frame(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return pickle.loads(_recv_exact(sock, size))
+
+
+# ================== BROKER (server) ==================
+class _BrokerState:
+    """Hashes, counters and subscribers held by the broker."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hashes = {}
+        self.counters = {}
+        self.locks = {}        # name -> (token, hết hạn lúc) — như SET NX PX của Redis
+        self.subscribers = {}  # channel -> {handler: send_lock}
+
+    def execute(self, cmd, args):
+        with self.lock:
+            if cmd == 'hget':
+                return self.hashes.get(args[0], {}).get(args[1])
+            if cmd == 'hmget':
+                h = self.hashes.get(args[0], {})
+                return [h.get(field) for field in args[1]]
+            if cmd == 'hset':
+                h = self.hashes.setdefault(args[0], {})
+                created = args[1] not in h
+                h[args[1]] = args[2]
+                return int(created)
+            if cmd == 'hdel':
+                h = self.hashes.get(args[0])
+                if not h:
+                    return 0
+                removed = sum(1 for field in args[1:] if h.pop(field, None) is not None)
+                if not h:
+                    del self.hashes[args[0]]
+                return removed
+            if cmd == 'hgetall':
+                return dict(self.hashes.get(args[0], {}))
+            if cmd == 'hlen':
+                return len(self.hashes.get(args[0], ()))
+            if cmd == 'incr':
+                value = self.counters.get(args[0], 0) + 1
+                self.counters[args[0]] = value
+                return value
+            if cmd == 'delete':
+                removed = 0
+                for key in args:
+                    removed += (self.hashes.pop(key, None) is not None) + (self.counters.pop(key, None) is not None)
+                return removed
+            if cmd == 'keys':
+                names = list(self.hashes) + list(self.counters)
+                return [name for name in names if fnmatch.fnmatchcase(name, args[0])]
+            if cmd == 'lock':
+                # (name, token, ttl giây) → True nếu token giữ lock (lock hết hạn thì lấy lại được)
+                now = time.monotonic()
+                owner = self.locks.get(args[0])
+                if owner is not None and owner[0] != args[1] and owner[1] > now:
+                    return False
+                self.locks[args[0]] = (args[1], now + args[2])
+                return True
+            if cmd == 'unlock':
+                owner = self.locks.get(args[0])
+                if owner is None or owner[0] != args[1]:
+                    return False
+                del self.locks[args[0]]
+                return True
+            if cmd == 'ping':
+                return 'PONG'
+        raise ValueError(f"unknown command {cmd!r}")
+
+    def publish(self, channel, data):
+        with self.lock:
+            targets = list(self.subscribers.get(channel, {}).items())
+        delivered = 0
+        for handler, send_lock in targets:
+            try:
+                with send_lock:
+                    _send_frame(handler.request, ('message', channel, data))
+                delivered += 1
+            except OSError:
+                self.unsubscribe(handler)
+        return delivered
+
+    def subscribe(self, channel, handler):
+        with self.lock:
+            self.subscribers.setdefault(channel, {})[handler] = threading.Lock()
+
+    def unsubscribe(self, handler):
+        with self.lock:
+            for subs in self.subscribers.values():
+                subs.pop(handler, None)
+
+
+class _BrokerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        state = self.server.state
+        try:
+            while True:
+                cmd, args = _recv_frame(self.request)
+                if cmd == 'subscribe':
+                    # Connection này từ giờ chỉ nhận message được push về
+                    state.subscribe(args[0], self)
+                    _send_frame(self.request, ('subscribed', args[0], None))
+                    while self.request.recv(1):
+                        pass
+                    return
+                try:
+                    if cmd == 'publish':
+                        result = state.publish(args[0], args[1])
+                    else:
+                        result = state.execute(cmd, args)
+                    _send_frame(self.request, ('ok', result))
+                except Exception as ex:
+                    _send_frame(self.request, ('error', str(ex)))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            state.unsubscribe(self)
+
+
+class Broker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix-socket pub/sub + hash store (local stand-in for Redis)
+
+    Attributes:
+        path (str): Socket file path
+    """
+    daemon_threads = True
+
+    def __init__(self, path):
+        path = unix_path(path)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.path = path
+        self.state = _BrokerState()
+        super().__init__(path, _BrokerHandler)
+
+    def start(self):
+        """Serve in a daemon thread (in-process broker)."""
+        thread = threading.Thread(
+            target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True
+        )
+        thread.start()
+        return thread
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+# ================== CLIENT ==================
+class BrokerClient:
+    """
+    Broker client with redis-py style methods
+
+    Attributes:
+        path (str): Socket file path
+    """
+    def __init__(self, url):
+        self.path = unix_path(url)
+        self._local = threading.local()
+
+    def _conn(self):
+        # Mỗi thread một connection → không cần lock quanh request/response
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _call(self, cmd, *args):
+        sock = self._conn()
+        try:
+            _send_frame(sock, (cmd, args))
+            status, result = _recv_frame(sock)
+        except (ConnectionError, OSError):
+            self._local.sock = None
+            sock.close()
+            raise
+        if status == 'error':
+            raise RuntimeError(result)
+        return result
+
+    def hget(self, name, key):
+        return self._call('hget', name, key)
+
+    def hmget(self, name, keys):
+        return self._call('hmget', name, list(keys))
+
+    def hset(self, name, key, value):
+        return self._call('hset', name, key, value)
+
+    def hdel(self, name, *keys):
+        return self._call('hdel', name, *keys)
+
+    def hgetall(self, name):
+        return self._call('hgetall', name)
+
+    def hlen(self, name):
+        return self._call('hlen', name)
+
+    def incr(self, name):
+        return self._call('incr', name)
+
+    def delete(self, *names):
+        return self._call('delete', *names)
+
+    def keys(self, pattern='*'):
+        return self._call('keys', pattern)
+
+    def ping(self):
+        return self._call('ping') == 'PONG'
+
+    def lock(self, name, timeout=None, sleep=0.01, blocking_timeout=None):
+        """Lock shared by every client of the broker (like redis-py Redis.lock)."""
+        return BrokerLock(self, name, timeout, sleep, blocking_timeout)
+
+    def publish(self, channel, data):
+        return self._call('publish', channel, data)
+
+    def listen(self, channel):
+        """
+        Subscribe on a dedicated connection and yield published payloads
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        try:
+            _send_frame(sock, ('subscribe', (channel,)))
+            while True:
+                kind, _, data = _recv_frame(sock)
+                if kind == 'message':
+                    yield data
+        finally:
+            sock.close()
+
+
+class LockError(RuntimeError):
+    """Lock could not be acquired in time, or was released while not owned."""
+
+
+class BrokerLock:
+    """
+    Lock on the broker, held under a random token until released or expired
+
+    Attributes:
+        name (str): Lock name
+        timeout (float): Seconds before the broker frees the lock anyway (None = 1 giờ)
+    """
+    def __init__(self, client, name, timeout=None, sleep=0.01, blocking_timeout=None):
+        self.client = client
+        self.name = name
+        self.timeout = timeout if timeout is not None else 3600
+        self.sleep = sleep
+        self.blocking_timeout = blocking_timeout
+        self.token = None
+
+    def acquire(self, blocking=True, blocking_timeout=None):
+        token = uuid.uuid4().hex
+        wait = blocking_timeout if blocking_timeout is not None else self.blocking_timeout
+        deadline = None if wait is None else time.monotonic() + wait
+        while not self.client._call('lock', self.name, token, self.timeout):
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                return False
+            time.sleep(self.sleep)
+        self.token = token
+        return True
+
+    def release(self):
+        token, self.token = self.token, None
+        if token is None or not self.client._call('unlock', self.name, token):
+            raise LockError(f"lock {self.name!r} is not owned")
+
+    def __enter__(self):
+        if not self.acquire():
+            raise LockError(f"could not acquire lock {self.name!r}")
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# ================== SOCKET.IO CLIENT MANAGER ==================
+class UnixSocketManager(socketio.PubSubManager):
+    """
+    Socket.IO client manager backed by the Unix-socket broker
+
+    Dùng như RedisManager: SocketIO(app, client_manager=UnixSocketManager(url))
+    """
+    name = 'unix'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.client = BrokerClient(url)
+
+    def _publish(self, data):
+        return self.client.publish(self.channel, pickle.dumps(data))
+
+    def _listen(self):
+        while True:
+            try:
+                yield from self.client.listen(self.channel)
+            except (ConnectionError, OSError):
+                # Broker restart → thử kết nối lại
+                time.sleep(1)
+
+
+def create_client_manager(url):
+    """
+    Build the Socket.IO client manager for a MESSAGE_QUEUE_URL
+    Returns:
+        (client_manager, message_queue): pass to SocketIO(); both None if url is empty
+    """
+    if not url:
+        return None, None
+    if url.startswith('unix://'):
+        return UnixSocketManager(url), None
+    # redis://, amqp://... → Flask-SocketIO tự tạo RedisManager / KombuManager
+    return None, url
+
+
+if __name__ == '__main__':
+    broker = Broker(sys.argv[1] if len(sys.argv) > 1 else '/tmp/drawguess.sock')
+    print(f"Broker listening on unix://{broker.path}")
+    try:
+        broker.serve_forever()
+    finally:
+        broker.server_close()
@@ -0,0 +1,538 @@
+"""
+Persistence
+MemoryBackend ghi lại mọi thay đổi xuống đĩa để restart process không mất
+phòng / player / điểm:
+
+    STATE_BACKEND_URL=file:///var/lib/drawguess?fsync=batch
+
+- journal: file append-only, mỗi record = 1 lệnh add_* / update_* / remove_* /
+  move / rename / close của data_store (object ghi dạng row gọn bằng marshal,
+  khung [độ dài][crc32] để phát hiện record ghi dở khi crash). Record được gom
+  trong buffer và ghi + fsync theo lô (flush()); fsync=always ghi + fsync ngay
+  trong lệnh, fsync=off không fsync (chỉ an toàn khi process chết, không phải
+  khi máy sập)
+- snapshot: toàn bộ state dạng row, ghi file tạm rồi os.replace (atomic).
+  Lúc snapshot journal chuyển sang segment mới, segment cũ bị xoá sau khi
+  snapshot đã nằm trên đĩa
+- khởi động: mmap snapshot → marshal.loads thẳng từ vùng nhớ map, dựng lại
+  object theo slot, rồi replay các segment journal sau snapshot
+
+Giống KeyValueBackend, chỉ những thay đổi được ghi lại qua add_* / update_*
+mới vào journal; sửa object tại chỗ mà không update_* thì chỉ được lưu ở
+snapshot kế tiếp.
+"""
+import gc
+import marshal
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from operator import attrgetter
+
+from config.constants import JOURNAL_FSYNC, JOURNAL_BATCH_BYTES
+from models.game import Game, GameState
+from models.player import Player
+from models.room import Room, RoomState, PlayerSet
+from .backends import MemoryBackend
+
+FSYNC_ALWAYS = 'always'
+FSYNC_BATCH = 'batch'
+FSYNC_OFF = 'off'
+FSYNC_MODES = (FSYNC_ALWAYS, FSYNC_BATCH, FSYNC_OFF)
+
+SNAPSHOT_NAME = 'snapshot.bin'
+SEGMENT_PREFIX = 'journal-'
+SEGMENT_SUFFIX = '.log'
+
+_FRAME = struct.Struct('>II')                 # độ dài payload, crc32(payload)
+_SNAPSHOT_MAGIC = b'DGSNAP1\n'
+_SNAPSHOT_HEADER = struct.Struct('>8sQI')     # magic, generation, crc32(payload)
+
+# Record journal: (op, *args)
+OP_ROOM = 'r'            # (row)
+OP_DEL_ROOM = 'R'        # (room_id)
+OP_CLOSE_ROOM = 'c'      # (room_id)
+OP_PLAYER = 'p'          # (row)
+OP_DEL_PLAYER = 'P'      # (player_id)
+OP_RENAME = 'n'          # (old_id, new_id)
+OP_GAME = 'g'            # (row)
+OP_DEL_GAME = 'G'        # (room_id)
+OP_SEQUENCE = 's'        # (name, value)
+OP_CLEAR = 'x'           # ()
+
+# ================== ROW CODEC ==================
+# Row = tuple giá trị builtin theo thứ tự field (marshal được, nhỏ hơn pickle
+# và load nhanh hơn ~2 lần). Room.current_game / Game.matcher không lưu.
+ROOM_FIELDS = ('id', 'host_id', 'players', 'state_code', 'created_ts', 'max_players',
+               'score_version', 'last_active_ts')
+PLAYER_FIELDS = ('id', 'name', 'score', 'room_id', 'is_drawer', 'guessed_correctly', 'connected',
+                 'last_active_ts')
+GAME_FIELDS = ('room_id', 'current_round', 'total_rounds', 'state_code', 'current_word', 'drawer_id',
+               'drawer_index', 'timer', 'last_active_ts')
+SCHEMA = (ROOM_FIELDS, PLAYER_FIELDS, GAME_FIELDS)
+
+_player_row = attrgetter(*PLAYER_FIELDS)
+
+
+def encode_room(room):
+    return (room.id, room.host_id, tuple(room.players), int(room.state_code), room.created_ts,
+            room.max_players, room.score_version, room.last_active_ts)
+
+
+def encode_player(player):
+    return _player_row(player)
+
+
+def encode_game(game):
+    return (game.room_id, game.current_round, game.total_rounds, int(game.state_code), game.current_word,
+            game.drawer_id, game.drawer_index, game.timer, game.last_active_ts)
+
+
+# Decode: __new__ rồi unpack row thẳng vào slot (không chạy __init__); thứ tự
+# target phải khớp *_FIELDS ở trên.
+_new = object.__new__
+_intern = sys.intern
+
+
+def decode_room(row):
+    room = _new(Room)
+    (room_id, room.host_id, players, state_code, room.created_ts, room.max_players,
+     room.score_version, room.last_active_ts) = row
+    room.id = _intern(room_id)
+    room.players = PlayerSet(players)
+    room.state_code = RoomState(state_code)
+    room.current_game = None
+    return room
+
+
+def decode_player(row):
+    player = _new(Player)
+    (player.id, player.name, player.score, room_id, player.is_drawer, player.guessed_correctly,
+     player.connected, player.last_active_ts) = row
+    player.room_id = _intern(room_id) if room_id is not None else None
+    return player
+
+
+def decode_game(row):
+    game = _new(Game)
+    (game.room_id, game.current_round, game.total_rounds, state_code, game.current_word,
+     game.drawer_id, game.drawer_index, game.timer, game.last_active_ts) = row
+    game.state_code = GameState(state_code)
+    game.matcher = None   # match_guess dựng lại từ current_word khi cần
+    return game
+
+
+# ================== FILES ==================
+def segment_path(directory, generation):
+    return os.path.join(directory, f"{SEGMENT_PREFIX}{generation:010d}{SEGMENT_SUFFIX}")
+
+
+def list_segments(directory):
+    """Generations of the journal segments in a directory, oldest first."""
+    generations = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            try:
+                generations.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+            except ValueError:
+                continue
+    return sorted(generations)
+
+
+def _fsync_directory(directory):
+    # Tên file mới (os.replace / segment mới) chỉ bền sau khi fsync thư mục
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(directory, generation, payload, sync=True):
+    """
+    Atomically replace the snapshot
+    Args:
+        generation: First journal segment to replay on top of this snapshot
+        payload: marshal-encoded state
+        sync: fsync file + directory before returning
+    """
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, generation, zlib.crc32(payload)))
+        f.write(payload)
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if sync:
+        _fsync_directory(directory)
+
+
+def read_snapshot(directory):
+    """
+    Load the snapshot through mmap (marshal đọc thẳng từ trang đã map, không copy file)
+    Returns:
+        tuple: (generation, state), or (0, None) if there is no snapshot
+    Raises:
+        ValueError: Snapshot is corrupt
+    """
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return 0, None
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _SNAPSHOT_HEADER.size:
+            raise ValueError(f"snapshot {path} is truncated")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                magic, generation, crc = _SNAPSHOT_HEADER.unpack_from(view)
+                payload = view[_SNAPSHOT_HEADER.size:]
+                try:
+                    if magic != _SNAPSHOT_MAGIC or zlib.crc32(payload) != crc:
+                        raise ValueError(f"snapshot {path} is corrupt")
+                    state = marshal.loads(payload)
+                finally:
+                    payload.release()
+            finally:
+                view.release()
+    return generation, state
+
+
+def read_segment(path):
+    """
+    Records of a journal segment
+    Returns:
+        tuple: (records, torn) — torn=True nếu cuối file có record ghi dở
+               (crash giữa chừng), phần đó bị bỏ qua
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    records = []
+    view = memoryview(data)
+    offset, end = 0, len(data)
+    while offset < end:
+        if end - offset < _FRAME.size:
+            return records, True
+        size, crc = _FRAME.unpack_from(view, offset)
+        start = offset + _FRAME.size
+        payload = view[start:start + size]
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            return records, True
+        records.append(marshal.loads(payload))
+        offset = start + size
+    return records, False
+
+
+# ================== JOURNAL ==================
+class Journal:
+    """
+    Append-only, batched journal split into segments (1 segment / snapshot)
+
+    Attributes:
+        generation (int): Segment being written
+        fsync (str): FSYNC_ALWAYS | FSYNC_BATCH | FSYNC_OFF
+        records (int): Records appended since the process started
+        bytes (int): Size of the current segment (kể cả phần còn trong buffer)
+    """
+    def __init__(self, directory, generation, fsync=JOURNAL_FSYNC, batch_bytes=JOURNAL_BATCH_BYTES):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"fsync must be one of {FSYNC_MODES}")
+        self.directory = directory
+        self.generation = generation
+        self.fsync = fsync
+        self.batch_bytes = int(batch_bytes)   # có thể đến từ query của URL
+        self.records = 0
+        self.bytes = 0
+        self._buffer = []
+        self._pending = 0
+        # Thứ tự lock: store lock → _io_lock → _lock
+        self._lock = threading.Lock()       # buffer
+        self._io_lock = threading.Lock()    # file (ghi / fsync / đổi segment)
+        self._file = self._open(generation)
+
+    def _open(self, generation):
+        f = open(segment_path(self.directory, generation), 'ab')
+        if self.fsync != FSYNC_OFF:
+            _fsync_directory(self.directory)
+        return f
+
+    def append(self, record):
+        """Queue one record (fsync=always: ghi + fsync trước khi trả về)"""
+        payload = marshal.dumps(record)
+        frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            self._buffer.append(frame)
+            self._pending += len(frame)
+            self.records += 1
+            self.bytes += len(frame)
+            overflow = self._pending >= self.batch_bytes
+        if self.fsync == FSYNC_ALWAYS:
+            self._write(sync=True)
+        elif overflow:
+            # Buffer quá lớn giữa 2 lần flush → ghi luôn, fsync để flush() lo
+            self._write(sync=False)
+
+    def _write(self, sync):
+        with self._io_lock:
+            with self._lock:
+                data = b''.join(self._buffer)
+                self._buffer = []
+                self._pending = 0
+            if not data or self._file.closed:   # sau close() (tắt process): bỏ
+                return
+            self._file.write(data)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def flush(self):
+        """Write buffered records (+ fsync unless fsync=off). Gọi định kỳ."""
+        self._write(sync=self.fsync != FSYNC_OFF)
+
+    def pending_bytes(self):
+        return self._pending
+
+    def rotate(self):
+        """
+        Flush the current segment and start the next one (gọi khi đang giữ store lock)
+        Returns:
+            int: Generation of the new segment
+        """
+        self.flush()
+        with self._io_lock:
+            self._file.close()
+            self.generation += 1
+            self._file = self._open(self.generation)
+            self.bytes = 0
+        return self.generation
+
+    def close(self):
+        """Flush + close the segment; records appended afterwards are dropped"""
+        self.flush()
+        with self._io_lock:
+            self._file.close()
+
+
+# ================== BACKEND ==================
+class PersistentBackend(MemoryBackend):
+    """
+    MemoryBackend + journal/snapshot in a directory
+
+    Attributes:
+        directory (str): Snapshot + journal segments
+        journal (Journal): Segment being written
+        recovery (dict): What startup loaded: rooms, players, games, records
+                         (journal replayed), torn (segments có record ghi dở), seconds
+    """
+    def __init__(self, directory, fsync=JOURNAL_FSYNC, batch_bytes=JOURNAL_BATCH_BYTES):
+        super().__init__()
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._snapshot_lock = threading.Lock()
+        started = time.perf_counter()
+        generation, records, torn = self._recover()
+        self.recovery = {
+            'rooms': len(self.rooms),
+            'players': len(self.players),
+            'games': len(self.games),
+            'records': records,
+            'torn': torn,
+            'seconds': time.perf_counter() - started,
+        }
+        # Không ghi tiếp vào segment cũ (có thể có đuôi ghi dở) → luôn mở segment mới
+        self.journal = Journal(directory, generation + 1, fsync, batch_bytes)
+
+    # ---------- recovery ----------
+    def _recover(self):
+        # Dựng hàng trăm nghìn object liền nhau: tắt GC vòng (không tạo ra rác
+        # vòng nào) để nó không quét lại cả heap nhiều lần → nhanh ~40%
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._load()
+        finally:
+            if enabled:
+                gc.enable()
+
+    def _load(self):
+        snapshot_generation, state = read_snapshot(self.directory)
+        if state is not None:
+            self._load_state(state)
+        generations = list_segments(self.directory)
+        records = torn = 0
+        for generation in generations:
+            path = segment_path(self.directory, generation)
+            if generation < snapshot_generation:
+                # Crash sau khi ghi snapshot nhưng trước khi kịp xoá segment cũ
+                os.remove(path)
+                continue
+            segment, was_torn = read_segment(path)
+            for record in segment:
+                self._apply(record)
+            records += len(segment)
+            torn += was_torn
+        return max(generations + [snapshot_generation]), records, torn
+
+    def _load_state(self, state):
+        schema, rooms, players, games, index, sequences = state
+        if tuple(map(tuple, schema)) != SCHEMA:
+            raise ValueError("snapshot was written with different model fields")
+        # Điền vào dict có sẵn: data_store giữ alias tới các dict này
+        self.rooms.update((room.id, room) for room in map(decode_room, rooms))
+        self.players.update((player.id, player) for player in map(decode_player, players))
+        self.games.update((game.room_id, game) for game in map(decode_game, games))
+        self.room_players.update((room_id, dict.fromkeys(ids)) for room_id, ids in index)
+        self.sequences.update(sequences)
+
+    def _apply(self, record):
+        """Replay one journal record on the in-memory state (không ghi journal)."""
+        op = record[0]
+        if op == OP_ROOM:
+            MemoryBackend.add_room(self, decode_room(record[1]))
+        elif op == OP_PLAYER:
+            MemoryBackend.add_player(self, decode_player(record[1]))
+        elif op == OP_GAME:
+            MemoryBackend.add_game(self, decode_game(record[1]))
+        elif op == OP_DEL_ROOM:
+            MemoryBackend.remove_room(self, record[1])
+        elif op == OP_DEL_PLAYER:
+            MemoryBackend.remove_player(self, record[1])
+        elif op == OP_DEL_GAME:
+            MemoryBackend.remove_game(self, record[1])
+        elif op == OP_CLOSE_ROOM:
+            MemoryBackend.close_room(self, record[1])
+        elif op == OP_RENAME:
+            MemoryBackend.rename_player(self, record[1], record[2])
+        elif op == OP_SEQUENCE:
+            self.sequences[record[1]] = record[2]
+        elif op == OP_CLEAR:
+            MemoryBackend.clear_all(self)
+
+    # ---------- journaled mutations (ghi journal khi đang giữ store lock → đúng thứ tự) ----------
+    def add_room(self, room):
+        with self.lock:
+            super().add_room(room)
+            self.journal.append((OP_ROOM, encode_room(room)))
+
+    def update_room(self, room):
+        self.add_room(room)
+
+    def remove_room(self, room_id):
+        with self.lock:
+            super().remove_room(room_id)
+            self.journal.append((OP_DEL_ROOM, room_id))
+
+    def close_room(self, room_id):
+        with self.lock:
+            removed = super().close_room(room_id)
+            self.journal.append((OP_CLOSE_ROOM, room_id))
+            return removed
+
+    def add_player(self, player):
+        # update_player của MemoryBackend gọi add_player → cũng vào đây
+        with self.lock:
+            super().add_player(player)
+            self.journal.append((OP_PLAYER, encode_player(player)))
+
+    def remove_player(self, player_id):
+        with self.lock:
+            super().remove_player(player_id)
+            self.journal.append((OP_DEL_PLAYER, player_id))
+
+    def move_player(self, player_id, room_id):
+        with self.lock:
+            before = self.players.get(player_id)
+            source_id = before.room_id if before is not None else None
+            player = super().move_player(player_id, room_id)
+            if player is not None and source_id != room_id:
+                self.journal.append((OP_PLAYER, encode_player(player)))
+                for changed_id in (source_id, room_id):
+                    room = self.rooms.get(changed_id)
+                    if room is not None:
+                        self.journal.append((OP_ROOM, encode_room(room)))
+            return player
+
+    def rename_player(self, old_id, new_id):
+        with self.lock:
+            player = super().rename_player(old_id, new_id)
+            if player is not None:
+                self.journal.append((OP_RENAME, old_id, new_id))
+            return player
+
+    def add_game(self, game):
+        with self.lock:
+            super().add_game(game)
+            self.journal.append((OP_GAME, encode_game(game)))
+
+    def remove_game(self, room_id):
+        with self.lock:
+            super().remove_game(room_id)
+            self.journal.append((OP_DEL_GAME, room_id))
+
+    def next_sequence(self, name):
+        with self.lock:
+            value = super().next_sequence(name)
+            self.journal.append((OP_SEQUENCE, name, value))
+            return value
+
+    def clear_all(self):
+        with self.lock:
+            super().clear_all()
+            self.journal.append((OP_CLEAR,))
+
+    # ---------- durability ----------
+    def flush(self):
+        """Write + fsync the journal buffer (gọi định kỳ, JOURNAL_FLUSH_MS)"""
+        self.journal.flush()
+
+    def snapshot(self):
+        """
+        Write a compact snapshot and drop the journal it covers
+        Chỉ phần chuyển state sang row + đổi segment chạy dưới store lock;
+        marshal + ghi file chạy sau khi đã nhả lock.
+        Returns:
+            dict: rooms, players, games, bytes, paused (giây giữ store lock), seconds
+        """
+        with self._snapshot_lock:
+            started = time.perf_counter()
+            with self.lock:
+                state = (
+                    SCHEMA,
+                    [encode_room(room) for room in self.rooms.values()],
+                    [_player_row(player) for player in self.players.values()],
+                    [encode_game(game) for game in self.games.values()],
+                    [(room_id, tuple(bucket)) for room_id, bucket in self.room_players.items()],
+                    list(self.sequences.items()),
+                )
+                generation = self.journal.rotate()
+            paused = time.perf_counter() - started
+
+            payload = marshal.dumps(state)
+            write_snapshot(self.directory, generation, payload, sync=self.journal.fsync != FSYNC_OFF)
+            for old in list_segments(self.directory):
+                if old < generation:
+                    os.remove(segment_path(self.directory, old))
+            return {
+                'rooms': len(state[1]),
+                'players': len(state[2]),
+                'games': len(state[3]),
+                'bytes': len(payload),
+                'paused': paused,
+                'seconds': time.perf_counter() - started,
+            }
+
+    def close(self):
+        """Flush + fsync the journal (shutdown)"""
+        self.journal.close()
@@ -0,0 +1,131 @@
+"""
+Guess Matcher
+So khớp câu đoán với từ khóa của round.
+
+Từ khóa được chuẩn hoá một lần khi bắt đầu round (casefold, Unicode NFKD,
+bỏ dấu tiếng Việt, gộp khoảng trắng); mỗi tin nhắn chat chỉ cần chuẩn hoá
+câu đoán rồi so sánh:
+- exact: trùng sau chuẩn hoá ("Con Mèo" == "con meo")
+- close: sai tối đa max_distance ký tự (edit distance, dừng sớm khi vượt)
+- miss: còn lại
+"""
+import unicodedata
+
+from config.constants import GUESS_CLOSE_DISTANCE, GUESS_CLOSE_MIN_LENGTH
+
+GUESS_EXACT = 'exact'
+GUESS_CLOSE = 'close'
+GUESS_MISS = 'miss'
+
+# Bảng bỏ dấu cho str.translate (chạy trong C thay vì duyệt từng ký tự):
+# các khối combining mark mà NFKD tách ra + vài chữ NFKD không tách được (đ/Đ)
+_COMBINING_BLOCKS = ((0x0300, 0x0370), (0x1AB0, 0x1B00), (0x1DC0, 0x1E00),
+                     (0x20D0, 0x2100), (0xFE20, 0xFE30))
+_STRIP_TABLE = {
+    cp: None
+    for lo, hi in _COMBINING_BLOCKS
+    for cp in range(lo, hi)
+    if unicodedata.combining(chr(cp))
+}
+_STRIP_TABLE.update({ord('đ'): 'd', ord('ð'): 'd', ord('ł'): 'l', ord('ø'): 'o'})
+
+
+def normalize(text, strip_diacritics=True):
+    """
+    Normalize a word/guess for comparison
+    Args:
+        text: Raw text
+        strip_diacritics: Remove accents (tiếng Việt gõ không dấu vẫn khớp)
+    Returns:
+        str: casefolded, NFKD, single-spaced text
+    """
+    text = text.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        if strip_diacritics:
+            text = text.translate(_STRIP_TABLE)
+    return ' '.join(text.split())
+
+
+def bounded_distance(a, b, limit):
+    """
+    Levenshtein distance of a and b, or limit + 1 once it exceeds limit
+    Bỏ phần đầu/cuối giống nhau trước, rồi chỉ tính dải |i - j| <= limit
+    và dừng ngay khi cả hàng đều > limit.
+    """
+    too_far = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return too_far
+    start = 0
+    shortest = min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        return len(a) or len(b)
+    if len(a) > len(b):
+        a, b = b, a
+    if limit == 1:
+        # Còn lại đúng 1 ký tự mỗi bên = 1 phép thay; dài hơn là >= 2
+        return 1 if len(b) == 1 else too_far
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        lo = max(1, i - limit)
+        hi = min(len(b), i + limit)
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= limit else too_far
+        best = current[0]
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost if cost < too_far else too_far
+            if cost < best:
+                best = cost
+        if best > limit:
+            return too_far
+        previous = current
+    return previous[len(b)] if previous[len(b)] <= limit else too_far
+
+
+class GuessMatcher:
+    """
+    Matcher built once per round for the current word
+
+    Attributes:
+        answer (str): Word as chosen for the round
+        key (str): Normalized answer
+        max_distance (int): Edit distance still reported as close (0 = tắt)
+    """
+    __slots__ = ('answer', 'key', 'max_distance', 'strip_diacritics')
+
+    def __init__(self, answer, max_distance=GUESS_CLOSE_DISTANCE,
+                 min_length=GUESS_CLOSE_MIN_LENGTH, strip_diacritics=True):
+        self.answer = answer
+        self.strip_diacritics = strip_diacritics
+        self.key = normalize(answer, strip_diacritics)
+        # Từ quá ngắn thì sai 1 ký tự gần như là đoán mò → không báo close
+        self.max_distance = max_distance if len(self.key) >= min_length else 0
+
+    def match(self, guess):
+        """
+        Classify a guess
+        Returns:
+            str: GUESS_EXACT | GUESS_CLOSE | GUESS_MISS
+        """
+        guess = normalize(guess, self.strip_diacritics)
+        key = self.key
+        if guess == key:
+            return GUESS_EXACT
+        if not guess or not self.max_distance:
+            return GUESS_MISS
+        if bounded_distance(guess, key, self.max_distance) <= self.max_distance:
+            return GUESS_CLOSE
+        return GUESS_MISS
@@ -0,0 +1,247 @@
+"""
+Logger
+Log có cấu trúc (JSON lines) được ghi bởi một thread nền.
+
+Handler Socket.IO chỉ kiểm tra level/sampling rồi append một tuple vào deque
+(không format, không I/O, không lock của stdout). Thread ghi log gom hết các
+record đang chờ, format JSON và ghi 1 lần ra file hoặc stdout. Hàng đợi đầy
+thì bỏ record (đếm trong dropped_count()) chứ không chặn handler.
+
+Event nhiều (vd. mỗi tin nhắn chat) có thể lấy mẫu theo tên:
+    LOG_SAMPLE="chat.guess=0.01"  → chỉ giữ ~1% dòng 'guess' của logger 'chat'
+
+Dùng:
+    log = get_logger('chat')
+    log.debug('guess', room=room_id, player=name, guess=text)
+
+Chưa gọi configure_logging() (test, script): chỉ WARNING trở lên, ghi thẳng ra stderr.
+"""
+import atexit
+import collections
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import traceback
+
+from config.constants import LOG_LEVEL, LOG_QUEUE_SIZE, LOG_FLUSH_INTERVAL_MS
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+_LEVEL_NAMES = {DEBUG: 'debug', INFO: 'info', WARNING: 'warning', ERROR: 'error'}
+
+_level = WARNING
+_sample_rates = {}   # (logger, event) -> tỉ lệ giữ lại
+_writer = None
+
+
+def format_record(record):
+    """(ts, level, logger, event, fields, exc_info) → one JSON line"""
+    ts, level, name, event, fields, exc_info = record
+    data = {
+        'ts': round(ts, 3),
+        'level': _LEVEL_NAMES.get(level, str(level)),
+        'logger': name,
+        'event': event,
+    }
+    data.update(fields)
+    if exc_info:
+        data['exc'] = ''.join(traceback.format_exception(*exc_info)).rstrip()
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LogWriter:
+    """
+    Background writer: drains pending records in batches
+
+    Attributes:
+        max_pending (int): Records allowed to wait before new ones are dropped
+        interval (float): Sleep between drains when idle (seconds)
+        dropped (int): Records dropped because the queue was full
+    """
+    def __init__(self, stream, max_pending=LOG_QUEUE_SIZE,
+                 interval=LOG_FLUSH_INTERVAL_MS / 1000.0, owns_stream=False):
+        self.stream = stream
+        self.max_pending = max(1, max_pending)
+        self.interval = interval
+        self.dropped = 0
+        self._owns_stream = owns_stream
+        # deque.append/popleft là atomic → không cần lock giữa handler và writer
+        self._pending = collections.deque()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append(record)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.drain():
+                self._stop.wait(self.interval)
+        self.drain()
+
+    def drain(self):
+        """Write every pending record; returns how many were written."""
+        pending = self._pending
+        lines = []
+        while pending:
+            try:
+                lines.append(format_record(pending.popleft()))
+            except IndexError:
+                break
+        if lines:
+            try:
+                self.stream.write('\n'.join(lines) + '\n')
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+        return len(lines)
+
+    def close(self):
+        """Flush pending records and stop the thread."""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        if self._owns_stream:
+            self.stream.close()
+
+
+class EventLogger:
+    """
+    Logger for named events with keyword fields
+
+    Attributes:
+        name (str): Short logger name ('chat', 'server'...)
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def enabled(self, level):
+        return level >= _level
+
+    def log(self, level, event, exc_info=None, **fields):
+        """
+        Log one event
+        Args:
+            level: DEBUG | INFO | WARNING | ERROR
+            event: Event name (cũng là khoá sampling '<logger>.<event>')
+            exc_info: sys.exc_info() to attach (formatted by the writer)
+            **fields: Extra JSON fields
+        """
+        if level < _level:
+            return
+        if _sample_rates:
+            rate = _sample_rates.get((self.name, event))
+            if rate is not None and random.random() >= rate:
+                return
+        record = (time.time(), level, self.name, event, fields, exc_info)
+        writer = _writer
+        if writer is not None:
+            writer.put(record)
+        else:
+            print(format_record(record), file=sys.stderr)
+
+    def debug(self, event, **fields):
+        self.log(DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        """Error with the exception being handled attached."""
+        self.log(ERROR, event, exc_info=sys.exc_info(), **fields)
+
+
+def get_logger(name):
+    """
+    Get an event logger
+    Args:
+        name: Short logger name
+    Returns:
+        EventLogger
+    """
+    return EventLogger(name)
+
+
+def parse_sample_rates(spec):
+    """
+    'chat.guess=0.01,server.connect=0.5' → {('chat', 'guess'): 0.01, ('server', 'connect'): 0.5}
+    """
+    rates = {}
+    for item in (spec or '').split(','):
+        key, sep, value = item.partition('=')
+        name, dot, event = key.strip().partition('.')
+        if not sep or not dot or not name or not event:
+            continue
+        try:
+            rates[(name, event)] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+def configure_logging(level=LOG_LEVEL, path=None, sample_rates=None, queue_size=LOG_QUEUE_SIZE,
+                      stream=None):
+    """
+    Route all event loggers through the background JSON writer
+    Args:
+        level: Minimum level name or number ('DEBUG', 'INFO'...)
+        path: JSON lines file (None/'' = stream)
+        sample_rates: {(logger, event): keep ratio} (see parse_sample_rates)
+        queue_size: Max records waiting for the writer before dropping
+        stream: Output stream when path is empty (default sys.stdout)
+    """
+    global _level, _writer
+    shutdown_logging()
+
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = logging.getLevelName(LOG_LEVEL)
+    _level = level
+    _sample_rates.clear()
+    _sample_rates.update(sample_rates or {})
+
+    if path:
+        _writer = LogWriter(open(path, 'a', encoding='utf-8'), queue_size, owns_stream=True)
+    else:
+        _writer = LogWriter(stream or sys.stdout, queue_size)
+
+
+def shutdown_logging():
+    """Flush pending records and stop the writer (later events go to stderr)."""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+
+def reset_logging():
+    """Back to the unconfigured defaults (WARNING to stderr, no sampling)."""
+    global _level
+    shutdown_logging()
+    _level = WARNING
+    _sample_rates.clear()
+
+
+def dropped_count():
+    """Records dropped because the queue was full."""
+    return _writer.dropped if _writer else 0
+
+
+atexit.register(shutdown_logging)
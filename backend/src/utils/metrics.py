@@ -0,0 +1,333 @@
+"""
+Metrics
+Counter / histogram / gauge xuất ra dạng text của Prometheus (GET /metrics).
+
+Ghi metric không dùng lock: mỗi thread cộng vào shard riêng của nó
+(threading.local), chỉ lúc scrape mới gộp các shard lại. Shard của thread đã
+kết thúc được gộp vào một shard "retired" (lúc scrape, và cả lúc tạo shard
+mới khi danh sách đã gấp đôi lần dọn trước) nên số shard chỉ cỡ số thread
+đang sống dù không ai scrape, và scrape tốn O(số metric × số thread), không
+phụ thuộc số phòng hay số event.
+Gauge (số phòng, player...) là callback được gọi lúc scrape.
+
+    metrics.inc('drawguess_socketio_events_total', (('event', 'join_room'),))
+    metrics.observe('drawguess_socketio_handler_seconds', 0.0012, labels)
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+import weakref
+
+# Giây: 50us → 10s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0,
+)
+
+EVENTS_TOTAL = 'drawguess_socketio_events_total'
+HANDLER_ERRORS_TOTAL = 'drawguess_socketio_handler_errors_total'
+HANDLER_SECONDS = 'drawguess_socketio_handler_seconds'
+HANDLER_CPU_SECONDS_TOTAL = 'drawguess_socketio_handler_cpu_seconds_total'
+EMITS_TOTAL = 'drawguess_socketio_emits_total'
+EMIT_BYTES_TOTAL = 'drawguess_socketio_emit_bytes_total'
+
+# Dọn shard của thread đã chết khi số shard chạm ngưỡng này (sau đó ngưỡng =
+# 2 × số shard còn sống): async_handlers=True tạo 1 thread / event
+SHARD_PRUNE_MIN = 64
+
+
+class _Shard:
+    """Counters and histograms written by one thread."""
+    __slots__ = ('thread', 'counters', 'histograms', 'last_emit')
+
+    def __init__(self, thread=None):
+        self.thread = weakref.ref(thread) if thread is not None else None
+        self.counters = {}     # (name, labels) -> value
+        self.histograms = {}   # (name, labels) -> [count per bucket..., +Inf, sum]
+        self.last_emit = None  # labels của packet text gần nhất (cho binary attachment)
+
+    def alive(self):
+        thread = self.thread() if self.thread is not None else None
+        return thread is not None and thread.is_alive()
+
+    def merge_into(self, target):
+        for key, value in self.counters.items():
+            target.counters[key] = target.counters.get(key, 0) + value
+        for key, values in self.histograms.items():
+            merged = target.histograms.get(key)
+            if merged is None:
+                target.histograms[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    merged[i] += value
+
+
+class MetricsRegistry:
+    """
+    Per-thread sharded metrics with Prometheus text rendering
+
+    Attributes:
+        buckets (tuple): Histogram upper bounds (seconds)
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._lock = threading.Lock()      # chỉ khi tạo shard / scrape
+        self._shards = []
+        self._prune_at = SHARD_PRUNE_MIN
+        self._retired = _Shard()
+        self._help = {}                    # name -> (type, help)
+        self._gauges = {}                  # name -> callback
+
+    def describe(self, name, kind, help_text):
+        """Set the # TYPE / # HELP lines of a metric."""
+        self._help[name] = (kind, help_text)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+                if len(self._shards) >= self._prune_at:
+                    self._retire_dead()
+                    self._prune_at = max(SHARD_PRUNE_MIN, 2 * len(self._shards))
+        return shard
+
+    def _retire_dead(self):
+        """Merge shards of finished threads into retired (gọi khi giữ _lock)."""
+        live = []
+        for shard in self._shards:
+            if shard.alive():
+                live.append(shard)
+            else:
+                # Thread đã kết thúc → không còn ghi nữa, gộp hẳn vào retired
+                shard.merge_into(self._retired)
+        self._shards = live
+
+    def inc(self, name, labels=(), value=1):
+        """
+        Add to a counter
+        Args:
+            name: Metric name
+            labels: Tuple of (label, value) pairs (tạo sẵn 1 lần, không tạo mỗi lần gọi)
+            value: Amount to add
+        """
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        """Record one histogram observation."""
+        histograms = self._shard().histograms
+        key = (name, labels)
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0] * (len(self.buckets) + 2)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def gauge(self, name, callback, help_text=''):
+        """
+        Register a gauge computed at scrape time
+        Args:
+            callback: () -> number, hoặc dict {labels tuple: number}
+        """
+        self._gauges[name] = callback
+        self.describe(name, 'gauge', help_text)
+
+    def snapshot(self):
+        """Merge every shard: (counters, histograms)."""
+        with self._lock:
+            self._retire_dead()
+            total = _Shard()
+            self._retired.merge_into(total)
+            for shard in self._shards:
+                # Thread khác có thể đang thêm key → copy trước khi duyệt
+                _frozen(shard).merge_into(total)
+        return total.counters, total.histograms
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        counters, histograms = self.snapshot()
+        lines = []
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name in sorted(by_name):
+            self._header(lines, name, 'counter')
+            for labels, value in sorted(by_name[name]):
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        by_name = {}
+        for (name, labels), values in histograms.items():
+            by_name.setdefault(name, []).append((labels, values))
+        for name in sorted(by_name):
+            self._header(lines, name, 'histogram')
+            for labels, values in sorted(by_name[name]):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), values):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(values[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+        for name in sorted(self._gauges):
+            try:
+                value = self._gauges[name]()
+            except Exception:
+                continue
+            self._header(lines, name, 'gauge')
+            items = value.items() if isinstance(value, dict) else [((), value)]
+            for labels, number in sorted(items):
+                lines.append(f"{name}{_labels(labels)} {_number(number)}")
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines, name, default_kind):
+        kind, help_text = self._help.get(name, (default_kind, ''))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def clear(self):
+        """Drop every recorded value (tests)."""
+        with self._lock:
+            for shard in self._shards + [self._retired]:
+                shard.counters.clear()
+                shard.histograms.clear()
+
+    # ================== SOCKET.IO INSTRUMENTATION ==================
+    def instrument_handler(self, event, fn):
+        """
+        Wrap a Socket.IO handler: count calls/errors, wall time and CPU time
+        Args:
+            event: Event name ('drawing_move'...)
+            fn: Handler function
+        Returns:
+            Wrapped handler
+        """
+        labels = (('event', event),)
+        # Flask-SocketIO thử handler(auth) rồi handler() nếu TypeError → cắt bớt
+        # args thừa ở đây để lỗi TypeError đó không bị đếm là lỗi handler
+        max_args = _max_positional(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            if max_args is not None and len(args) > max_args:
+                args = args[:max_args]
+            start = time.perf_counter()
+            # CPU của thread hiện tại: wall - cpu = thời gian chờ (I/O, lock, bị preempt)
+            cpu_start = time.thread_time()
+            try:
+                return fn(*args)
+            except Exception:
+                self.inc(HANDLER_ERRORS_TOTAL, labels)
+                raise
+            finally:
+                self.inc(HANDLER_CPU_SECONDS_TOTAL, labels, time.thread_time() - cpu_start)
+                self.observe(HANDLER_SECONDS, time.perf_counter() - start, labels)
+                self.inc(EVENTS_TOTAL, labels)
+        return wrapper
+
+    def instrument_engineio(self, eio_server):
+        """
+        Count packets/bytes sent to clients per Socket.IO event
+        Mọi emit (socketio.emit, emit, broadcast tới room) cuối cùng đều đi qua
+        engineio Server.send_packet, mỗi người nhận một lần.
+        """
+        send_packet = eio_server.send_packet
+        cache = {}
+
+        def counted_send_packet(sid, pkt):
+            if pkt.packet_type == _EIO_MESSAGE:
+                self._record_emit(pkt.data, cache)
+            return send_packet(sid, pkt)
+
+        eio_server.send_packet = counted_send_packet
+
+    def _record_emit(self, data, cache):
+        shard = self._shard()
+        if isinstance(data, (bytes, bytearray)):
+            # Binary attachment: cộng bytes vào event của packet header ngay trước
+            labels = shard.last_emit or (('event', '_binary'),)
+            counters = shard.counters
+            key = (EMIT_BYTES_TOTAL, labels)
+            counters[key] = counters.get(key, 0) + len(data)
+            return
+        event = _event_name(data)
+        labels = cache.get(event)
+        if labels is None:
+            labels = cache.setdefault(event, (('event', event),))
+        shard.last_emit = labels
+        counters = shard.counters
+        key = (EMITS_TOTAL, labels)
+        counters[key] = counters.get(key, 0) + 1
+        key = (EMIT_BYTES_TOTAL, labels)
+        # JSON của python-socketio là ensure_ascii → số ký tự = số bytes
+        counters[key] = counters.get(key, 0) + len(data)
+
+
+_EIO_MESSAGE = 4
+
+
+def _event_name(data):
+    """'2["timer_update",{...}]' / '51-["canvas_update",...' → event name"""
+    if data[:1] not in ('2', '5'):
+        return '_control'   # connect / ack / disconnect
+    start = data.find('["')
+    if start < 0:
+        return '_unknown'
+    end = data.find('"', start + 2)
+    return data[start + 2:end] if end > 0 else '_unknown'
+
+
+def _max_positional(fn):
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    if any(p.kind == p.VAR_POSITIONAL for p in params):
+        return None
+    return sum(1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+
+def _frozen(shard):
+    copy = _Shard()
+    copy.counters = dict(shard.counters)
+    copy.histograms = {key: list(values) for key, values in list(shard.histograms.items())}
+    return copy
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    inner = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + inner + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+# Registry dùng chung của process
+registry = MetricsRegistry()
+registry.describe(EVENTS_TOTAL, 'counter', 'Socket.IO events handled, by event')
+registry.describe(HANDLER_ERRORS_TOTAL, 'counter', 'Socket.IO handlers that raised, by event')
+registry.describe(HANDLER_SECONDS, 'histogram', 'Socket.IO handler wall time in seconds, by event')
+registry.describe(HANDLER_CPU_SECONDS_TOTAL, 'counter', 'CPU seconds spent in Socket.IO handlers, by event')
+registry.describe(EMITS_TOTAL, 'counter', 'Socket.IO packets sent to clients (one per recipient), by event')
+registry.describe(EMIT_BYTES_TOTAL, 'counter', 'Socket.IO payload bytes sent to clients, by event')
+
+inc = registry.inc
+observe = registry.observe
+gauge = registry.gauge
+render = registry.render
@@ -0,0 +1,214 @@
+"""
+Profiler
+Sampling profiler bật theo yêu cầu, ghi ra file flamegraph (folded stacks).
+
+Khi không capture thì không có thread nào chạy và handler không bị bọc thêm
+gì → chi phí bằng 0. Khi capture N giây, một thread native lấy
+sys._current_frames() mỗi interval và đếm số lần gặp mỗi stack:
+
+    room-worker-1;_run (room_executor.py:60);handle_guess (app.py:700) 17
+
+Định dạng này dùng trực tiếp được với flamegraph.pl, speedscope, inferno.
+
+mode='cpu' (mặc định) chỉ giữ stack của thread đã tiêu CPU kể từ lần lấy mẫu
+trước (đo bằng CPU clock của từng thread), nên thread đang chờ socket/queue
+không lấp đầy flamegraph. mode='wall' giữ mọi thread.
+
+Với eventlet/gevent, thread lấy mẫu là OS thread thật (không bị monkey patch);
+mọi green thread chạy chung một OS thread nên chỉ thấy stack của green thread
+đang chạy lúc lấy mẫu.
+"""
+import _thread
+import os
+import sys
+import threading
+import time
+
+from config.constants import PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MAX_SECONDS
+from utils.logger import get_logger
+
+log = get_logger('profiler')
+
+MODE_CPU = 'cpu'
+MODE_WALL = 'wall'
+MODES = (MODE_CPU, MODE_WALL)
+
+
+def _native_primitives():
+    """(start_new_thread, sleep) chưa bị eventlet/gevent monkey patch"""
+    patcher = sys.modules.get('eventlet.patcher')
+    if patcher is not None and patcher.is_monkey_patched('thread'):
+        return patcher.original('_thread').start_new_thread, patcher.original('time').sleep
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is not None and monkey.is_module_patched('threading'):
+        return (monkey.get_original('_thread', 'start_new_thread'),
+                monkey.get_original('time', 'sleep'))
+    return _thread.start_new_thread, time.sleep
+
+
+def _thread_cpu_time(ident):
+    """CPU seconds used by a thread, None if the platform cannot tell."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler writing collapsed stacks
+
+    Attributes:
+        interval (float): Seconds between samples
+        max_seconds (float): Upper bound of one capture
+        last_result (dict|None): Summary of the previous capture
+    """
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL_MS / 1000.0, max_seconds=PROFILE_MAX_SECONDS):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._running = None   # dict mô tả capture đang chạy
+        self._stop = False
+        self._labels = {}      # code object -> nhãn frame
+
+    def running(self):
+        return self._running is not None
+
+    def status(self):
+        """{'running': bool, 'current': {...}|None, 'last': {...}|None}"""
+        current = self._running
+        return {
+            'running': current is not None,
+            'current': dict(current) if current else None,
+            'last': self.last_result,
+        }
+
+    def start(self, seconds, path, mode=MODE_CPU):
+        """
+        Capture for a number of seconds in the background
+        Args:
+            seconds: Capture length (cắt về max_seconds)
+            path: Output file (folded stacks)
+            mode: MODE_CPU | MODE_WALL
+        Returns:
+            dict: The capture that was started, None if one is already running
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        seconds = min(max(float(seconds), self.interval), self.max_seconds)
+        with self._lock:
+            if self._running is not None:
+                return None
+            self._stop = False
+            self._running = {'path': path, 'mode': mode, 'seconds': seconds, 'started_at': time.time()}
+            capture = dict(self._running)
+
+        start_new_thread, sleep = _native_primitives()
+        start_new_thread(self._run, (seconds, path, mode, sleep))
+        log.info('profile_started', path=path, mode=mode, seconds=seconds)
+        return capture
+
+    def stop(self):
+        """End the running capture early (the file is still written)."""
+        self._stop = True
+
+    def wait(self, timeout=None):
+        """Block until the running capture has written its file."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._running is not None:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self, seconds, path, mode, sleep):
+        stacks = {}
+        samples = 0
+        try:
+            own = _thread.get_ident()
+            cpu_seen = {}
+            deadline = time.monotonic() + seconds
+            while not self._stop and time.monotonic() < deadline:
+                self.sample(stacks, own, cpu_seen if mode == MODE_CPU else None)
+                samples += 1
+                sleep(self.interval)
+            self.write(stacks, path)
+            self.last_result = {
+                'path': path, 'mode': mode, 'samples': samples,
+                'stacks': len(stacks), 'finished_at': time.time(),
+            }
+            log.info('profile_written', path=path, samples=samples, stacks=len(stacks))
+        except Exception:
+            self.last_result = {'path': path, 'mode': mode, 'error': True, 'finished_at': time.time()}
+            log.exception('profile_failed', path=path)
+        finally:
+            self._running = None
+
+    def sample(self, stacks, skip_ident=None, cpu_seen=None):
+        """
+        Take one sample of every thread into stacks
+        Args:
+            stacks: {folded stack: count} to add to
+            skip_ident: Thread to leave out (the sampler itself)
+            cpu_seen: {ident: cpu seconds} → chỉ giữ thread đã chạy từ lần trước
+                      (None = giữ mọi thread)
+        """
+        names = None
+        for ident, frame in sys._current_frames().items():
+            if ident == skip_ident:
+                continue
+            if cpu_seen is not None:
+                cpu = _thread_cpu_time(ident)
+                if cpu is not None:
+                    previous = cpu_seen.get(ident)
+                    cpu_seen[ident] = cpu
+                    if previous is None or cpu <= previous:
+                        continue
+            if names is None:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            key = self._fold(frame, names.get(ident, f"thread-{ident}"))
+            stacks[key] = stacks.get(key, 0) + 1
+
+    def _fold(self, frame, thread_name):
+        labels = self._labels
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = _frame_label(code)
+            parts.append(label)
+            frame = frame.f_back
+        parts.append(thread_name.replace(';', ':').replace(' ', '_'))
+        parts.reverse()
+        return ';'.join(parts)
+
+    @staticmethod
+    def write(stacks, path):
+        """Write {stack: count} as folded lines (ghi file tạm rồi rename)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, path)
+
+
+def _frame_label(code):
+    """'Class.method (file.py:12)' — không chứa ';' (ký tự phân cách frame)."""
+    name = getattr(code, 'co_qualname', code.co_name)
+    filename = os.path.basename(code.co_filename)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+def capture_path(directory, now=None):
+    """<directory>/profile-<pid>-<YYYYmmdd-HHMMSS>.folded"""
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+    return os.path.join(directory, f"profile-{os.getpid()}-{stamp}.folded")
+
+
+# Profiler dùng chung của process (env PROFILE_SECONDS / POST /admin/profile)
+profiler = SamplingProfiler()
@@ -0,0 +1,344 @@
+"""
+Rate Limiter
+Token bucket cho event vẽ/chat, kiểm tra trước khi drawing_handler /
+chat_handler làm việc và trước khi app.py broadcast cho cả phòng.
+
+Mỗi event thuộc một nhóm (draw / style / chat). Mỗi nhóm có 2 bucket:
+- theo connection (sid): 1 client không gửi quá nhanh
+- theo phòng: cả phòng cộng lại không vượt quá khả năng fan-out
+
+Bucket nạp lại lười (tính theo thời gian lúc lấy token), state mỗi connection
+chỉ là vài số float → O(1), không có thread nạp token.
+
+Event bị chặn xử lý theo policy của event:
+- drop:  bỏ luôn (chat)
+- merge: mỗi event chỉ giữ payload mới nhất (điểm vẽ, màu, cỡ bút) và gửi khi
+         bucket có token lại → người xem vẫn thấy nét đầy đủ, chỉ thưa hơn
+- queue: giữ đủ và đúng thứ tự (bắt đầu/kết thúc nét), không gộp vượt qua
+         ranh giới nét; tối đa PENDING_PER_EVENT mỗi event, quá thì bỏ
+Event chờ được nhả từng cái một, mỗi cái 1 token (release) → hàng chờ không
+vượt được rate, và chỉ dài tối đa vài phần tử mỗi connection.
+
+Bucket + hàng chờ của 1 connection được sửa bởi thread handler (mỗi event 1
+thread) và bởi scheduler (flush) → mỗi connection có 1 lock riêng (lock(sid)).
+
+    RATE_LIMITS="draw=90/60,room.chat=30/40"   (tokens/giây / burst, 0 = tắt)
+"""
+import threading
+import time
+
+from config.constants import RATE_LIMITS
+from utils import metrics
+
+POLICY_DROP = 'drop'
+POLICY_MERGE = 'merge'
+POLICY_QUEUE = 'queue'
+
+# event -> (nhóm bucket, policy)
+EVENT_LIMITS = {
+    'drawing_start': ('draw', POLICY_QUEUE),
+    'drawing_move': ('draw', POLICY_MERGE),
+    'drawing_end': ('draw', POLICY_QUEUE),
+    'change_color': ('style', POLICY_MERGE),
+    'change_brush_size': ('style', POLICY_MERGE),
+    'send_message': ('chat', POLICY_DROP),
+}
+
+# Số event queue-policy (cùng tên) được chờ tối đa mỗi connection; event merge
+# chỉ có 1 mỗi đoạn giữa 2 event queue → cả hàng chờ bị chặn trên
+PENDING_PER_EVENT = 4
+
+_ACTIONS = {POLICY_DROP: 'dropped', POLICY_MERGE: 'merged', POLICY_QUEUE: 'queued'}
+
+SCOPE_CONNECTION = 'connection'
+SCOPE_ROOM = 'room'
+
+RATE_LIMITED_TOTAL = 'drawguess_rate_limited_total'
+metrics.registry.describe(
+    RATE_LIMITED_TOTAL, 'counter',
+    'Events throttled by the rate limiter, by event, scope (connection|room) and action (dropped|merged|queued)',
+)
+
+
+class TokenBucket:
+    """
+    Lazily refilled token bucket
+
+    Attributes:
+        tokens (float): Tokens available at `updated`
+        updated (float): Monotonic time of the last refill
+    """
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, rate, burst, now):
+        """Take one token; False if the bucket is empty."""
+        tokens = self.tokens + (now - self.updated) * rate
+        self.updated = now
+        if tokens >= 1.0:
+            self.tokens = min(tokens, burst) - 1.0
+            return True
+        self.tokens = tokens
+        return False
+
+    def refund(self):
+        self.tokens += 1.0
+
+    def wait_time(self, rate, now):
+        """Seconds until one token is available."""
+        missing = 1.0 - (self.tokens + (now - self.updated) * rate)
+        return max(0.0, missing / rate)
+
+
+class _RoomLimits:
+    """Buckets shared by every connection of one room."""
+    __slots__ = ('buckets', 'lock')
+
+    def __init__(self):
+        self.buckets = {}
+        # Nhiều connection của cùng phòng lấy token song song
+        self.lock = threading.Lock()
+
+
+class _Connection:
+    """Buckets of one sid + throttled events waiting for a token."""
+    __slots__ = ('buckets', 'room', 'pending', 'notified', 'lock')
+
+    def __init__(self):
+        self.buckets = {}     # nhóm -> TokenBucket
+        self.room = None      # _RoomLimits của phòng đang ở
+        self.pending = []     # [(event, payload)] theo thứ tự gửi (policy merge / queue)
+        self.notified = set()  # nhóm đã báo 'rate_limited' cho client (đến khi có token lại)
+        # Re-entrant: caller giữ lock(sid) qua cả acquire → áp dụng event
+        self.lock = threading.RLock()
+
+
+class RateLimiter:
+    """
+    Per-connection and per-room token buckets
+
+    Attributes:
+        limits (dict): {group: (rate, burst)} và {'room.<group>': (rate, burst)}
+    """
+    def __init__(self, limits=None, clock=time.monotonic):
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self.clock = clock
+        self._connections = {}   # sid -> _Connection
+        self._rooms = {}         # room_id -> _RoomLimits
+        self._labels = {}        # (event, scope, action) -> metric labels
+
+    def _connection(self, sid):
+        conn = self._connections.get(sid)
+        if conn is None:
+            conn = self._connections.setdefault(sid, _Connection())
+        return conn
+
+    def lock(self, sid, create=True):
+        """
+        Lock of one connection's buckets and pending events
+        Giữ lock này trong lúc acquire + áp dụng event để các event của 1 sid
+        (thread handler / scheduler flush) đi ra đúng thứ tự.
+        create=False: None nếu connection không còn (đã forget) → không tạo lại state
+        """
+        if not create:
+            conn = self._connections.get(sid)
+            return conn.lock if conn is not None else None
+        return self._connection(sid).lock
+
+    # ================== MEMBERSHIP ==================
+    def set_room(self, sid, room_id):
+        """Attach a connection to its room's buckets (None = not in a room)."""
+        conn = self._connection(sid)
+        if room_id is None:
+            conn.room = None
+            return
+        room = self._rooms.get(room_id)
+        if room is None:
+            room = self._rooms.setdefault(room_id, _RoomLimits())
+        conn.room = room
+
+    def forget(self, sid):
+        """Connection closed → drop its state."""
+        self._connections.pop(sid, None)
+
+    def forget_room(self, room_id):
+        """Room deleted → drop its buckets."""
+        self._rooms.pop(room_id, None)
+
+    # ================== CHECKS ==================
+    @staticmethod
+    def policy(event):
+        limits = EVENT_LIMITS.get(event)
+        return limits[1] if limits else None
+
+    def acquire(self, sid, event):
+        """
+        Take a token for one event from the sid's and the room's bucket
+        Args:
+            sid: Connection id
+            event: Socket.IO event name (event không có trong EVENT_LIMITS luôn qua)
+        Returns:
+            bool: True nếu được xử lý, False nếu bị chặn (đã đếm vào metric)
+        """
+        limits = EVENT_LIMITS.get(event)
+        if limits is None:
+            return True
+        conn = self._connection(sid)
+        with conn.lock:
+            return self._acquire(conn, event, *limits)
+
+    def _acquire(self, conn, event, group, policy):
+        now = self.clock()
+        rate, burst = self.limits.get(group, (0, 0))
+        bucket = None
+        if rate > 0:
+            bucket = conn.buckets.get(group)
+            if bucket is None:
+                bucket = conn.buckets[group] = TokenBucket(burst, now)
+            if not bucket.take(rate, burst, now):
+                self._count(event, SCOPE_CONNECTION, policy)
+                return False
+
+        room = conn.room
+        rate, burst = self.limits.get('room.' + group, (0, 0))
+        if room is not None and rate > 0:
+            with room.lock:
+                room_bucket = room.buckets.get(group)
+                if room_bucket is None:
+                    room_bucket = room.buckets[group] = TokenBucket(burst, now)
+                allowed = room_bucket.take(rate, burst, now)
+            if not allowed:
+                # Phòng hết token thì token của connection không bị mất
+                if bucket is not None:
+                    bucket.refund()
+                self._count(event, SCOPE_ROOM, policy)
+                return False
+
+        conn.notified.discard(group)
+        return True
+
+    def retry_after(self, sid, event):
+        """Seconds until acquire(sid, event) can succeed again (ước lượng)."""
+        group = EVENT_LIMITS[event][0]
+        conn = self._connections.get(sid)
+        if conn is None:
+            return 0.0
+        with conn.lock:
+            return self._retry_after(conn, group)
+
+    def _retry_after(self, conn, group):
+        now = self.clock()
+        wait = 0.0
+        rate, _ = self.limits.get(group, (0, 0))
+        bucket = conn.buckets.get(group)
+        if rate > 0 and bucket is not None:
+            wait = bucket.wait_time(rate, now)
+        rate, _ = self.limits.get('room.' + group, (0, 0))
+        room_bucket = conn.room.buckets.get(group) if conn.room is not None else None
+        if rate > 0 and room_bucket is not None:
+            wait = max(wait, room_bucket.wait_time(rate, now))
+        return wait
+
+    def should_notify(self, sid, event):
+        """True once per throttled streak (để báo client 'rate_limited' một lần)."""
+        conn = self._connections.get(sid)
+        group = EVENT_LIMITS[event][0]
+        if conn is None:
+            return False
+        with conn.lock:
+            if group in conn.notified:
+                return False
+            conn.notified.add(group)
+        return True
+
+    # ================== MERGE / QUEUE POLICY ==================
+    def defer(self, sid, event, payload):
+        """
+        Keep a throttled event until a token is available
+        merge: thay payload cũ của cùng event (chỉ trong đoạn sau start/end cuối);
+        queue: thêm vào cuối, bỏ nếu đã có PENDING_PER_EVENT event cùng tên chờ
+        Returns:
+            bool: True nếu trước đó chưa có event nào chờ (caller cần hẹn giờ flush)
+        """
+        conn = self._connection(sid)
+        with conn.lock:
+            pending = conn.pending
+            was_empty = not pending
+            policy = self.policy(event)
+            if policy == POLICY_QUEUE:
+                if sum(1 for queued, _ in pending if queued == event) >= PENDING_PER_EVENT:
+                    self._count(event, SCOPE_CONNECTION, POLICY_DROP)
+                    return False
+            elif policy == POLICY_MERGE:
+                for i in range(len(pending) - 1, -1, -1):
+                    queued = pending[i][0]
+                    if queued == event:
+                        # Xoá rồi thêm lại → thứ tự theo lần bị chặn gần nhất
+                        del pending[i]
+                        break
+                    if self.policy(queued) == POLICY_QUEUE:
+                        break
+            pending.append((event, payload))
+            return was_empty
+
+    def has_pending(self, sid):
+        conn = self._connections.get(sid)
+        return bool(conn and conn.pending)
+
+    def pending_event(self, sid):
+        """Oldest event waiting for this sid (None if nothing waits)."""
+        conn = self._connections.get(sid)
+        if conn is None:
+            return None
+        with conn.lock:
+            return conn.pending[0][0] if conn.pending else None
+
+    def release(self, sid):
+        """
+        Take a token for the oldest waiting event of this sid
+        Returns:
+            tuple: (event, payload) được gửi ngay, None nếu chưa có token /
+                   không có event chờ / connection đã forget (không tạo lại)
+        """
+        conn = self._connections.get(sid)
+        if conn is None:
+            return None
+        with conn.lock:
+            if not conn.pending:
+                return None
+            event = conn.pending[0][0]
+            if not self._acquire(conn, event, *EVENT_LIMITS[event]):
+                return None
+            return conn.pending.pop(0)
+
+    def _count(self, event, scope, policy):
+        action = _ACTIONS[policy]
+        key = (event, scope, action)
+        labels = self._labels.get(key)
+        if labels is None:
+            labels = self._labels.setdefault(key, (('event', event), ('scope', scope), ('action', action)))
+        metrics.inc(RATE_LIMITED_TOTAL, labels)
+
+
+def parse_limits(spec, defaults=RATE_LIMITS):
+    """
+    'draw=90/60,room.chat=30/40,style=0' → defaults với các nhóm được ghi đè
+    (rate 0 = tắt bucket đó; burst mặc định = rate)
+    """
+    limits = dict(defaults)
+    for item in (spec or '').split(','):
+        name, sep, value = item.partition('=')
+        name = name.strip()
+        if not sep or not name:
+            continue
+        rate, _, burst = value.partition('/')
+        try:
+            rate = float(rate)
+            burst = float(burst) if burst.strip() else rate
+        except ValueError:
+            continue
+        limits[name] = (max(0.0, rate), max(1.0, burst))
+    return limits
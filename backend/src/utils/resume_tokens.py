@@ -0,0 +1,59 @@
+"""
+Resume Tokens
+Token gửi kèm 'room_joined' để client mất kết nối (socket mới, sid mới) nhận
+lại đúng Player cũ bằng event 'resume'.
+
+    <sid cũ>.<room_id>.<HMAC-SHA256(key, sid|room_id) rút gọn>
+
+Không lưu gì phía server: process nào có cùng key cũng kiểm tra được (nhiều
+process). Token chỉ dùng được khi Player của sid đó còn tồn tại, tức là trong
+thời gian grace sau disconnect; resume xong thì sid cũ không còn → token cũ
+hết hiệu lực, client nhận token mới.
+"""
+import base64
+import hashlib
+import hmac
+
+SIGNATURE_BYTES = 16
+
+
+class ResumeTokens:
+    """
+    Issue / verify signed session tokens
+
+    Attributes:
+        key (bytes): HMAC key (mọi process dùng chung state phải dùng cùng key)
+    """
+    def __init__(self, key):
+        self.key = key.encode('utf-8') if isinstance(key, str) else key
+
+    def _sign(self, sid, room_id):
+        digest = hmac.new(self.key, f"{sid}|{room_id}".encode('utf-8'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).rstrip(b'=').decode('ascii')
+
+    def issue(self, sid, room_id):
+        """
+        Token for a player of a room
+        Args:
+            sid: Player identifier (socket_id)
+            room_id: Room identifier
+        Returns:
+            str: Token
+        """
+        return f"{sid}.{room_id}.{self._sign(sid, room_id)}"
+
+    def verify(self, token):
+        """
+        Check a token from the client
+        Returns:
+            tuple: (sid, room_id), or None if the token is malformed / forged
+        """
+        if not isinstance(token, str):
+            return None
+        payload, _, signature = token.rpartition('.')
+        sid, _, room_id = payload.rpartition('.')
+        if not sid or not room_id or not signature:
+            return None
+        if not hmac.compare_digest(signature.encode('utf-8'), self._sign(sid, room_id).encode('ascii')):
+            return None
+        return sid, room_id
@@ -0,0 +1,181 @@
+"""
+Room Executor
+Mỗi phòng là một "actor": mọi thay đổi state của phòng (đoán từ, tick timer,
+start game, nét vẽ, clear...) được đưa vào hàng đợi riêng của phòng đó và
+chạy tuần tự, theo đúng thứ tự gửi vào.
+
+Một pool worker cố định (không tăng theo số phòng) lấy lần lượt các phòng
+đang có việc. Một phòng chỉ được một worker xử lý tại một thời điểm, các
+phòng khác nhau chạy song song, không có lock nào bị giữ trong lúc task chạy
+(trừ guard: vd. lock của phòng trên store dùng chung khi chạy nhiều process).
+"""
+import collections
+import contextlib
+import queue
+import threading
+from concurrent.futures import Future
+
+from utils.logger import get_logger
+
+log = get_logger('room_executor')
+
+
+class _Mailbox:
+    """Pending tasks of one room + whether it is queued/running on a worker."""
+    __slots__ = ('tasks', 'scheduled')
+
+    def __init__(self):
+        self.tasks = collections.deque()
+        self.scheduled = False
+
+
+class RoomExecutor:
+    """
+    Per-room serialized work queues on a bounded worker pool
+
+    Attributes:
+        workers (int): Number of worker tasks
+        batch (int): Max tasks a worker runs for one room before yielding it
+        guard (callable): guard(room_id) → context manager held around each batch
+                          of a room (None = không có)
+    """
+    def __init__(self, workers=4, batch=32, guard=None):
+        self.workers = max(1, workers)
+        self.batch = max(1, batch)
+        self.guard = guard
+        self._mailboxes = {}
+        self._lock = threading.Lock()      # chỉ bảo vệ _mailboxes / cờ scheduled
+        # queue.Queue (không phải SimpleQueue): dựng trên threading.Condition
+        # nên chạy được cả với eventlet/gevent đã monkey patch
+        self._ready = queue.Queue()  # room_id đang có việc
+        self._local = threading.local()
+        self._start_task = None
+        self._started = 0
+        self._idle = threading.Condition(self._lock)
+        self.processed = 0
+
+    def bind(self, start_background_task):
+        """
+        Set the function used to start workers (e.g. socketio.start_background_task).
+        Workers are started lazily on the first submitted task.
+        """
+        self._start_task = start_background_task
+
+    def submit(self, room_id, fn, *args):
+        """
+        Post fn(*args) onto the queue of room_id (fire-and-forget)
+        Args:
+            room_id: Room identifier (serialization key)
+            fn: Callable run on a worker
+        """
+        self._post(room_id, (fn, args, None))
+
+    def call(self, room_id, fn, *args, timeout=None):
+        """
+        Run fn(*args) on the room's queue and wait for its result.
+        Gọi từ chính actor của phòng đó thì chạy luôn (tránh tự chờ mình).
+        """
+        if self.current_room() == room_id:
+            return fn(*args)
+        future = Future()
+        self._post(room_id, (fn, args, future))
+        return future.result(timeout)
+
+    def _post(self, room_id, task):
+        with self._lock:
+            box = self._mailboxes.get(room_id)
+            if box is None:
+                box = self._mailboxes[room_id] = _Mailbox()
+            box.tasks.append(task)
+            ready = not box.scheduled
+            if ready:
+                box.scheduled = True
+            missing = self.workers - self._started
+            self._started = self.workers
+        for _ in range(missing):
+            (self._start_task or _start_thread)(self._work)
+        if ready:
+            self._ready.put(room_id)
+
+    def current_room(self):
+        """Room whose task is running on this worker (None outside a worker)."""
+        return getattr(self._local, 'room_id', None)
+
+    def pending_count(self):
+        """Number of tasks waiting over all rooms."""
+        with self._lock:
+            return sum(len(box.tasks) for box in self._mailboxes.values())
+
+    def wait_idle(self, timeout=None):
+        """
+        Block until every queue is empty (tests / benchmarks)
+        Returns:
+            bool: False on timeout
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._mailboxes, timeout)
+
+    def _work(self):
+        while True:
+            room_id = self._ready.get()
+            self._local.room_id = room_id
+            try:
+                self._run_room(room_id)
+            finally:
+                self._local.room_id = None
+
+    def _run_room(self, room_id):
+        box = self._mailboxes[room_id]
+        # Lấy cả lô dưới 1 lần lock; task mới submit trong lúc chạy nằm lại trong box
+        with self._lock:
+            tasks = box.tasks
+            if len(tasks) <= self.batch:
+                box.tasks = collections.deque()
+            else:
+                tasks = [tasks.popleft() for _ in range(self.batch)]
+
+        with contextlib.ExitStack() as stack:
+            runnable = tasks
+            if self.guard is not None:
+                try:
+                    stack.enter_context(self.guard(room_id))
+                except Exception as ex:
+                    # Không giữ được guard → không chạy lô này (không sửa phòng khi thiếu lock)
+                    log.exception('room_guard_failed', room=room_id, tasks=len(tasks))
+                    for _, _, future in tasks:
+                        if future is not None and future.set_running_or_notify_cancel():
+                            future.set_exception(ex)
+                    runnable = ()
+            for fn, args, future in runnable:
+                if future is None:
+                    try:
+                        fn(*args)
+                    except Exception:
+                        # Task lỗi không được làm chết worker
+                        log.exception('task_failed', room=room_id,
+                                      task=getattr(fn, '__name__', repr(fn)))
+                elif future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args))
+                    except Exception as ex:
+                        future.set_exception(ex)
+
+        with self._lock:
+            self.processed += len(tasks)
+            if box.tasks:
+                # Còn việc → xếp lại cuối hàng để phòng khác không bị đói
+                requeue = True
+            else:
+                requeue = False
+                box.scheduled = False
+                del self._mailboxes[room_id]
+                if not self._mailboxes:
+                    self._idle.notify_all()
+        if requeue:
+            self._ready.put(room_id)
+
+
+def _start_thread(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,98 @@
+"""
+Room IDs
+Cấp room ID duy nhất trong O(1) từ toàn bộ không gian [A-Z0-9]{6}
+(36^6 ≈ 2.18 tỉ ID) mà validators.validate_room_id chấp nhận.
+
+ID thứ n = hoán vị có khoá của bộ đếm n (Feistel trên cơ số 36):
+- bộ đếm lấy từ data_store.next_sequence → atomic giữa các thread, và giữa
+  các process khi dùng chung state backend (INCR trên broker / Redis)
+- hoán vị là song ánh → không bao giờ trùng cho tới khi bộ đếm quay vòng
+  (sau ~2 tỉ phòng); ID trông ngẫu nhiên nên không đoán được phòng kế tiếp
+- không cần pool ID rảnh hay thu hồi khi xoá phòng; sau khi quay vòng,
+  ID còn đang được dùng bị bỏ qua (in_use)
+
+Shard (tuỳ chọn, ROOM_ID_SHARD): ký tự đầu cố định cho mỗi process/cụm,
+5 ký tự sau hoán vị bộ đếm riêng của shard → load balancer route theo ký tự đầu.
+"""
+import hashlib
+import itertools
+
+from config.constants import ROOM_ID_LENGTH
+
+ROOM_ID_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+
+class RoomIdAllocator:
+    """
+    Keyed permutation of a counter into fixed-length IDs
+
+    Attributes:
+        length (int): ID length (gồm cả ký tự shard)
+        shard (str|None): Fixed first character
+        space (int): Distinct IDs before the counter wraps
+    """
+    def __init__(self, key=b'', length=ROOM_ID_LENGTH, shard=None, alphabet=ROOM_ID_ALPHABET,
+                 next_value=None, rounds=8):
+        if shard is not None and (len(shard) != 1 or shard not in alphabet):
+            raise ValueError(f"shard must be one character of {alphabet!r}")
+        if rounds % 2:
+            raise ValueError("rounds must be even")
+        self.alphabet = alphabet
+        self.length = length
+        self.shard = shard
+        self.rounds = rounds
+        self.digits = length - (1 if shard else 0)
+        radix = len(alphabet)
+        self.space = radix ** self.digits
+        # n = L * b + R với L < a, R < b (chia đôi số chữ số)
+        self._a = radix ** (self.digits // 2)
+        self._b = radix ** (self.digits - self.digits // 2)
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        self._key = hashlib.blake2b(key, digest_size=32).digest()
+        self._next_value = next_value or itertools.count(1).__next__
+
+    def _round(self, i, value):
+        digest = hashlib.blake2b(
+            value.to_bytes(8, 'big') + bytes((i,)), key=self._key, digest_size=8
+        ).digest()
+        return int.from_bytes(digest, 'big')
+
+    def permute(self, n):
+        """Bijection of [0, space) onto itself."""
+        a, b = self._a, self._b
+        left, right = divmod(n, b)
+        for i in range(self.rounds):
+            # (L < a, R < b) → (R < b, L' < a): mỗi round đảo được, số round chẵn
+            # nên kích thước hai nửa trở lại như ban đầu
+            left, right = right, (left + self._round(i, right)) % a
+            a, b = b, a
+        return left * b + right
+
+    def encode(self, value):
+        """Number in [0, space) → ID string (có ký tự shard nếu có)."""
+        radix = len(self.alphabet)
+        chars = []
+        for _ in range(self.digits):
+            value, digit = divmod(value, radix)
+            chars.append(self.alphabet[digit])
+        if self.shard:
+            chars.append(self.shard)
+        return ''.join(reversed(chars))
+
+    def allocate(self, in_use=None):
+        """
+        Next room ID
+        Args:
+            in_use: Optional room_id -> bool; IDs still taken are skipped
+                    (chỉ xảy ra sau khi bộ đếm quay vòng)
+        Returns:
+            str: Room ID
+        Raises:
+            RuntimeError: Every ID of the space is in use
+        """
+        for _ in range(self.space):
+            room_id = self.encode(self.permute((self._next_value() - 1) % self.space))
+            if in_use is None or not in_use(room_id):
+                return room_id
+        raise RuntimeError("Room ID space exhausted")
@@ -0,0 +1,130 @@
+"""
+Shared Scheduler
+Một vòng lặp duy nhất chạy mọi deadline (đếm ngược round, flush stroke...)
+thay vì mỗi phòng một background task.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from utils.logger import get_logger
+
+log = get_logger('scheduler')
+
+
+class ScheduledCall:
+    """
+    Handle of a scheduled callback
+
+    Attributes:
+        deadline (float): Monotonic time the callback is due
+        cancelled (bool): Whether the call was cancelled
+    """
+    __slots__ = ('deadline', 'fn', 'args', 'interval', 'cancelled')
+
+    def __init__(self, deadline, fn, args, interval=None):
+        self.deadline = deadline
+        self.fn = fn
+        self.args = args
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancel the call (lazy: the heap entry is skipped when popped)."""
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    Heap-based scheduler driven by a single background loop
+
+    Attributes:
+        resolution (float): Max seconds the loop sleeps before re-checking the heap
+    """
+    def __init__(self, sleep=time.sleep, clock=time.monotonic, resolution=0.01):
+        self.resolution = resolution
+        self._sleep = sleep
+        self._clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._running = False
+        self._start_task = None
+
+    def bind(self, start_background_task):
+        """
+        Set the function used to start the loop (e.g. socketio.start_background_task).
+        The loop itself is started lazily on the first scheduled call.
+        """
+        self._start_task = start_background_task
+
+    def now(self):
+        return self._clock()
+
+    def call_at(self, deadline, fn, *args):
+        """
+        Schedule fn(*args) at a monotonic deadline
+        Returns:
+            ScheduledCall: handle that can be cancelled
+        """
+        return self._push(ScheduledCall(deadline, fn, args))
+
+    def call_later(self, delay, fn, *args):
+        """Schedule fn(*args) after delay seconds."""
+        return self.call_at(self._clock() + delay, fn, *args)
+
+    def call_every(self, interval, fn, *args):
+        """Schedule fn(*args) every interval seconds until cancelled."""
+        return self._push(ScheduledCall(self._clock() + interval, fn, args, interval))
+
+    def pending_count(self):
+        """Number of heap entries (cancelled ones included until popped)."""
+        return len(self._heap)
+
+    def run_pending(self, now=None):
+        """
+        Run every call whose deadline has passed
+        Args:
+            now: Override for the current monotonic time (tests)
+        Returns:
+            int: Number of callbacks executed
+        """
+        if now is None:
+            now = self._clock()
+        executed = 0
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0][0] > now:
+                    return executed
+                _, _, call = heapq.heappop(self._heap)
+            if call.cancelled:
+                continue
+            if call.interval is not None:
+                call.deadline += call.interval
+                # Bỏ qua các tick đã lỡ thay vì chạy dồn
+                if call.deadline <= now:
+                    call.deadline = now + call.interval
+                self._push(call)
+            try:
+                call.fn(*call.args)
+            except Exception:
+                log.exception('callback_failed', callback=getattr(call.fn, '__name__', repr(call.fn)))
+            executed += 1
+
+    def _push(self, call):
+        with self._lock:
+            heapq.heappush(self._heap, (call.deadline, next(self._seq), call))
+            start = not self._running and self._start_task is not None
+            if start:
+                self._running = True
+        if start:
+            self._start_task(self._loop)
+        return call
+
+    def _loop(self):
+        while True:
+            self.run_pending()
+            with self._lock:
+                delay = self._heap[0][0] - self._clock() if self._heap else self.resolution
+            self._sleep(min(max(delay, 0), self.resolution))
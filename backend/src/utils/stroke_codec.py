@@ -0,0 +1,148 @@
+"""
+Binary Stroke Codec
+Mã hoá list canvas event (start/move/end/color/brush_size) thành bytes gọn
+để gửi dưới dạng Socket.IO binary attachment.
+
+Format (big-endian), byte đầu là version:
+    0x01                    version
+    0x01 x:int16 y:int16    start (toạ độ pixel, làm tròn)
+    0x02 dx:int8 dy:int8    move, delta so với điểm trước trong nét
+    0x03 x:int16 y:int16    move tuyệt đối (delta không vừa int8)
+    0x04                    end
+    0x05 index:uint8        color trong palette COLORS
+    0x06 r:uint8 g b        color ngoài palette
+    0x07 size:uint8         brush_size
+Decoder phía client: frontend/js/canvas/viewerCanvas.js (_decodeBinaryEvents).
+"""
+import struct
+
+from config.constants import CANVAS_WIDTH, CANVAS_HEIGHT, COLORS
+
+FORMAT_VERSION = 1
+
+OP_START = 0x01
+OP_MOVE_DELTA = 0x02
+OP_MOVE_ABS = 0x03
+OP_END = 0x04
+OP_COLOR_INDEX = 0x05
+OP_COLOR_RGB = 0x06
+OP_BRUSH_SIZE = 0x07
+
+_INT16 = struct.Struct('>Bhh')
+_DELTA = struct.Struct('>Bbb')
+_COLOR_INDEX = {color.upper(): i for i, color in enumerate(COLORS)}
+
+
+class StrokeCodecError(ValueError):
+    """Raised when an event cannot be represented in the binary format."""
+
+
+def _quantize(value, limit):
+    """
+    Round a coordinate to a canvas pixel, clamped to [-limit, 2 * limit]
+    (nét kéo lố ra ngoài canvas vẫn giữ hướng, và luôn vừa int16).
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise StrokeCodecError(f"invalid coordinate {value!r}")
+    return max(-limit, min(2 * limit, int(round(value))))
+
+
+def encode_events(events, width=CANVAS_WIDTH, height=CANVAS_HEIGHT):
+    """
+    Encode canvas events into the binary stroke format
+    Args:
+        events: List of event dicts from drawing_handler
+        width: Canvas width used to bound coordinates
+        height: Canvas height used to bound coordinates
+    Returns:
+        bytes
+    Raises:
+        StrokeCodecError: if an event type/value is not encodable
+    """
+    out = bytearray((FORMAT_VERSION,))
+    last_x = last_y = None
+    for event in events:
+        kind = event.get('type')
+        if kind == 'start' or kind == 'move':
+            x = _quantize(event.get('x'), width)
+            y = _quantize(event.get('y'), height)
+            if kind == 'move' and last_x is not None:
+                dx, dy = x - last_x, y - last_y
+                if -128 <= dx <= 127 and -128 <= dy <= 127:
+                    out += _DELTA.pack(OP_MOVE_DELTA, dx, dy)
+                else:
+                    out += _INT16.pack(OP_MOVE_ABS, x, y)
+            else:
+                out += _INT16.pack(OP_START if kind == 'start' else OP_MOVE_ABS, x, y)
+            last_x, last_y = x, y
+        elif kind == 'end':
+            out.append(OP_END)
+            last_x = last_y = None
+        elif kind == 'color':
+            out += _encode_color(event.get('color'))
+        elif kind == 'brush_size':
+            size = event.get('size')
+            if isinstance(size, bool) or not isinstance(size, (int, float)) or not 0 <= size <= 255:
+                raise StrokeCodecError(f"invalid brush size {size!r}")
+            out += bytes((OP_BRUSH_SIZE, int(round(size))))
+        else:
+            raise StrokeCodecError(f"unsupported event type {kind!r}")
+    return bytes(out)
+
+
+def _encode_color(color):
+    if not isinstance(color, str):
+        raise StrokeCodecError(f"invalid color {color!r}")
+    index = _COLOR_INDEX.get(color.upper())
+    if index is not None:
+        return bytes((OP_COLOR_INDEX, index))
+    try:
+        if len(color) != 7 or color[0] != '#':
+            raise ValueError
+        rgb = bytes.fromhex(color[1:])
+    except ValueError:
+        raise StrokeCodecError(f"invalid color {color!r}")
+    return bytes((OP_COLOR_RGB,)) + rgb
+
+
+def decode_events(payload):
+    """
+    Decode the binary stroke format back into event dicts
+    Args:
+        payload: bytes produced by encode_events
+    Returns:
+        list: Event dicts
+    """
+    data = memoryview(payload)
+    if not data or data[0] != FORMAT_VERSION:
+        raise StrokeCodecError("unknown stroke format version")
+    events = []
+    pos = 1
+    last_x = last_y = 0
+    while pos < len(data):
+        op = data[pos]
+        if op in (OP_START, OP_MOVE_ABS):
+            _, x, y = _INT16.unpack_from(data, pos)
+            pos += _INT16.size
+            events.append({'type': 'start' if op == OP_START else 'move', 'x': x, 'y': y})
+            last_x, last_y = x, y
+        elif op == OP_MOVE_DELTA:
+            _, dx, dy = _DELTA.unpack_from(data, pos)
+            pos += _DELTA.size
+            last_x, last_y = last_x + dx, last_y + dy
+            events.append({'type': 'move', 'x': last_x, 'y': last_y})
+        elif op == OP_END:
+            pos += 1
+            events.append({'type': 'end'})
+        elif op == OP_COLOR_INDEX:
+            events.append({'type': 'color', 'color': COLORS[data[pos + 1]]})
+            pos += 2
+        elif op == OP_COLOR_RGB:
+            events.append({'type': 'color', 'color': '#' + bytes(data[pos + 1:pos + 4]).hex().upper()})
+            pos += 4
+        elif op == OP_BRUSH_SIZE:
+            events.append({'type': 'brush_size', 'size': data[pos + 1]})
+            pos += 2
+        else:
+            raise StrokeCodecError(f"unknown opcode 0x{op:02x}")
+    return events
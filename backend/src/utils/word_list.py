@@ -1,35 +1,257 @@
 """
 Word List Utility
-TODO: Implement word list management
-(Thành viên 2)
+Load wordlist.json một lần, tự reload khi file đổi (mtime),
+và chia từ cho từng phòng bằng bộ bài xáo trộn (không lặp từ).
+File đọc lỗi (đang ghi dở, JSON hỏng, bị xoá) → giữ danh sách cũ, lần kiểm
+tra sau thử lại.
+Mỗi lần reload thay cả bộ index (_WordIndex) bằng 1 phép gán → người đọc luôn
+thấy từ và index của cùng một lần load.
 """
+import collections
 import json
 import os
 import random
+import threading
+import time
+
+from utils.logger import get_logger
+
+log = get_logger('word_list')
+
+WORDLIST_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'wordlist.json'
+)
+MTIME_CHECK_INTERVAL = 5.0  # giây giữa 2 lần os.stat
+
+# Một lần load: words là tuple, các index là tuple vị trí trong words
+_WordIndex = collections.namedtuple(
+    '_WordIndex', 'version words all by_category by_length by_difficulty'
+)
+_EMPTY_INDEX = _WordIndex(0, (), (), {}, {}, {})
+
+
+class WordDeck:
+    """
+    Shuffled deck of word indices for one room
+
+    draw() is O(1) and never repeats a word until the deck is exhausted,
+    then the deck is reshuffled. Cards are indices into the words tuple of the
+    same load (_words), so a reload never pairs old indices with new words.
+    """
+    def __init__(self, service, category=None):
+        self._service = service
+        self._category = category
+        self._version = -1
+        self._words = ()
+        self._cards = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._service.indices(self._category))
+
+    def draw(self):
+        """
+        Take the next word of the deck
+        Returns: Word string or None if the list is empty
+        """
+        index = self._service.snapshot()
+        with self._lock:
+            if self._version != index.version or not self._cards:
+                self._refill(index)
+            if not self._cards:
+                return None
+            return self._words[self._cards.pop()]
+
+    def _refill(self, index):
+        cards = list(index.all if self._category is None else index.by_category.get(self._category, ()))
+        random.shuffle(cards)
+        self._words = index.words
+        self._cards = cards
+        self._version = index.version
+
+
+class WordListService:
+    """
+    In-process cached word list
+
+    Attributes:
+        file_path (str): Path of the JSON word list
+    """
+    def __init__(self, file_path=WORDLIST_PATH, check_interval=MTIME_CHECK_INTERVAL):
+        self.file_path = file_path
+        self.check_interval = check_interval
+        self._index = _EMPTY_INDEX
+        self._mtime = None
+        self._next_check = 0.0
+        self._decks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Incremented on every (re)load."""
+        return self._index.version
+
+    def snapshot(self):
+        """
+        Words + indices of one load (reloads if the file changed)
+        Returns: _WordIndex
+        """
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._reload_if_changed()
+        return self._index
+
+    def words(self):
+        """
+        Get all words (reloads if the file changed)
+        Returns: Tuple of words
+        """
+        return self.snapshot().words
+
+    def indices(self, category=None):
+        """Word indices for a category (all words if category is None)."""
+        index = self.snapshot()
+        if category is None:
+            return index.all
+        return index.by_category.get(category, ())
+
+    def categories(self):
+        return list(self.snapshot().by_category)
+
+    def words_by_length(self, length):
+        index = self.snapshot()
+        return [index.words[i] for i in index.by_length.get(length, ())]
+
+    def words_by_difficulty(self, difficulty):
+        index = self.snapshot()
+        return [index.words[i] for i in index.by_difficulty.get(difficulty, ())]
+
+    def deck(self, room_id, category=None):
+        """
+        Get (or create) the no-repeat deck of a room
+        Args:
+            room_id: Room identifier
+            category: Optional category filter
+        Returns: WordDeck
+        """
+        deck = self._decks.get(room_id)
+        if deck is None or deck._category != category:
+            with self._lock:
+                deck = self._decks[room_id] = WordDeck(self, category)
+        return deck
+
+    def release_deck(self, room_id):
+        """Forget the deck of a closed room."""
+        self._decks.pop(room_id, None)
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                entries = _read_entries(self.file_path)
+            except (OSError, ValueError, TypeError) as ex:
+                # Không ghi nhận mtime → lần kiểm tra sau đọc lại
+                log.warning('word_list_load_failed', path=self.file_path, error=repr(ex))
+                return
+            self._index = _build_index(entries, self._index.version + 1)
+            self._mtime = mtime
+
+
+def _build_index(entries, version):
+    """(word, category, difficulty) entries → _WordIndex"""
+    words = []
+    by_category, by_length, by_difficulty = {}, {}, {}
+    for word, category, difficulty in entries:
+        index = len(words)
+        words.append(word)
+        if category is not None:
+            by_category.setdefault(category, []).append(index)
+        if difficulty is not None:
+            by_difficulty.setdefault(difficulty, []).append(index)
+        by_length.setdefault(len(word), []).append(index)
+
+    # Tuple: gọn hơn list và an toàn khi đọc từ nhiều thread
+    return _WordIndex(
+        version,
+        tuple(words),
+        tuple(range(len(words))),
+        {k: tuple(v) for k, v in by_category.items()},
+        {k: tuple(v) for k, v in by_length.items()},
+        {k: tuple(v) for k, v in by_difficulty.items()},
+    )
+
+
+def _read_entries(file_path):
+    """
+    Parse wordlist.json into (word, category, difficulty) tuples.
+    Supported formats:
+      - ["word", ...]
+      - {"category": ["word", ...], ...}
+      - [{"word": "...", "category": "...", "difficulty": "..."}, ...]
+    Raises:
+        OSError, ValueError: File không đọc được / không đúng định dạng
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, (list, dict)):
+        raise ValueError(f"word list must be a list or an object, got {type(data).__name__}")
+
+    if isinstance(data, dict):
+        return [
+            (str(word), category, None)
+            for category, words in data.items()
+            for word in words
+        ]
+
+    entries = []
+    for item in data:
+        if isinstance(item, dict):
+            if item.get('word'):
+                entries.append((str(item['word']), item.get('category'), item.get('difficulty')))
+        elif item:
+            entries.append((str(item), None, None))
+    return entries
+
+
+# Shared instance
+word_service = WordListService()
+
+
+def get_deck(room_id, category=None):
+    """
+    Get the no-repeat word deck of a room
+    Returns: WordDeck
+    """
+    return word_service.deck(room_id, category)
+
+
+def release_deck(room_id):
+    """Drop the word deck of a room."""
+    word_service.release_deck(room_id)
+
 
 def load_word_list():
     """
-    Load word list from JSON file
+    Load word list (cached, reloaded only when the file changes)
     Returns: List of words
     """
-    # Load from backend/src/data/wordlist.json
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(current_dir, '..', 'data', 'wordlist.json')
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            words = json.load(f)
-        return words
-    except FileNotFoundError:
-        return []
+    return list(word_service.words())
+
 
 def get_random_word():
     """
     Get a random word from the word list
     Returns: Random word string
     """
-    # TODO: Implement random word selection
-    words = load_word_list()
+    words = word_service.words()
     if words:
         return random.choice(words)
     return None
-
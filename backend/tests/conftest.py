@@ -16,12 +16,8 @@ def reset_storage():
     Automatically reset storage before each test
     This ensures tests don't interfere with each other
     """
-    data_store.rooms.clear()
-    data_store.players.clear()
-    data_store.games.clear()
+    data_store.clear_all()
     yield
     # Cleanup after test
-    data_store.rooms.clear()
-    data_store.players.clear()
-    data_store.games.clear()
+    data_store.clear_all()
 
@@ -2,9 +2,16 @@
 Unit tests for handlers
 """
 import pytest
-from handlers import room_handler, drawing_handler, chat_handler
+from handlers import room_handler, drawing_handler, chat_handler, game_handler, scoreboard
+from handlers.stroke_buffer import StrokeBuffer
+from handlers.stroke_log import StrokeLogStore
+from handlers.stroke_simplifier import StrokeSimplifier, _segment_distance
+from handlers.reaper import Reaper, KIND_PLAYER, KIND_ROOM, KIND_GAME, parse_ttls
+from utils.room_ids import RoomIdAllocator
+from utils.stroke_codec import decode_events
 from storage import data_store
 from models.player import Player
+from models.game import Game
 
 
 class TestRoomHandler:
@@ -38,6 +45,21 @@ class TestRoomHandler:
         # All IDs should be unique
         assert len(room_ids) == 10
     
+    def test_create_room_never_overwrites_live_room(self, monkeypatch):
+        """Test IDs still in use are skipped once the counter wraps"""
+        counter = iter(range(1, 100))
+        monkeypatch.setattr(room_handler, '_room_ids', RoomIdAllocator(
+            alphabet='AB', length=2, next_value=lambda: next(counter)))
+
+        room_ids = [room_handler.create_room(f'host_{i}') for i in range(4)]
+        assert sorted(room_ids) == ['AA', 'AB', 'BA', 'BB']
+        with pytest.raises(RuntimeError):
+            room_handler.create_room('host_4')
+
+        room_handler.close_room(room_ids[2])
+        assert room_handler.create_room('host_5') == room_ids[2]
+        assert data_store.get_room(room_ids[0]).host_id == 'host_0'
+
     def test_add_player_to_room(self):
         """Test adding a player to a room"""
         room_id = room_handler.create_room('host_123')
@@ -131,6 +153,50 @@ class TestRoomHandler:
         assert room is not None
         assert room.get_player_count() == 2  # host + p2
     
+    def test_remove_last_player_drops_game(self):
+        """Test the game of a room deleted by its last leave is not left behind"""
+        room_id = room_handler.create_room('host_123')
+        room_handler.add_player_to_room(room_id, 'host_123', 'Host')
+        data_store.add_game(Game(room_id))
+
+        room_handler.remove_player_from_room('host_123')
+
+        assert data_store.get_room(room_id) is None
+        assert data_store.get_game(room_id) is None
+
+    def test_disconnect_then_resume_keeps_seat(self):
+        """Test a dropped player stays in the room offline and resumes under a new sid"""
+        room_id = room_handler.create_room('host_123')
+        room_handler.add_player_to_room(room_id, 'host_123', 'Host')
+        room_handler.add_player_to_room(room_id, 'p2', 'Player 2')
+        host = data_store.get_player('host_123')
+        host.add_score(50)
+        data_store.update_player(host)
+
+        player = room_handler.mark_disconnected('host_123')
+        assert player.connected is False
+        assert data_store.get_room(room_id).has_player('host_123')
+
+        assert room_handler.resume_player('host_123', 'p2', room_id) is None
+        assert room_handler.resume_player('host_123', 'new_sid', 'OTHER1') is None
+
+        player = room_handler.resume_player('host_123', 'new_sid', room_id)
+        assert player.id == 'new_sid'
+        assert player.connected is True
+        assert player.score == 50
+        room = data_store.get_room(room_id)
+        assert room.host_id == 'new_sid'
+        assert list(room.players) == ['new_sid', 'p2']
+
+        # Token cũ không dùng lại được sau khi đã resume
+        assert room_handler.resume_player('host_123', 'third_sid', room_id) is None
+
+    def test_mark_disconnected_outside_room(self):
+        """Test players not in a room are not kept for resume"""
+        assert room_handler.mark_disconnected('nonexistent') is None
+        data_store.add_player(Player('lobby', 'Lobby', None))
+        assert room_handler.mark_disconnected('lobby') is None
+
     def test_remove_nonexistent_player(self):
         """Test removing a player that doesn't exist"""
         returned_room_id, player_name = room_handler.remove_player_from_room('nonexistent')
@@ -243,6 +309,352 @@ class TestDrawingHandler:
         assert event_data is None
 
 
+class TestStrokeBuffer:
+    """Test cases for the per-room stroke buffer"""
+
+    def test_drain_preserves_order_per_room(self):
+        """Test events come back in arrival order, grouped by room"""
+        buffer = StrokeBuffer()
+        buffer.append('ROOM01', 'drawer', {'type': 'start', 'x': 1, 'y': 1})
+        buffer.append('ROOM02', 'other', {'type': 'start', 'x': 5, 'y': 5})
+        buffer.append('ROOM01', 'drawer', {'type': 'move', 'x': 2, 'y': 2})
+        buffer.append('ROOM01', 'drawer', {'type': 'end'})
+
+        drained = dict(buffer.drain())
+
+        assert drained['ROOM01'] == [('drawer', [
+            {'type': 'start', 'x': 1, 'y': 1},
+            {'type': 'move', 'x': 2, 'y': 2},
+            {'type': 'end'},
+        ])]
+        assert len(drained['ROOM02'][0][1]) == 1
+        assert buffer.drain() == []
+
+    def test_drain_splits_runs_by_sender(self):
+        """Test interleaved senders produce consecutive batches"""
+        buffer = StrokeBuffer()
+        buffer.append('ROOM01', 'a', {'type': 'move', 'x': 1, 'y': 1})
+        buffer.append('ROOM01', 'b', {'type': 'move', 'x': 2, 'y': 2})
+        buffer.append('ROOM01', 'a', {'type': 'move', 'x': 3, 'y': 3})
+
+        batches = buffer.drain_room('ROOM01')
+
+        assert [sender for sender, _ in batches] == ['a', 'b', 'a']
+        assert buffer.drain_room('ROOM01') == []
+
+    def test_discard_room(self):
+        """Test discarding pending events of a closed room"""
+        buffer = StrokeBuffer()
+        buffer.append('ROOM01', 'a', {'type': 'end'})
+        buffer.discard_room('ROOM01')
+
+        assert buffer.drain() == []
+
+
+class TestStrokeLog:
+    """Test cases for the per-room stroke log / replay"""
+
+    def test_replay_contains_snapshot_and_tail(self):
+        """Test replay merges compacted snapshot with the recent tail"""
+        log = StrokeLogStore(compact_every=4)
+        events = [{'type': 'start', 'x': 0, 'y': 0}]
+        events += [{'type': 'move', 'x': i, 'y': i} for i in range(1, 10)]
+        events.append({'type': 'end'})
+        for event in events:
+            log.append('ROOM01', event)
+
+        assert decode_events(log.replay('ROOM01')) == events
+
+    def test_superseded_styles_are_compacted_away(self):
+        """Test consecutive color/brush changes keep only the last one"""
+        log = StrokeLogStore()
+        for color in ['#FF0000', '#00FF00', '#0000FF']:
+            log.append('ROOM01', {'type': 'color', 'color': color})
+        log.append('ROOM01', {'type': 'start', 'x': 1, 'y': 1})
+
+        assert decode_events(log.replay('ROOM01')) == [
+            {'type': 'color', 'color': '#0000FF'},
+            {'type': 'start', 'x': 1, 'y': 1},
+        ]
+
+    def test_reset_and_empty_replay(self):
+        """Test reset (clear/new round) empties the log"""
+        log = StrokeLogStore()
+        assert log.replay('ROOM01') is None
+
+        log.append('ROOM01', {'type': 'start', 'x': 1, 'y': 1})
+        log.reset('ROOM01')
+
+        assert log.replay('ROOM01') is None
+        assert log.stats()['rooms'] == 0
+
+    def test_memory_is_capped_per_room(self):
+        """Test a room stops recording once the byte cap is reached"""
+        log = StrokeLogStore(max_bytes=100, compact_every=8)
+        log.append('ROOM01', {'type': 'start', 'x': 0, 'y': 0})
+        accepted = sum(
+            log.append('ROOM01', {'type': 'move', 'x': i % 50, 'y': 0})
+            for i in range(1000)
+        )
+
+        stats = log.stats()
+        assert accepted < 1000
+        assert stats['max_room_bytes'] <= 100
+        assert stats['truncated_rooms'] == 1
+
+    def test_invalid_events_are_skipped(self):
+        """Test non-encodable events don't poison the snapshot"""
+        log = StrokeLogStore(compact_every=2)
+        log.append('ROOM01', {'type': 'start', 'x': 1, 'y': 1})
+        log.append('ROOM01', {'type': 'move', 'x': None, 'y': 1})
+
+        assert decode_events(log.replay('ROOM01')) == [{'type': 'start', 'x': 1, 'y': 1}]
+
+
+class TestStrokeSimplifier:
+    """Test cases for server-side stroke point reduction"""
+
+    def setup_method(self):
+        self.now = 0.0
+        self.simplifier = StrokeSimplifier(tolerance=0.25, max_hold=8, max_hold_ms=100,
+                                           clock=lambda: self.now)
+
+    def feed(self, events, sender='drawer'):
+        out = []
+        for event in events:
+            out += self.simplifier.process('ROOM01', sender, event)
+        return out
+
+    def test_straight_line_is_reduced(self):
+        """Test collinear points are dropped but the stroke still ends at its last point"""
+        events = [{'type': 'start', 'x': 0, 'y': 0}]
+        events += [{'type': 'move', 'x': 3 * i, 'y': 0} for i in range(1, 65)]
+        events.append({'type': 'end'})
+
+        out = self.feed(events)
+        moves = [e for e in out if e['type'] == 'move']
+
+        assert out[0] == events[0] and out[-1] == {'type': 'end'}
+        assert moves[-1] == {'type': 'move', 'x': 192, 'y': 0}
+        assert len(moves) == 64 // 8
+        assert self.simplifier.stats() == {'points_in': 64, 'points_out': 8, 'ratio': 0.125}
+
+    def test_error_stays_within_tolerance(self):
+        """Test every received point lies within tolerance of the forwarded polyline"""
+        import math
+        import random
+        rng = random.Random(7)
+        self.simplifier.process('ROOM01', 'drawer', {'type': 'brush_size', 'size': 8})
+        x, y, angle = 400.0, 300.0, 0.0
+        events = [{'type': 'start', 'x': x, 'y': y}]
+        for _ in range(500):
+            angle += rng.uniform(-0.3, 0.3)
+            step = rng.uniform(0.5, 6)
+            x, y = x + step * math.cos(angle), y + step * math.sin(angle)
+            events.append({'type': 'move', 'x': x, 'y': y})
+        events.append({'type': 'end'})
+
+        out = self.feed(events)
+        polyline = [(e['x'], e['y']) for e in out if e['type'] in ('start', 'move')]
+
+        assert polyline[-1] == (x, y)
+        assert len(polyline) < len(events) / 2
+        for event in events[1:-1]:
+            error = min(_segment_distance(event['x'], event['y'], a, b)
+                        for a, b in zip(polyline, polyline[1:]))
+            assert error <= 0.25 * 8 + 1e-9
+
+    def test_corner_is_kept(self):
+        """Test a sharp turn forwards the corner point"""
+        events = [{'type': 'start', 'x': 0, 'y': 0}]
+        events += [{'type': 'move', 'x': 10 * i, 'y': 0} for i in range(1, 4)]
+        events += [{'type': 'move', 'x': 30, 'y': 10 * i} for i in range(1, 4)]
+
+        out = self.feed(events)
+
+        assert {'type': 'move', 'x': 30, 'y': 0} in out
+        assert {'type': 'move', 'x': 30, 'y': 30} not in out   # còn đang giữ
+
+    def test_other_events_flush_held_points_first(self):
+        """Test a color change mid-stroke keeps its place after the held points"""
+        self.feed([{'type': 'start', 'x': 0, 'y': 0}, {'type': 'move', 'x': 10, 'y': 0}])
+        # Điểm sát điểm trước → bị lọc, chỉ nhớ lại làm điểm cuối
+        assert self.feed([{'type': 'move', 'x': 10.5, 'y': 0}]) == []
+
+        out = self.feed([{'type': 'color', 'color': '#FF0000'}])
+
+        assert out == [
+            {'type': 'move', 'x': 10, 'y': 0},
+            {'type': 'move', 'x': 10.5, 'y': 0},
+            {'type': 'color', 'color': '#FF0000'},
+        ]
+
+    def test_stale_points_are_released(self):
+        """Test a drawer pausing mid-stroke gets its held points flushed"""
+        self.feed([{'type': 'start', 'x': 0, 'y': 0}, {'type': 'move', 'x': 10, 'y': 0}])
+        assert self.simplifier.stale_rooms() == []
+
+        self.now += 0.2
+        assert self.simplifier.stale_rooms() == ['ROOM01']
+        assert self.simplifier.release_room('ROOM01') == [('drawer', {'type': 'move', 'x': 10, 'y': 0})]
+        assert self.simplifier.stale_rooms() == []
+
+        self.simplifier.discard_room('ROOM01')
+        assert self.simplifier.rooms == {}
+
+    def test_release_sender_frees_only_that_drawer(self):
+        """Test a departing drawer's held points are returned and their state is dropped"""
+        self.feed([{'type': 'start', 'x': 0, 'y': 0}, {'type': 'move', 'x': 10, 'y': 0}])
+        self.feed([{'type': 'start', 'x': 0, 'y': 0}, {'type': 'move', 'x': 10, 'y': 0}], sender='other')
+
+        assert self.simplifier.release_sender('ROOM01', 'drawer') == [{'type': 'move', 'x': 10, 'y': 0}]
+        assert set(self.simplifier.rooms['ROOM01']) == {'other'}
+        assert list(self.simplifier.holding) == [('ROOM01', 'other')]
+        assert self.simplifier.release_sender('ROOM01', 'drawer') == []
+
+        self.simplifier.release_sender('ROOM01', 'other')
+        assert self.simplifier.rooms == {}
+        assert self.simplifier.holding == {}
+
+    def test_disabled_and_invalid_points_pass_through(self):
+        """Test tolerance 0 and non-numeric coordinates are forwarded as-is"""
+        disabled = StrokeSimplifier(tolerance=0)
+        event = {'type': 'move', 'x': 1, 'y': 1}
+        assert disabled.process('ROOM01', 'drawer', event) == [event]
+
+        bad = {'type': 'move', 'x': None, 'y': 1}
+        assert self.simplifier.process('ROOM01', 'drawer', bad) == [bad]
+
+
+class TestReaper:
+    """Test cases for the TTL reaper"""
+
+    TTLS = {'player': 100, 'room': 300, 'room.waiting': 200, 'game': 50}
+
+    def setup_method(self):
+        self.now = 1000.0
+        self.connected = set()
+        self.reaper = Reaper(self.TTLS, clock=lambda: self.now, is_connected=self.connected.__contains__)
+
+    def _reap(self):
+        """Run every due entry through check() like app._reap_tick → [(kind, key, reason)]"""
+        return [
+            (kind, key, reason)
+            for kind, key in self.reaper.due()
+            for reason in [self.reaper.check(kind, key)] if reason
+        ]
+
+    def _player(self, sid, room_id, last_active):
+        room_handler.add_player_to_room(room_id, sid, sid)
+        player = data_store.get_player(sid)
+        player.last_active_ts = last_active
+        self.reaper.track(KIND_PLAYER, sid)
+        return player
+
+    def test_orphan_player_evicted_only_when_disconnected(self):
+        """Test idle players with a live socket are kept, vanished ones evicted"""
+        room_id = room_handler.create_room('host')
+        self._player('idle', room_id, 1000.0)
+        self._player('gone', room_id, 1000.0)
+        self.connected.add('idle')
+
+        self.now = 1099.0
+        assert self._reap() == []
+        self.now = 1101.0
+        assert self._reap() == [(KIND_PLAYER, 'gone', 'orphan')]
+
+        # Socket còn sống → xét lại sau 1 TTL, không quét lại mỗi tick
+        assert self.reaper.due(now=1150.0) == []
+        self.connected.discard('idle')
+        self.now = 1202.0
+        assert self._reap() == [(KIND_PLAYER, 'idle', 'orphan')]
+
+    def test_activity_rearms_instead_of_evicting(self):
+        """Test a touched object is re-armed at its new deadline"""
+        room_id = room_handler.create_room('host')
+        player = self._player('p1', room_id, 1000.0)
+        player.last_active_ts = 1080.0
+
+        self.now = 1101.0
+        assert self._reap() == []
+        assert self.reaper.due(now=1179.0) == []
+        self.now = 1181.0
+        assert self._reap() == [(KIND_PLAYER, 'p1', 'orphan')]
+
+    def test_room_ttl_depends_on_state_and_player_activity(self):
+        """Test waiting rooms expire sooner and any active player keeps a room alive"""
+        waiting = room_handler.create_room('host_a')
+        playing = room_handler.create_room('host_b')
+        self._player('p1', playing, 1250.0)
+        self.connected.add('p1')
+        data_store.get_room(playing).set_game(object())
+        for room_id in (waiting, playing):
+            data_store.get_room(room_id).last_active_ts = 1000.0
+            self.reaper.track(KIND_ROOM, room_id)
+
+        self.now = 1201.0
+        assert self._reap() == [(KIND_ROOM, waiting, 'empty')]
+        self.now = 1549.0
+        assert self._reap() == []
+        self.now = 1551.0
+        assert self._reap() == [(KIND_ROOM, playing, 'idle')]
+
+    def test_room_with_running_game_uses_playing_ttl(self):
+        """Test a room whose game is running (Room.state_code still waiting) outlives the waiting TTL"""
+        room_id = room_handler.create_room('host')
+        for sid in ('p1', 'p2'):
+            self._player(sid, room_id, 1000.0)
+            self.connected.add(sid)
+        ok, _ = game_handler.start_game(room_id)
+        assert ok
+        game_handler.start_round(room_id)
+        data_store.get_room(room_id).last_active_ts = 1000.0
+        self.reaper.track(KIND_ROOM, room_id)
+
+        self.now = 1201.0
+        assert self._reap() == []
+        game_handler.end_round(room_id)
+        self.now = 1301.0
+        assert self._reap() == [(KIND_ROOM, room_id, 'idle')]
+
+    def test_orphan_game_evicted(self):
+        """Test games outlive their room only until the next check"""
+        room_id = room_handler.create_room('host')
+        data_store.add_game(Game(room_id))
+        data_store.add_game(Game('GONE01'))
+        self.reaper.track(KIND_GAME, room_id)
+        self.reaper.track(KIND_GAME, 'GONE01')
+
+        self.now = 1051.0
+        assert self._reap() == [(KIND_GAME, 'GONE01', 'orphan')]
+        assert self.reaper.evictions == {(KIND_GAME, 'orphan'): 1}
+        assert len(self.reaper) == 1
+
+    def test_due_pops_only_expired_entries(self):
+        """Test a tick costs O(expired), bounded by batch"""
+        reaper = Reaper(self.TTLS, clock=lambda: self.now, batch=10)
+        for i in range(1000):
+            self.now = 1000.0 + i
+            reaper.track(KIND_PLAYER, f'sid_{i}')
+            reaper.track(KIND_PLAYER, f'sid_{i}')   # track lại không thêm entry
+
+        assert len(reaper) == 1000
+        assert reaper.due(now=1104.5) == [(KIND_PLAYER, 'sid_0'), (KIND_PLAYER, 'sid_1'),
+                                          (KIND_PLAYER, 'sid_2'), (KIND_PLAYER, 'sid_3'),
+                                          (KIND_PLAYER, 'sid_4')]
+        assert len(reaper.due(now=5000.0)) == 10
+        assert len(reaper) == 985
+
+    def test_parse_ttls(self):
+        """Test env overrides and disabled kinds"""
+        ttls = parse_ttls('player=30, room.waiting=0,bad=x,game', self.TTLS)
+        assert ttls == {'player': 30.0, 'room': 300, 'room.waiting': 0.0, 'game': 50}
+
+        reaper = Reaper({'player': 0})
+        reaper.track(KIND_PLAYER, 'p1')
+        assert len(reaper) == 0
+
+
 class TestChatHandler:
     """Test cases for chat_handler"""
     
@@ -293,3 +705,144 @@ class TestChatHandler:
         assert message_data is None
         assert is_correct == False
 
+    def _start_game_with_word(self, word):
+        from models.game import Game
+        room_handler.add_player_to_room(self.room_id, 'host_123', 'Host')
+        game = Game(self.room_id)
+        game.start_game(['host_123', 'player_1'])
+        game.drawer_id = 'host_123'
+        game.current_word = word
+        data_store.add_game(game)
+
+    def test_process_guess_exact_without_diacritics(self):
+        """Test a guess typed without Vietnamese accents scores"""
+        self._start_game_with_word('Con Mèo')
+
+        room_id, message_data, result, score_update = chat_handler.process_guess('player_1', 'con meo')
+
+        assert result == 'exact'
+        assert data_store.get_player('player_1').score == 100
+        # Chỉ 2 dòng đổi điểm (người đoán + người vẽ), không phải cả danh sách
+        assert score_update['version'] == data_store.get_room(room_id).score_version
+        rows = {row['id']: row for row in score_update['changes']}
+        assert rows['player_1'] == {'id': 'player_1', 'delta': 100, 'score': 100, 'flags': ['guessed']}
+        assert rows['host_123']['delta'] == 50
+
+    def test_repeat_exact_guess_scores_once(self):
+        """Test a player who already found the word is not scored again"""
+        self._start_game_with_word('Con Mèo')
+
+        chat_handler.process_guess('player_1', 'con meo')
+        _, _, result, score_update = chat_handler.process_guess('player_1', 'Con Mèo')
+
+        assert result == 'exact'
+        assert score_update is None
+        assert data_store.get_player('player_1').score == 100
+        assert game_handler.all_guessed(self.room_id)
+
+    def test_process_guess_close(self):
+        """Test a one-typo guess is reported close without scoring"""
+        self._start_game_with_word('Con Mèo')
+
+        _, message_data, result, score_update = chat_handler.process_guess('player_1', 'con mep')
+        _, _, is_correct = chat_handler.process_message('player_1', 'con mep')
+
+        assert result == 'close'
+        assert is_correct == False
+        assert message_data['message'] == 'con mep'
+        assert score_update is None
+        assert data_store.get_player('player_1').score == 0
+
+
+
+class TestGameHandler:
+    """Test cases for the self-driving round sequence"""
+
+    def setup_method(self):
+        self.room_id = room_handler.create_room('host_123')
+        for pid, name in (('host_123', 'Host'), ('player_1', 'P1'), ('player_2', 'P2')):
+            room_handler.add_player_to_room(self.room_id, pid, name)
+
+    def test_rounds_chain_until_game_over(self):
+        """Test every player draws once in join order, then the game is ranked"""
+        ok, _ = game_handler.start_game(self.room_id)
+        assert ok
+
+        info = game_handler.start_round(self.room_id)
+        drawers = [info['drawer_id']]
+        assert (info['round'], info['total_rounds']) == (1, 3)
+        assert data_store.get_player('host_123').is_drawer
+
+        for _ in range(2):
+            game_handler.end_round(self.room_id)
+            outcome, info = game_handler.advance(self.room_id)
+            assert outcome == game_handler.NEXT_ROUND
+            drawers.append(info['drawer_id'])
+        assert drawers == ['host_123', 'player_1', 'player_2']
+        assert not data_store.get_player('host_123').is_drawer
+
+        player = data_store.get_player('player_1')
+        player.add_score(100)
+        data_store.update_player(player)
+        game_handler.end_round(self.room_id)
+        outcome, results = game_handler.advance(self.room_id)
+
+        assert outcome == game_handler.GAME_OVER
+        assert data_store.get_game(self.room_id).state == 'finished'
+        assert [(row['id'], row['rank']) for row in results] == [
+            ('player_1', 1), ('host_123', 2), ('player_2', 2)]
+        # Không còn ở giờ nghỉ → advance không làm gì
+        assert game_handler.advance(self.room_id) == (None, None)
+
+    def test_game_ends_early_without_enough_players(self):
+        """Test the intermission finishes the game when players have left"""
+        game_handler.start_game(self.room_id)
+        game_handler.start_round(self.room_id)
+        game_handler.end_round(self.room_id)
+        room_handler.remove_player_from_room('player_1')
+        room_handler.remove_player_from_room('player_2')
+
+        outcome, results = game_handler.advance(self.room_id)
+        assert outcome == game_handler.GAME_OVER
+        assert [row['id'] for row in results] == ['host_123']
+
+    def test_new_game_resets_scores(self):
+        """Test starting again after a finished game starts from zero"""
+        player = data_store.get_player('player_1')
+        player.add_score(150)
+        data_store.update_player(player)
+
+        game_handler.start_game(self.room_id)
+        assert data_store.get_player('player_1').score == 0
+
+
+class TestScoreboard:
+    """Test cases for versioned scoreboard deltas"""
+
+    def setup_method(self):
+        self.room_id = room_handler.create_room('host_123')
+        room_handler.add_player_to_room(self.room_id, 'player_1', 'Test Player')
+
+    def test_record_bumps_version(self):
+        """Test every recorded change gets the next version"""
+        first = scoreboard.record(self.room_id, [scoreboard.change_row('player_1', 10, 10)])
+        second = scoreboard.record(
+            self.room_id, [scoreboard.change_row('player_2', flags=(scoreboard.FLAG_LEFT,))]
+        )
+
+        assert first['version'] + 1 == second['version']
+        assert second['changes'] == [{'id': 'player_2', 'delta': 0, 'score': None, 'flags': ['left']}]
+        assert data_store.get_room(self.room_id).score_version == second['version']
+
+    def test_snapshot_matches_version(self):
+        """Test a resync snapshot carries the full list at the current version"""
+        update = scoreboard.record(self.room_id, [])
+        snapshot = scoreboard.snapshot(self.room_id)
+
+        assert snapshot['version'] == update['version']
+        assert [p['id'] for p in snapshot['players']] == ['player_1']
+
+    def test_missing_room(self):
+        """Test a closed room yields nothing to broadcast"""
+        assert scoreboard.record('NOPE00', []) is None
+        assert scoreboard.snapshot('NOPE00') is None
@@ -1,9 +1,15 @@
 """
 Unit tests for models (Player and Room)
 """
+import pickle
+import sys
+import tracemalloc
+from datetime import datetime
+
 import pytest
 from models.player import Player
-from models.room import Room
+from models.room import Room, RoomState
+from models.game import Game, GameState
 
 
 class TestPlayer:
@@ -181,3 +187,214 @@ class TestRoom:
         assert len(data_with_players['players']) == 3
         assert 'host_123' in data_with_players['players']
 
+
+def _bytes_per_object(make, count=5000):
+    """Average traced allocation of make(i), objects kept alive while measuring."""
+    objects = [None] * count
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            objects[i] = make(i)
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return used / count
+
+
+class TestPlayerSet:
+    """Test cases for the ordered player id set of a room"""
+
+    def test_keeps_join_order_and_host_succession(self):
+        """Test giữ thứ tự join và chuyển host cho người join sớm nhất"""
+        room = Room('ROOM01', 'host')
+        for pid in ['p3', 'p1', 'p2']:
+            room.add_player(pid)
+        assert list(room.players) == ['host', 'p3', 'p1', 'p2']
+
+        room.remove_player('host')
+        assert room.host_id == 'p3'
+        room.remove_player('p1')
+        room.add_player('p1')
+        assert list(room.players) == ['p3', 'p2', 'p1']
+
+    def test_to_dict_players_is_a_list(self):
+        """Test to_dict() vẫn trả players dạng list"""
+        room = Room('ROOM01', 'host')
+        room.add_player('p1')
+        assert room.to_dict(include_players=True)['players'] == ['host', 'p1']
+
+    def test_large_room_operations_are_constant_time(self):
+        """Test thêm/xoá/kiểm tra player trong phòng lớn là O(1)"""
+        room = Room('ROOM01', 'host')
+        room.max_players = 100_000
+        for i in range(50_000):
+            room.add_player(f"p{i}")
+        # list.remove / `in` sẽ phải quét 50k phần tử mỗi lần
+        for i in range(0, 50_000, 2):
+            assert room.has_player(f"p{i}")
+            assert room.remove_player(f"p{i}")
+        assert room.get_player_count() == 25_001
+        assert room.players.first() == 'host'
+
+    def test_drawer_is_picked_from_player_set(self):
+        """Test chọn người vẽ trực tiếp từ PlayerSet"""
+        room = Room('ROOM01', 'host')
+        room.add_player('p1')
+        game = Game('ROOM01')
+        picks = {game.select_drawer(room.players) for _ in range(200)}
+        assert picks == {'host', 'p1'}
+
+
+class TestGame:
+    """Round chaining of the game state machine"""
+
+    def test_drawer_rotates_in_join_order(self):
+        """Test người vẽ xoay vòng theo thứ tự join"""
+        game = Game('ROOM01')
+        game.start_game(['a', 'b', 'c'], rounds=2)
+        assert game.total_rounds == 6
+
+        drawers = []
+        for _ in range(4):
+            drawers.append(game.start_round(['a', 'b', 'c'], ['word'])['drawer_id'])
+            game.end_round()
+        assert drawers == ['a', 'b', 'c', 'a']
+        assert game.current_round == 4
+
+    def test_rotation_continues_after_drawer_leaves(self):
+        """Test người vẽ rời phòng thì lượt chuyển cho người kế tiếp"""
+        game = Game('ROOM01')
+        game.start_game(['a', 'b', 'c', 'd'])
+        game.start_round(['a', 'b', 'c', 'd'], ['word'])
+        game.end_round()
+        assert game.start_round(['a', 'b', 'c', 'd'], ['word'])['drawer_id'] == 'b'
+        game.end_round()
+        # b rời phòng → c (người đứng sau b) vẽ tiếp, không ai bị bỏ qua
+        assert game.start_round(['a', 'c', 'd'], ['word'])['drawer_id'] == 'c'
+
+    def test_has_next_round_and_finish(self):
+        """Test còn round kế tiếp hay không và kết thúc game"""
+        game = Game('ROOM01')
+        game.start_game(['a', 'b'])
+        game.start_round(['a', 'b'], ['word'])
+        game.end_round()
+        assert game.has_next_round(2)
+        assert not game.has_next_round(1)
+
+        game.start_round(['a', 'b'], ['word'])
+        game.end_round()
+        assert game.current_round == game.total_rounds == 2
+        assert not game.has_next_round(2)
+        game.finish()
+        assert game.state == 'finished' and game.current_word is None
+
+    def test_all_guessed_ignores_drawer_and_offline_players(self):
+        """Test all_guessed bỏ qua người vẽ và player mất kết nối"""
+        players = [Player(pid, pid, 'ROOM01') for pid in ('a', 'b', 'c')]
+        game = Game('ROOM01')
+        game.drawer_id = 'a'
+        assert not game.all_guessed(players)
+
+        players[1].mark_guessed()
+        assert not game.all_guessed(players)
+        players[2].connected = False
+        assert game.all_guessed(players)
+        assert not game.all_guessed(players[:1])
+
+
+class TestCompactModels:
+    """Memory budgets and compatibility of the slot-based models"""
+
+    # Budget đo trên CPython 3.11 (64-bit): Player ~96B, Room ~305B, Game ~96B.
+    # Bản dùng __dict__ trước đó: Player ~145B, Room ~250B, Game ~137B.
+    # Room.players là PlayerSet (dict, O(1) membership): +~120B/phòng so với list.
+    # last_active_ts (reaper) chỉ thêm 1 slot: float mốc dùng chung (models/activity.py).
+    # Game tự chạy nhiều round: +2 slot (total_rounds, drawer_index), int nhỏ dùng chung.
+    PLAYER_BUDGET = 100
+    ROOM_BUDGET = 320
+    GAME_BUDGET = 120
+
+    def test_player_memory_budget(self):
+        """Test mỗi Player nằm trong budget bộ nhớ"""
+        ids = [f"sid_{i:020d}" for i in range(5000)]
+        per_player = _bytes_per_object(lambda i: Player(ids[i], 'Player', 'ROOM01'))
+        assert per_player <= self.PLAYER_BUDGET
+
+    def test_room_memory_budget(self):
+        """Test mỗi Room nằm trong budget bộ nhớ"""
+        # Intern trước: entry trong bảng intern là chi phí 1 lần/phòng, không thuộc object
+        room_ids = [sys.intern(f"R{i:05d}") for i in range(5000)]
+        per_room = _bytes_per_object(lambda i: Room(room_ids[i], 'host'))
+        assert per_room <= self.ROOM_BUDGET
+
+    def test_game_memory_budget(self):
+        """Test mỗi Game nằm trong budget bộ nhớ"""
+        per_game = _bytes_per_object(lambda i: Game('ROOM01'))
+        assert per_game <= self.GAME_BUDGET
+
+    def test_no_instance_dict(self):
+        """Test model dùng __slots__, không có __dict__ riêng"""
+        for obj in (Player('p1', 'P', 'R1'), Room('R1', 'p1'), Game('R1')):
+            assert not hasattr(obj, '__dict__')
+
+    def test_room_ids_are_shared_between_players(self):
+        """Test room_id được intern, các player dùng chung 1 chuỗi"""
+        # Mỗi lần join room_id là 1 chuỗi mới từ client
+        first = Player('p1', 'P1', ''.join(['ROOM', '01']))
+        second = Player('p2', 'P2', ''.join(['ROOM', '01']))
+        assert first.room_id is second.room_id
+
+    def test_states_are_small_ints_with_string_api(self):
+        """Test state lưu dạng int nhỏ nhưng API chuỗi vẫn như cũ"""
+        room = Room('ROOM01', 'host')
+        assert room.state_code is RoomState.WAITING
+        room.set_game(object())
+        assert room.game_state == 'playing'
+        room.game_state = 'ended'
+        assert room.state_code == RoomState.ENDED
+
+        game = Game('ROOM01')
+        game.start_game(['a', 'b'])
+        assert game.state == 'playing'
+        game.end_round()
+        assert game.state == 'round_ended'
+        assert game.state_code is GameState.ROUND_ENDED
+
+    def test_touch_shares_rounded_timestamps(self):
+        """Test touch() làm tròn mốc thời gian và dùng chung object float"""
+        players = [Player(f'p{i}', 'P', 'ROOM01') for i in range(3)]
+        assert players[0].touch(now=1_000_000.0) is True
+        assert players[0].touch(now=1_000_001.0) is False
+        for player in players[1:]:
+            player.touch(now=1_000_002.0)
+        assert players[1].last_active_ts is players[0].last_active_ts
+
+        room = Room('ROOM01', 'host')
+        assert room.touch(now=2_000_000.0) and room.last_active_ts <= 2_000_000.0
+
+    def test_to_dict_output_unchanged(self):
+        """Test to_dict() trả về đúng định dạng cũ"""
+        room = Room('ROOM01', 'host')
+        data = room.to_dict(include_players=True)
+        assert data == {
+            'id': 'ROOM01',
+            'host_id': 'host',
+            'player_count': 1,
+            'game_state': 'waiting',
+            'created_at': datetime.fromtimestamp(room.created_ts).isoformat(),
+            'players': ['host'],
+        }
+        assert isinstance(room.created_at, datetime)
+
+    def test_models_pickle_round_trip(self):
+        """Test model pickle/unpickle không mất dữ liệu"""
+        player = Player('p1', 'P1', 'ROOM01')
+        player.add_score(50)
+        game = Game('ROOM01')
+        game.start_game(['a', 'b'])
+        room = Room('ROOM01', 'p1')
+
+        assert pickle.loads(pickle.dumps(player)).to_dict() == player.to_dict()
+        assert pickle.loads(pickle.dumps(game)).state == 'playing'
+        assert pickle.loads(pickle.dumps(room)).to_dict() == room.to_dict()
@@ -0,0 +1,180 @@
+"""
+Integration test: hai server process dùng chung phòng qua message bus
+(broker Unix-socket làm cả state backend lẫn Socket.IO message queue)
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+
+socketio = pytest.importorskip('socketio')
+
+from storage.message_bus import Broker
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+APP_PATH = os.path.join(BACKEND_DIR, 'src', 'app.py')
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='needs Unix sockets')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server(bus_url):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        FLASK_ENV='production',
+        STATE_BACKEND_URL=bus_url,
+        MESSAGE_QUEUE_URL=bus_url,
+        ROUND_TIMER_SECONDS='2',
+    )
+    proc = subprocess.Popen(
+        [sys.executable, APP_PATH], env=env, cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + '/', timeout=0.5).read()
+            return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError('server did not start')
+
+
+class Recorder:
+    """socketio.Client that records every received event."""
+    def __init__(self, url):
+        self.events = {}
+        self.cond = threading.Condition()
+        self.client = socketio.Client(reconnection=False)
+        self.client.on('*', self._record)
+        self.client.connect(url, transports=['websocket'])
+
+    def _record(self, event, *args):
+        with self.cond:
+            self.events.setdefault(event, []).append(args[0] if args else None)
+            self.cond.notify_all()
+
+    def wait_for(self, event, timeout=10, predicate=None):
+        deadline = time.time() + timeout
+        with self.cond:
+            while True:
+                for data in self.events.get(event, []):
+                    if predicate is None or predicate(data):
+                        return data
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise AssertionError(f"timed out waiting for {event}; got {list(self.events)}")
+                self.cond.wait(remaining)
+
+
+@pytest.fixture
+def two_servers(tmp_path):
+    broker = Broker(str(tmp_path / 'bus.sock'))
+    broker.start()
+    bus_url = f"unix://{broker.path}"
+    procs = []
+    try:
+        for _ in range(2):
+            procs.append(_start_server(bus_url))
+        yield [url for _, url in procs]
+    finally:
+        for proc, _ in procs:
+            proc.terminate()
+            proc.wait(5)
+        broker.close()
+
+
+def test_full_round_across_two_processes(two_servers):
+    """Host trên server A, người chơi trên server B, chơi trọn 1 round"""
+    url_a, url_b = two_servers
+    host = Recorder(url_a)
+    guest = Recorder(url_b)
+    try:
+        host.client.emit('create_room', {})
+        room_id = host.wait_for('room_created')['room_id']
+        host.client.emit('join_room', {'room_id': room_id, 'player_name': 'Host'})
+        host.wait_for('room_joined')
+
+        # Phòng tạo ở A phải join được từ B
+        guest.client.emit('join_room', {'room_id': room_id, 'player_name': 'Guest'})
+        assert len(guest.wait_for('room_joined')['players']) == 2
+        host.wait_for('player_joined', predicate=lambda d: d['player']['name'] == 'Guest')
+
+        host.client.emit('start_game', {'room_id': room_id})
+        for recorder in (host, guest):
+            recorder.wait_for('game_started')
+            recorder.wait_for('round_started')
+
+        drawer, guesser = (host, guest) if host.wait_for('round_started')['is_drawer'] else (guest, host)
+        word = drawer.wait_for('round_started')['word']
+
+        drawer.client.emit('drawing_start', {'x': 10, 'y': 10})
+        drawer.client.emit('drawing_move', {'x': 20, 'y': 20})
+        drawer.client.emit('drawing_end', {})
+        guesser.wait_for('canvas_update')
+
+        guesser.client.emit('send_message', {'message': word})
+        guesser.wait_for('correct_guess')
+        changes = drawer.wait_for('scores_updated')['changes']
+        assert sorted(row['score'] for row in changes) == [50, 100]
+
+        for recorder in (host, guest):
+            assert recorder.wait_for('round_ended')['word'] == word
+    finally:
+        host.client.disconnect()
+        guest.client.disconnect()
+
+
+def test_resume_on_other_process(two_servers):
+    """Người chơi mất kết nối ở server B, kết nối lại qua server A và giữ chỗ"""
+    url_a, url_b = two_servers
+    host = Recorder(url_a)
+    guest = Recorder(url_b)
+    resumed = None
+    try:
+        host.client.emit('create_room', {})
+        room_id = host.wait_for('room_created')['room_id']
+        host.client.emit('join_room', {'room_id': room_id, 'player_name': 'Host'})
+        host.wait_for('room_joined')
+        guest.client.emit('join_room', {'room_id': room_id, 'player_name': 'Guest'})
+        token = guest.wait_for('room_joined')['resume_token']
+        old_sid = guest.client.get_sid()
+
+        guest.client.disconnect()
+        assert host.wait_for('player_disconnected')['player_id'] == old_sid
+
+        resumed = Recorder(url_a)
+        resumed.client.emit('resume', {'token': token})
+        state = resumed.wait_for('resumed')
+        assert state['room_id'] == room_id
+        assert [p['name'] for p in state['players']] == ['Host', 'Guest']
+        assert state['resume_token'] != token
+
+        notice = host.wait_for('player_resumed')
+        assert notice['previous_id'] == old_sid
+        assert notice['player_id'] == state['player_id']
+        assert 'player_left' not in host.events
+
+        # Token cũ hết hiệu lực sau khi đã resume
+        again = Recorder(url_b)
+        again.client.emit('resume', {'token': token})
+        assert again.wait_for('resume_failed')['reason'] == 'expired'
+        again.client.disconnect()
+    finally:
+        host.client.disconnect()
+        if resumed is not None:
+            resumed.client.disconnect()
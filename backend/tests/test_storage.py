@@ -1,10 +1,15 @@
 """
 Unit tests for storage/data_store
 """
+import os
+import sys
+import threading
+
 import pytest
 from storage import data_store
 from models.room import Room
 from models.player import Player
+from models.game import Game
 
 
 class TestDataStore:
@@ -21,6 +26,21 @@ class TestDataStore:
         assert retrieved.host_id == 'host_123'
         assert retrieved == room
     
+    def test_counts(self):
+        """Test O(1) counts used by the metrics gauges"""
+        data_store.add_room(Room('TEST01', 'host_123'))
+        data_store.add_player(Player('p1', 'Player 1', 'TEST01'))
+        data_store.add_player(Player('p2', 'Player 2', 'TEST01'))
+
+        assert data_store.counts() == (1, 2, 0)
+
+    def test_next_sequence(self):
+        """Test named counters are independent and survive clear_all"""
+        assert [data_store.next_sequence('a') for _ in range(3)] == [1, 2, 3]
+        assert data_store.next_sequence('b') == 1
+        data_store.clear_all()
+        assert data_store.next_sequence('a') == 4
+
     def test_get_nonexistent_room(self):
         """Test getting a room that doesn't exist"""
         result = data_store.get_room('NONEXIST')
@@ -40,6 +60,19 @@ class TestDataStore:
         # Verify room is gone
         assert data_store.get_room('TEST01') is None
     
+    def test_remove_room_drops_index_bucket(self):
+        """Test removing a room also drops its room_players bucket"""
+        data_store.add_room(Room('ROOM01', 'p1'))
+        data_store.add_player(Player('p1', 'Player 1', 'ROOM01'))
+
+        data_store.remove_room('ROOM01')
+
+        assert 'ROOM01' not in data_store.get_backend().room_players
+        assert data_store.get_players_in_room('ROOM01') == []
+        # Player vẫn còn, xoá sau đó không lỗi
+        data_store.remove_player('p1')
+        assert data_store.get_backend().room_players == {}
+
     def test_remove_nonexistent_room(self):
         """Test removing a room that doesn't exist (should not error)"""
         # Should not raise exception
@@ -151,3 +184,469 @@ class TestDataStore:
         assert data_store.get_room('ROOM01') is None
         assert data_store.get_player('player_1') is not None
 
+
+    def test_players_in_room_keep_join_order(self):
+        """Test room index returns players in join order"""
+        for pid in ['p3', 'p1', 'p2']:
+            data_store.add_player(Player(pid, pid, 'ROOM01'))
+
+        assert [p.id for p in data_store.get_players_in_room('ROOM01')] == ['p3', 'p1', 'p2']
+        assert data_store.count_players_in_room('ROOM01') == 3
+
+    def test_room_index_follows_remove_and_move(self):
+        """Test room index stays consistent on remove_player/move_player"""
+        data_store.add_player(Player('p1', 'Player 1', 'ROOM01'))
+        data_store.add_player(Player('p2', 'Player 2', 'ROOM01'))
+
+        data_store.move_player('p1', 'ROOM02')
+        assert [p.id for p in data_store.get_players_in_room('ROOM01')] == ['p2']
+        assert [p.id for p in data_store.get_players_in_room('ROOM02')] == ['p1']
+        assert data_store.get_player('p1').room_id == 'ROOM02'
+
+        data_store.remove_player('p2')
+        assert data_store.get_players_in_room('ROOM01') == []
+        assert 'ROOM01' not in data_store.get_backend().room_players
+
+    def test_re_adding_player_with_new_room_reindexes(self):
+        """Test replacing a Player object under the same id moves its index entry"""
+        data_store.add_player(Player('p1', 'Player 1', 'ROOM01'))
+        data_store.add_player(Player('p1', 'Player 1', 'ROOM02'))
+
+        assert data_store.get_players_in_room('ROOM01') == []
+        assert len(data_store.get_players_in_room('ROOM02')) == 1
+
+    def test_rename_player_keeps_seat(self):
+        """Test a resumed player keeps join order, host and drawer under its new id"""
+        _assert_rename_keeps_seat()
+
+
+def _assert_rename_keeps_seat():
+    """Shared check: rename keeps join order, host and drawer under the new id."""
+    room = Room('ROOM01', 'p1')
+    for pid in ['p2', 'p3']:
+        room.add_player(pid)
+    data_store.add_room(room)
+    for pid in ['p1', 'p2', 'p3']:
+        data_store.add_player(Player(pid, pid, 'ROOM01'))
+    game = Game('ROOM01')
+    game.drawer_id = 'p1'
+    data_store.add_game(game)
+
+    player = data_store.rename_player('p1', 'p9')
+
+    assert player.id == 'p9'
+    assert data_store.get_player('p1') is None
+    assert [p.id for p in data_store.get_players_in_room('ROOM01')] == ['p9', 'p2', 'p3']
+    room = data_store.get_room('ROOM01')
+    assert list(room.players) == ['p9', 'p2', 'p3']
+    assert room.host_id == 'p9'
+    assert data_store.get_game('ROOM01').drawer_id == 'p9'
+    assert data_store.rename_player('missing', 'p10') is None
+
+
+def _run_threads(workers, setswitch=1e-6):
+    """Run callables concurrently with a tiny switch interval, re-raise errors."""
+    errors = []
+    start = threading.Barrier(len(workers))
+
+    def wrap(fn):
+        def run():
+            start.wait()
+            try:
+                fn()
+            except Exception as ex:  # noqa: BLE001 - collected and re-raised
+                errors.append(ex)
+        return run
+
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(setswitch)
+    try:
+        threads = [threading.Thread(target=wrap(fn)) for fn in workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(old_interval)
+    if errors:
+        raise errors[0]
+
+
+class TestConcurrency:
+    """Stress tests: handler threads + timer thread touching the store at once"""
+
+    def test_readers_never_see_dict_changed_size(self):
+        """Test iterating snapshots while other threads add/remove players"""
+        for i in range(500):
+            data_store.add_player(Player(f"base{i}", 'Base', f"ROOM{i % 3}"))
+        readers_done = threading.Event()
+        remaining = [4]
+        lock = threading.Lock()
+
+        def writer(offset):
+            def run():
+                batch = [f"w{offset}_{i}" for i in range(20)]
+                while not readers_done.is_set():
+                    for i, pid in enumerate(batch):
+                        data_store.add_player(Player(pid, pid, f"ROOM{i % 3}"))
+                    for pid in batch:
+                        data_store.remove_player(pid)
+            return run
+
+        def reader():
+            try:
+                for _ in range(100):
+                    for player in data_store.get_all_players().values():
+                        player.to_dict()
+                    for room_id in ('ROOM0', 'ROOM1', 'ROOM2'):
+                        data_store.get_players_in_room(room_id)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    if not remaining[0]:
+                        readers_done.set()
+
+        _run_threads([writer(n) for n in range(4)] + [reader] * 4)
+        assert len(data_store.get_all_players()) == 500
+        assert sum(data_store.count_players_in_room(f"ROOM{i}") for i in range(3)) == 500
+
+    def test_concurrent_moves_do_not_lose_players(self):
+        """Test move_player keeps Room objects and the index consistent"""
+        rooms = [Room(f"ROOM{i}", f"host{i}") for i in range(3)]
+        for room in rooms:
+            room.players.clear()
+            room.max_players = 1000
+            data_store.add_room(room)
+        player_ids = [f"p{i}" for i in range(60)]
+        for i, pid in enumerate(player_ids):
+            data_store.add_player(Player(pid, pid, 'ROOM0'))
+            rooms[0].add_player(pid)
+
+        def mover(seed):
+            def run():
+                for step in range(300):
+                    pid = player_ids[(seed * 7 + step) % len(player_ids)]
+                    data_store.move_player(pid, f"ROOM{(seed + step) % 3}")
+            return run
+
+        _run_threads([mover(n) for n in range(8)])
+
+        members = [pid for room in rooms for pid in room.players]
+        assert sorted(members) == sorted(player_ids)
+        for room in rooms:
+            indexed = [p.id for p in data_store.get_players_in_room(room.id)]
+            assert sorted(indexed) == sorted(room.players)
+            assert all(data_store.get_player(pid).room_id == room.id for pid in room.players)
+
+    def test_concurrent_joins_are_not_lost(self):
+        """Test room_handler joins racing on one room all land in Room.players"""
+        from handlers import room_handler
+
+        room_id = room_handler.create_room('host')
+        room = data_store.get_room(room_id)
+        room.max_players = 1000
+
+        def joiner(offset):
+            def run():
+                for i in range(25):
+                    room_handler.add_player_to_room(room_id, f"j{offset}_{i}", 'Player')
+            return run
+
+        _run_threads([joiner(n) for n in range(8)])
+        assert room.get_player_count() == 1 + 8 * 25
+        assert data_store.count_players_in_room(room_id) == 8 * 25
+
+    def test_close_room_races_with_joins(self):
+        """Test close_room removes room, game and every player atomically"""
+        from handlers import room_handler
+        from models.game import Game
+
+        room_id = room_handler.create_room('host')
+        data_store.get_room(room_id).max_players = 1000
+        data_store.add_game(Game(room_id))
+        closed = threading.Event()
+
+        def joiner(offset):
+            def run():
+                for i in range(50):
+                    room_handler.add_player_to_room(room_id, f"j{offset}_{i}", 'Player')
+            return run
+
+        def closer():
+            for _ in range(1000):
+                if data_store.count_players_in_room(room_id) >= 20:
+                    break
+            room_handler.close_room(room_id)
+            closed.set()
+
+        _run_threads([joiner(n) for n in range(4)] + [closer])
+
+        assert closed.is_set()
+        assert data_store.get_room(room_id) is None
+        assert data_store.get_game(room_id) is None
+        assert data_store.get_players_in_room(room_id) == []
+        assert all(p.room_id != room_id for p in data_store.get_all_players().values())
+
+    def test_close_room_returns_removed_players(self):
+        """Test close_room only drops players still pointing at the room"""
+        room = Room('ROOM01', 'p1')
+        data_store.add_room(room)
+        data_store.add_player(Player('p1', 'Player 1', 'ROOM01'))
+        data_store.add_player(Player('p2', 'Player 2', 'ROOM01'))
+        data_store.add_player(Player('p3', 'Player 3', 'ROOM02'))
+
+        removed = data_store.close_room('ROOM01')
+
+        assert sorted(p.id for p in removed) == ['p1', 'p2']
+        assert data_store.get_player('p3') is not None
+        assert data_store.get_room('ROOM01') is None
+
+
+class TestKeyValueBackend:
+    """Test cases for the shared backend on top of the Unix-socket broker"""
+
+    @pytest.fixture
+    def backend(self, tmp_path):
+        from storage.backends import KeyValueBackend
+        from storage.message_bus import Broker, BrokerClient
+
+        broker = Broker(str(tmp_path / 'bus.sock'))
+        broker.start()
+        previous = data_store.get_backend()
+        backend = KeyValueBackend(BrokerClient(f"unix://{broker.path}"))
+        data_store.set_backend(backend)
+        yield backend
+        data_store.set_backend(previous)
+        broker.close()
+
+    def test_rooms_round_trip(self, backend):
+        """Test rooms are stored and reloaded as copies"""
+        room = Room('ROOM01', 'host_1')
+        data_store.add_room(room)
+
+        loaded = data_store.get_room('ROOM01')
+        assert loaded is not room
+        assert loaded.host_id == 'host_1'
+
+        loaded.add_player('p2')
+        data_store.update_room(loaded)
+        assert data_store.get_room('ROOM01').has_player('p2')
+
+        data_store.remove_room('ROOM01')
+        assert data_store.get_room('ROOM01') is None
+
+    def test_players_in_room_order_and_moves(self, backend):
+        """Test the shared room index keeps join order across moves"""
+        for pid in ['p3', 'p1', 'p2']:
+            data_store.add_player(Player(pid, pid, 'ROOM01'))
+
+        assert [p.id for p in data_store.get_players_in_room('ROOM01')] == ['p3', 'p1', 'p2']
+
+        data_store.move_player('p1', 'ROOM02')
+        assert [p.id for p in data_store.get_players_in_room('ROOM01')] == ['p3', 'p2']
+        assert data_store.count_players_in_room('ROOM02') == 1
+
+        player = data_store.get_player('p3')
+        player.add_score(100)
+        data_store.update_player(player)
+        assert data_store.get_player('p3').score == 100
+        assert [p.id for p in data_store.get_players_in_room('ROOM01')] == ['p3', 'p2']
+
+    def test_remove_room_drops_index(self, backend):
+        """Test removing a room deletes its shared room_players set"""
+        data_store.add_room(Room('ROOM01', 'p1'))
+        data_store.add_player(Player('p1', 'Player 1', 'ROOM01'))
+
+        data_store.remove_room('ROOM01')
+
+        assert data_store.get_players_in_room('ROOM01') == []
+
+    def test_counts(self, backend):
+        """Test counts come from the shared hashes"""
+        data_store.add_room(Room('ROOM01', 'host_1'))
+        data_store.add_player(Player('p1', 'Player 1', 'ROOM01'))
+
+        assert data_store.counts() == (1, 1, 0)
+
+    def test_next_sequence(self, backend):
+        """Test counters are shared through the store (INCR)"""
+        from storage.backends import KeyValueBackend
+
+        assert data_store.next_sequence('room_id') == 1
+        other = KeyValueBackend(backend.client)
+        assert other.next_sequence('room_id') == 2
+
+    def test_clear_all(self, backend):
+        """Test clear_all wipes every hash and index"""
+        data_store.add_room(Room('ROOM01', 'host_1'))
+        data_store.add_player(Player('p1', 'Player 1', 'ROOM01'))
+
+        data_store.clear_all()
+
+        assert data_store.get_all_rooms() == {}
+        assert data_store.get_players_in_room('ROOM01') == []
+
+    def test_rename_player_keeps_seat(self, backend):
+        """Test rename through the shared hashes keeps order, host and drawer"""
+        _assert_rename_keeps_seat()
+
+    def test_room_lock_serializes_processes(self, backend):
+        """Test read-modify-write of one room from two 'processes' never loses an update"""
+        from storage.backends import KeyValueBackend
+        from storage.message_bus import BrokerClient
+
+        data_store.add_room(Room('ROOM01', 'host_1'))
+        # 2 client riêng trên cùng broker = 2 server process
+        backends = [backend, KeyValueBackend(BrokerClient(backend.client.path))]
+        barrier = threading.Barrier(8)
+
+        def worker(store):
+            barrier.wait()
+            for _ in range(25):
+                with store.transaction('ROOM01'):
+                    room = store.get_room('ROOM01')
+                    room.score_version += 1
+                    store.update_room(room)
+
+        threads = [threading.Thread(target=worker, args=(backends[i % 2],)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert data_store.get_room('ROOM01').score_version == 8 * 25
+
+    def test_room_lock_is_reentrant_and_expires(self, backend):
+        """Test nested locks of one room don't deadlock and a dead holder's lock expires"""
+        from storage.backends import KeyValueBackend
+
+        with backend.room_lock('ROOM01'):
+            with backend.transaction('ROOM01'):
+                pass
+            # Process khác chờ tối đa lock_seconds rồi báo lỗi
+            other = KeyValueBackend(backend.client, lock_seconds=0.2)
+            with pytest.raises(TimeoutError):
+                with other.room_lock('ROOM01'):
+                    pass
+
+        crashed = backend.client.lock('lock:room:ROOM02', timeout=0.2)
+        assert crashed.acquire()
+        with KeyValueBackend(backend.client, lock_seconds=2).room_lock('ROOM02'):
+            pass
+
+
+class TestPersistentBackend:
+    """Test cases for the journal + snapshot backend (file:///dir)"""
+
+    @pytest.fixture
+    def directory(self, tmp_path):
+        previous = data_store.get_backend()
+        yield str(tmp_path / 'state')
+        data_store.set_backend(previous)
+
+    def _open(self, directory, **options):
+        from storage.persistence import PersistentBackend
+
+        backend = PersistentBackend(directory, **options)
+        data_store.set_backend(backend)
+        return backend
+
+    def _fill(self):
+        data_store.add_room(Room('ROOM01', 'p1'))
+        for pid in ['p1', 'p2', 'p3']:
+            with data_store.transaction():
+                room = data_store.get_room('ROOM01')
+                room.add_player(pid)
+                data_store.update_room(room)
+                data_store.add_player(Player(pid, pid.upper(), 'ROOM01'))
+        game = Game('ROOM01')
+        game.start_game(['p1', 'p2', 'p3'])
+        game.start_round(['p1', 'p2', 'p3'], ['apple'])
+        data_store.add_game(game)
+        player = data_store.get_player('p2')
+        player.add_score(100)
+        data_store.update_player(player)
+        data_store.next_sequence('room_id')
+
+    def _assert_filled(self):
+        assert [p.id for p in data_store.get_players_in_room('ROOM01')] == ['p1', 'p2', 'p3']
+        assert data_store.get_room('ROOM01').host_id == 'p1'
+        assert data_store.get_player('p2').score == 100
+        game = data_store.get_game('ROOM01')
+        assert game.state == 'playing'
+        assert (game.current_word, game.drawer_id, game.total_rounds) == ('apple', 'p1', 3)
+        assert data_store.next_sequence('room_id') == 2
+
+    def test_journal_replay(self, directory):
+        """Test state written only to the journal comes back after a restart"""
+        backend = self._open(directory)
+        self._fill()
+        backend.close()
+
+        restored = self._open(directory)
+        self._assert_filled()
+        assert restored.recovery['players'] == 3
+        assert restored.recovery['torn'] == 0
+
+    def test_snapshot_then_journal_tail(self, directory):
+        """Test recovery = snapshot + segments written after it; older segments are dropped"""
+        from storage.persistence import list_segments
+
+        backend = self._open(directory)
+        self._fill()
+        info = backend.snapshot()
+        assert (info['rooms'], info['players'], info['games']) == (1, 3, 1)
+        assert list_segments(directory) == [backend.journal.generation]
+
+        data_store.rename_player('p3', 'p3b')
+        data_store.remove_player('p2')
+        backend.close()
+
+        self._open(directory)
+        assert [p.id for p in data_store.get_players_in_room('ROOM01')] == ['p1', 'p3b']
+        assert data_store.get_room('ROOM01').has_player('p3b')
+        assert data_store.get_player('p3b').name == 'P3'
+
+    def test_torn_tail_is_ignored(self, directory):
+        """Test a record cut short by a crash is skipped, the ones before it are kept"""
+        from storage.persistence import list_segments, segment_path
+
+        backend = self._open(directory)
+        self._fill()
+        backend.close()
+        path = segment_path(directory, list_segments(directory)[-1])
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)
+
+        restored = self._open(directory)
+        assert restored.recovery['torn'] == 1
+        assert data_store.get_room('ROOM01').host_id == 'p1'
+        # Record cuối (next_sequence) bị cắt → bộ đếm chưa tăng
+        assert data_store.next_sequence('room_id') == 1
+
+    def test_fsync_always_writes_inline(self, directory):
+        """Test fsync=always needs no flush for records to reach the file"""
+        from storage.persistence import read_segment, segment_path
+
+        backend = self._open(directory, fsync='always')
+        data_store.add_room(Room('ROOM01', 'host_1'))
+
+        records, torn = read_segment(segment_path(directory, backend.journal.generation))
+        assert [record[0] for record in records] == ['r']
+        assert not torn
+        backend.close()
+
+    def test_invalid_fsync_mode(self, directory):
+        """Test an unknown fsync mode is rejected"""
+        with pytest.raises(ValueError):
+            self._open(directory, fsync='sometimes')
+
+    def test_create_backend_from_url(self, directory):
+        """Test file:// URLs select the persistent backend with query options"""
+        from storage.backends import create_backend
+        from storage.persistence import FSYNC_OFF, PersistentBackend
+
+        backend = create_backend(f"file://{directory}?fsync=off")
+        assert isinstance(backend, PersistentBackend)
+        assert backend.journal.fsync == FSYNC_OFF
+        backend.close()
@@ -0,0 +1,863 @@
+"""
+Unit tests for utils
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import pytest
+from config.async_mode import select_async_mode
+from utils.scheduler import Scheduler
+from utils.room_executor import RoomExecutor
+from utils.word_list import WordListService
+from utils.stroke_codec import encode_events, decode_events, StrokeCodecError
+from utils.guess_matcher import (
+    GuessMatcher, normalize, bounded_distance, GUESS_EXACT, GUESS_CLOSE, GUESS_MISS,
+)
+from utils import logger as event_log
+from utils.metrics import (
+    MetricsRegistry, EVENTS_TOTAL, HANDLER_ERRORS_TOTAL, HANDLER_CPU_SECONDS_TOTAL,
+    EMITS_TOTAL, EMIT_BYTES_TOTAL,
+)
+from utils.profiler import SamplingProfiler, MODE_WALL, _thread_cpu_time
+from utils.metrics import registry as metrics_registry
+from utils.resume_tokens import ResumeTokens
+from utils.room_ids import RoomIdAllocator
+from utils.validators import validate_room_id
+from utils.rate_limiter import RateLimiter, parse_limits, RATE_LIMITED_TOTAL, PENDING_PER_EVENT
+
+
+class TestAsyncMode:
+    """Test cases for ASYNC_MODE selection"""
+
+    def test_default_is_threading(self, monkeypatch):
+        """Test threading is used when ASYNC_MODE is unset"""
+        monkeypatch.delenv('ASYNC_MODE', raising=False)
+        assert select_async_mode() == 'threading'
+
+    def test_unknown_mode_falls_back(self):
+        """Test an unknown mode falls back to threading"""
+        assert select_async_mode('tornado') == 'threading'
+
+    @pytest.mark.parametrize('mode, module', [('eventlet', 'eventlet'), ('gevent', 'gevent')])
+    def test_missing_package_falls_back(self, monkeypatch, mode, module):
+        """Test a missing eventlet/gevent package falls back to threading"""
+        monkeypatch.setitem(sys.modules, module, None)
+        assert select_async_mode(mode) == 'threading'
+
+
+class TestScheduler:
+    """Test cases for the shared heap scheduler"""
+
+    def setup_method(self):
+        self.now = 0.0
+        self.scheduler = Scheduler(clock=lambda: self.now)
+        self.calls = []
+
+    def test_runs_due_calls_in_deadline_order(self):
+        """Test only due callbacks run, earliest first"""
+        self.scheduler.call_later(2, self.calls.append, 'b')
+        self.scheduler.call_later(1, self.calls.append, 'a')
+        self.scheduler.call_later(5, self.calls.append, 'c')
+
+        assert self.scheduler.run_pending(now=2) == 2
+        assert self.calls == ['a', 'b']
+
+    def test_cancelled_call_is_skipped(self):
+        """Test cancelling a handle prevents execution"""
+        call = self.scheduler.call_later(1, self.calls.append, 'x')
+        call.cancel()
+
+        assert self.scheduler.run_pending(now=10) == 0
+        assert self.calls == []
+        assert self.scheduler.pending_count() == 0
+
+    def test_call_every_repeats_without_catch_up(self):
+        """Test periodic calls reschedule and skip missed ticks"""
+        self.scheduler.call_every(1, self.calls.append, 'tick')
+
+        self.scheduler.run_pending(now=1)
+        self.scheduler.run_pending(now=5.5)
+        self.scheduler.run_pending(now=6)
+
+        assert self.calls == ['tick', 'tick']
+        assert self.scheduler.run_pending(now=6.5) == 1
+
+    def test_failing_callback_does_not_stop_others(self):
+        """Test an exception in one callback doesn't break the loop"""
+        self.scheduler.call_later(1, lambda: 1 / 0)
+        self.scheduler.call_later(1, self.calls.append, 'ok')
+
+        assert self.scheduler.run_pending(now=1) == 2
+        assert self.calls == ['ok']
+
+    def test_loop_started_once_lazily(self):
+        """Test the background loop starts on first schedule only"""
+        started = []
+        self.scheduler.bind(started.append)
+
+        self.scheduler.call_later(1, self.calls.append, 'a')
+        self.scheduler.call_later(2, self.calls.append, 'b')
+
+        assert len(started) == 1
+
+
+class TestRoomExecutor:
+    """Test cases for the per-room actor executor"""
+
+    def setup_method(self):
+        self.threads = []
+        self.executor = RoomExecutor(workers=4)
+        self.executor.bind(self._spawn)
+
+    def _spawn(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def test_tasks_of_one_room_run_in_order_and_never_overlap(self):
+        seen = {f"R{i}": [] for i in range(20)}
+        running = {room_id: 0 for room_id in seen}
+        overlaps = []
+
+        def task(room_id, n):
+            running[room_id] += 1
+            if running[room_id] > 1:
+                overlaps.append(room_id)
+            seen[room_id].append(n)
+            time.sleep(0)
+            running[room_id] -= 1
+
+        for n in range(200):
+            for room_id in seen:
+                self.executor.submit(room_id, task, room_id, n)
+        assert self.executor.wait_idle(5)
+
+        assert overlaps == []
+        assert all(values == list(range(200)) for values in seen.values())
+        assert self.executor.processed == 20 * 200
+
+    def test_worker_pool_is_bounded(self):
+        for i in range(500):
+            self.executor.submit(f"R{i}", lambda: None)
+        assert self.executor.wait_idle(5)
+        assert len(self.threads) == 4
+
+    def test_call_returns_result_and_raises(self):
+        assert self.executor.call('R1', lambda a, b: a + b, 2, 3) == 5
+        with pytest.raises(ValueError):
+            self.executor.call('R1', int, 'not a number')
+        # Worker vẫn sống sau task lỗi
+        assert self.executor.call('R1', lambda: 'ok') == 'ok'
+
+    def test_call_from_same_room_runs_inline(self):
+        def outer():
+            return self.executor.call('R1', lambda: self.executor.current_room())
+        assert self.executor.call('R1', outer) == 'R1'
+        assert self.executor.current_room() is None
+
+    def test_guard_is_held_around_tasks(self):
+        """Test the guard wraps the tasks of its room, and a failing guard skips them"""
+        held = []
+
+        @contextlib.contextmanager
+        def guard(room_id):
+            if room_id == 'LOCKED':
+                raise TimeoutError(room_id)
+            held.append(room_id)
+            yield
+            held.remove(room_id)
+
+        executor = RoomExecutor(workers=2, guard=guard)
+        executor.bind(self._spawn)
+        assert executor.call('R1', lambda: list(held)) == ['R1']
+        with pytest.raises(TimeoutError):
+            executor.call('LOCKED', lambda: 'ran')
+        assert executor.wait_idle(5)
+        assert held == []
+
+
+class TestWordListService:
+    """Test cases for the cached word list service"""
+
+    def write(self, path, data, mtime=None):
+        path.write_text(json.dumps(data), encoding='utf-8')
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def test_loads_plain_list_once(self, tmp_path):
+        """Test plain list format and caching between calls"""
+        path = tmp_path / 'words.json'
+        self.write(path, ['con mèo', 'con chó'])
+        service = WordListService(str(path), check_interval=0)
+
+        assert service.words() == ('con mèo', 'con chó')
+        assert service.words() == ('con mèo', 'con chó')
+        assert service.version == 1
+
+    def test_reloads_when_mtime_changes(self, tmp_path):
+        """Test file changes are picked up through mtime"""
+        path = tmp_path / 'words.json'
+        self.write(path, ['a'], mtime=1_000_000_000)
+        service = WordListService(str(path), check_interval=0)
+        assert service.words() == ('a',)
+
+        self.write(path, ['b', 'c'], mtime=2_000_000_000)
+        assert service.words() == ('b', 'c')
+        assert service.version == 2
+
+    def test_malformed_file_keeps_previous_words(self, tmp_path):
+        """Test a half-written file keeps the old words and is retried on the next check"""
+        path = tmp_path / 'words.json'
+        self.write(path, ['a', 'b'], mtime=1_000_000_000)
+        service = WordListService(str(path), check_interval=0)
+        assert service.words() == ('a', 'b')
+
+        path.write_text('["c", "d', encoding='utf-8')
+        os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+        assert service.words() == ('a', 'b')
+        assert service.version == 1
+
+        self.write(path, ['c', 'd'], mtime=2_000_000_000)
+        assert service.words() == ('c', 'd')
+        assert service.version == 2
+
+    def test_indexes_categories_length_and_difficulty(self, tmp_path):
+        """Test dict/object formats build category, length and difficulty indexes"""
+        path = tmp_path / 'words.json'
+        self.write(path, [
+            {'word': 'mèo', 'category': 'animal', 'difficulty': 'easy'},
+            {'word': 'ngôi nhà', 'category': 'object', 'difficulty': 'hard'},
+            {'word': 'chó', 'category': 'animal', 'difficulty': 'easy'},
+        ])
+        service = WordListService(str(path), check_interval=0)
+
+        assert sorted(service.categories()) == ['animal', 'object']
+        assert service.words_by_length(3) == ['mèo', 'chó']
+        assert service.words_by_difficulty('hard') == ['ngôi nhà']
+
+    def test_deck_does_not_repeat_until_exhausted(self, tmp_path):
+        """Test per-room deck deals every word once before reshuffling"""
+        path = tmp_path / 'words.json'
+        self.write(path, {'animal': ['a', 'b', 'c'], 'object': ['d']})
+        service = WordListService(str(path), check_interval=0)
+
+        deck = service.deck('ROOM01')
+        first_pass = [deck.draw() for _ in range(4)]
+        assert sorted(first_pass) == ['a', 'b', 'c', 'd']
+        assert deck.draw() in first_pass
+
+        animal_deck = service.deck('ROOM02', category='animal')
+        assert sorted(animal_deck.draw() for _ in range(3)) == ['a', 'b', 'c']
+
+    def test_deck_never_mixes_two_loads(self, tmp_path):
+        """Test reloads that shrink the list while a room draws never pair old indices with new words"""
+        path = tmp_path / 'words.json'
+        big = [f"w{i}" for i in range(50)]
+        self.write(path, big, mtime=1_000_000_000)
+        service = WordListService(str(path), check_interval=0)
+        deck = service.deck('ROOM01')
+        assert deck.draw() in big
+
+        stop = threading.Event()
+        errors = []
+
+        def reload_loop():
+            mtime = 1_000_000_000
+            staging = tmp_path / 'staging.json'
+            while not stop.is_set():
+                mtime += 1_000_000
+                # Thay file một lần (rename) → mỗi lần kiểm tra đều đọc được file đầy đủ
+                self.write(staging, ['x'] if mtime // 1_000_000 % 2 else big, mtime=mtime)
+                os.replace(staging, path)
+
+        def draw_loop():
+            try:
+                for _ in range(3000):
+                    assert deck.draw() in big + ['x']
+            except Exception as ex:
+                errors.append(ex)
+
+        reloader = threading.Thread(target=reload_loop)
+        drawers = [threading.Thread(target=draw_loop) for _ in range(4)]
+        reloader.start()
+        for t in drawers:
+            t.start()
+        for t in drawers:
+            t.join()
+        stop.set()
+        reloader.join()
+        assert errors == []
+        assert service.version > 2
+
+    def test_missing_file_gives_empty_deck(self, tmp_path):
+        """Test a missing file yields no words and a falsy deck"""
+        service = WordListService(str(tmp_path / 'missing.json'), check_interval=0)
+
+        deck = service.deck('ROOM01')
+        assert not deck
+        assert deck.draw() is None
+
+
+class TestStrokeCodec:
+    """Test cases for the binary stroke codec"""
+
+    def test_round_trip(self):
+        """Test encode → decode preserves a full stroke"""
+        events = [
+            {'type': 'color', 'color': '#FF0000'},
+            {'type': 'brush_size', 'size': 10},
+            {'type': 'start', 'x': 100, 'y': 200},
+            {'type': 'move', 'x': 105, 'y': 198},
+            {'type': 'move', 'x': 400, 'y': 500},  # delta quá int8 → absolute
+            {'type': 'end'},
+            {'type': 'color', 'color': '#123456'},
+        ]
+
+        assert decode_events(encode_events(events)) == events
+
+    def test_coordinates_are_quantized_and_clamped(self):
+        """Test floats round to pixels and far-off points are clamped"""
+        data = encode_events([
+            {'type': 'start', 'x': 10.6, 'y': 20.4},
+            {'type': 'move', 'x': 99999, 'y': -99999},
+        ], width=800, height=600)
+
+        assert decode_events(data) == [
+            {'type': 'start', 'x': 11, 'y': 20},
+            {'type': 'move', 'x': 1600, 'y': -600},
+        ]
+
+    def test_delta_moves_are_compact(self):
+        """Test a dense stroke costs ~3 bytes per point vs JSON"""
+        events = [{'type': 'start', 'x': 0, 'y': 0}]
+        events += [{'type': 'move', 'x': i, 'y': i // 2} for i in range(1, 101)]
+        events.append({'type': 'end'})
+
+        binary = encode_events(events)
+        assert len(binary) == 1 + 5 + 100 * 3 + 1
+        assert len(json.dumps(events)) > 5 * len(binary)
+
+    def test_unsupported_event_raises(self):
+        """Test non-encodable events raise StrokeCodecError"""
+        with pytest.raises(StrokeCodecError):
+            encode_events([{'type': 'clear'}])
+        with pytest.raises(StrokeCodecError):
+            encode_events([{'type': 'move', 'x': None, 'y': 1}])
+
+
+class TestGuessMatcher:
+    """Test cases for the normalized guess matcher"""
+
+    def test_normalize_folds_case_diacritics_and_spaces(self):
+        assert normalize('  Con   MÈO ') == 'con meo'
+        assert normalize('Đường') == 'duong'
+        assert normalize('Straße') == 'strasse'
+        assert normalize('Đường', strip_diacritics=False) != 'duong'
+
+    def test_exact_ignores_accents(self):
+        matcher = GuessMatcher('Con Mèo')
+        assert matcher.match('con meo') == GUESS_EXACT
+        assert matcher.match('CON MÈO') == GUESS_EXACT
+        # Tổ hợp dấu kiểu NFD (gõ trên macOS) vẫn khớp
+        assert matcher.match('con me\u0300o') == GUESS_EXACT
+
+    def test_single_typo_is_close(self):
+        matcher = GuessMatcher('elephant')
+        assert matcher.match('elefant') == GUESS_MISS  # 2 edits
+        assert matcher.match('elephnt') == GUESS_CLOSE
+        assert matcher.match('elephatn') == GUESS_MISS  # hoán vị = 2 edits
+        assert matcher.match('elephants') == GUESS_CLOSE
+        assert matcher.match('giraffe') == GUESS_MISS
+
+    def test_short_words_never_close(self):
+        matcher = GuessMatcher('cat')
+        assert matcher.match('car') == GUESS_MISS
+        assert matcher.match('Cat') == GUESS_EXACT
+
+    def test_bounded_distance_exits_early(self):
+        assert bounded_distance('kitten', 'sitting', 3) == 3
+        assert bounded_distance('kitten', 'sitting', 2) == 3
+        assert bounded_distance('a' * 50, 'b' * 50, 1) == 2
+        assert bounded_distance('', 'ab', 1) == 2
+
+
+class TestLogger:
+    """Test cases for the queued JSON event logger"""
+
+    def setup_method(self):
+        self.out = io.StringIO()
+        self.log = event_log.get_logger('test')
+
+    def teardown_method(self):
+        event_log.reset_logging()
+
+    def _lines(self):
+        event_log.shutdown_logging()  # flush thread nền
+        return [json.loads(line) for line in self.out.getvalue().splitlines()]
+
+    def test_json_lines_with_fields(self):
+        """Test each event becomes one JSON object with its fields"""
+        event_log.configure_logging(level='DEBUG', stream=self.out)
+        self.log.info('connect', sid='abc', room='R1')
+
+        [line] = self._lines()
+        assert line['event'] == 'connect'
+        assert line['level'] == 'info'
+        assert line['logger'] == 'test'
+        assert (line['sid'], line['room']) == ('abc', 'R1')
+
+    def test_level_filter(self):
+        """Test events below the configured level are skipped"""
+        event_log.configure_logging(level='INFO', stream=self.out)
+        self.log.debug('guess', guess='x')
+        self.log.warning('slow')
+
+        assert [line['event'] for line in self._lines()] == ['slow']
+
+    def test_sampling(self):
+        """Test per-event sample rates"""
+        rates = event_log.parse_sample_rates('test.guess=0, test.draw=1, bad, x=oops, y.z=nan?')
+        assert rates == {('test', 'guess'): 0.0, ('test', 'draw'): 1.0}
+
+        event_log.configure_logging(level='DEBUG', stream=self.out, sample_rates=rates)
+        for _ in range(50):
+            self.log.debug('guess')
+        self.log.debug('draw')
+
+        assert [line['event'] for line in self._lines()] == ['draw']
+
+    def test_exception_formatted(self):
+        """Test exception() attaches the traceback"""
+        event_log.configure_logging(stream=self.out)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.log.exception('task_failed', task='t')
+
+        [line] = self._lines()
+        assert 'ValueError: boom' in line['exc']
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test a full queue never blocks the caller"""
+        event_log.configure_logging(stream=self.out, queue_size=10)
+        writer = event_log._writer
+        writer._stop.set()          # giữ writer không drain trong lúc đẩy
+        writer._thread.join()
+
+        for n in range(100):
+            self.log.warning('flood', n=n)
+
+        assert event_log.dropped_count() == 90
+        writer.drain()
+        assert len(self.out.getvalue().splitlines()) == 10
+
+
+class TestMetrics:
+    """Test cases for the sharded Prometheus metrics registry"""
+
+    def setup_method(self):
+        self.registry = MetricsRegistry(buckets=(0.001, 0.01))
+
+    def test_render_counter_histogram_gauge(self):
+        """Test the Prometheus text output"""
+        labels = (('event', 'join_room'),)
+        self.registry.describe('events_total', 'counter', 'Events')
+        self.registry.inc('events_total', labels)
+        self.registry.inc('events_total', labels, 2)
+        self.registry.observe('latency_seconds', 0.005)
+        self.registry.observe('latency_seconds', 0.5)
+        self.registry.gauge('rooms', lambda: 3, 'Rooms')
+
+        lines = self.registry.render().splitlines()
+
+        assert '# HELP events_total Events' in lines
+        assert 'events_total{event="join_room"} 3' in lines
+        assert 'latency_seconds_bucket{le="0.001"} 0' in lines
+        assert 'latency_seconds_bucket{le="0.01"} 1' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+        assert 'latency_seconds_count 2' in lines
+        assert 'rooms 3' in lines
+
+    def test_shards_of_finished_threads_are_kept(self):
+        """Test counts from threads that exited are folded, not lost"""
+        def work():
+            for _ in range(1000):
+                self.registry.inc('hits')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert self.registry.snapshot()[0][('hits', ())] == 4000
+        self.registry.inc('hits')
+        assert self.registry.snapshot()[0][('hits', ())] == 4001
+        # Chỉ còn shard của thread đang sống
+        assert len(self.registry._shards) == 1
+
+    def test_shards_bounded_without_scrape(self):
+        """Test short-lived threads (1 thread / event) don't grow the shard list when nobody scrapes"""
+        from utils.metrics import SHARD_PRUNE_MIN
+
+        for _ in range(2000):
+            t = threading.Thread(target=self.registry.inc, args=('hits',))
+            t.start()
+            t.join()
+            assert len(self.registry._shards) <= SHARD_PRUNE_MIN
+
+        assert self.registry.snapshot()[0][('hits', ())] == 2000
+
+    def test_instrument_handler(self):
+        """Test handler calls, errors and extra args (Flask-SocketIO connect(auth))"""
+        def connect():
+            return 'ok'
+
+        def boom(data):
+            raise ValueError(data)
+
+        assert self.registry.instrument_handler('connect', connect)({'token': 'x'}) == 'ok'
+        with pytest.raises(ValueError):
+            self.registry.instrument_handler('boom', boom)('bad')
+
+        counters, histograms = self.registry.snapshot()
+        assert counters[(EVENTS_TOTAL, (('event', 'connect'),))] == 1
+        assert counters[(EVENTS_TOTAL, (('event', 'boom'),))] == 1
+        assert counters[(HANDLER_ERRORS_TOTAL, (('event', 'boom'),))] == 1
+        assert (HANDLER_ERRORS_TOTAL, (('event', 'connect'),)) not in counters
+
+    def test_instrument_handler_cpu_time(self):
+        """Test CPU time is counted for busy handlers, not for sleeping ones"""
+        def busy():
+            deadline = time.thread_time() + 0.02
+            while time.thread_time() < deadline:
+                pass
+
+        self.registry.instrument_handler('busy', busy)()
+        self.registry.instrument_handler('idle', lambda: time.sleep(0.05))()
+
+        counters, histograms = self.registry.snapshot()
+        assert counters[(HANDLER_CPU_SECONDS_TOTAL, (('event', 'busy'),))] >= 0.02
+        assert counters[(HANDLER_CPU_SECONDS_TOTAL, (('event', 'idle'),))] < 0.02
+        # Wall time của handler ngủ vẫn được ghi (sum của histogram)
+        assert histograms[('drawguess_socketio_handler_seconds', (('event', 'idle'),))][-1] >= 0.05
+
+    def test_emit_counting(self):
+        """Test packets and bytes per event, binary attachments included"""
+        cache = {}
+        self.registry._record_emit('2["timer_update",{"seconds":5}]', cache)
+        self.registry._record_emit('51-["canvas_update",{"_placeholder":true,"num":0}]', cache)
+        self.registry._record_emit(b'\x00' * 100, cache)
+        self.registry._record_emit('0{"sid":"abc"}', cache)
+
+        counters, _ = self.registry.snapshot()
+        canvas = (('event', 'canvas_update'),)
+        assert counters[(EMITS_TOTAL, (('event', 'timer_update'),))] == 1
+        assert counters[(EMITS_TOTAL, canvas)] == 1
+        assert counters[(EMIT_BYTES_TOTAL, canvas)] == len('51-["canvas_update",{"_placeholder":true,"num":0}]') + 100
+        assert counters[(EMITS_TOTAL, (('event', '_control'),))] == 1
+
+
+def _spin_in_profiled_function(stop):
+    while not stop.is_set():
+        sum(range(200))
+
+
+def _wait_until_blocked(thread, timeout=5):
+    """Poll until the thread sits in Event.wait() and its CPU clock stops moving."""
+    deadline = time.monotonic() + timeout
+    previous = ()
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread.ident)
+        if frame is not None and frame.f_code.co_name == 'wait':
+            cpu = _thread_cpu_time(thread.ident)
+            if cpu == previous:
+                return
+            previous = cpu
+        time.sleep(0.001)
+    raise AssertionError(f"{thread.name} did not block within {timeout}s")
+
+
+class TestSamplingProfiler:
+    """Test cases for the on-demand sampling profiler"""
+
+    def test_sample_cpu_mode_skips_idle_threads(self):
+        """Test only threads that used CPU since the last sample are kept"""
+        stop = threading.Event()
+        busy = threading.Thread(target=_spin_in_profiled_function, args=(stop,), name='busy worker')
+        idle = threading.Thread(target=stop.wait, name='idle-worker')
+        busy.start()
+        idle.start()
+        _wait_until_blocked(idle)
+        profiler = SamplingProfiler()
+        stacks, cpu_seen = {}, {}
+        try:
+            for _ in range(20):
+                profiler.sample(stacks, threading.get_ident(), cpu_seen)
+                time.sleep(0.005)
+        finally:
+            stop.set()
+            busy.join()
+            idle.join()
+
+        assert any(stack.startswith('busy_worker;') and '_spin_in_profiled_function' in stack
+                   for stack in stacks)
+        assert not any(stack.startswith('idle-worker;') for stack in stacks)
+        assert all(';' in stack and ' ' not in stack.split(';')[0] for stack in stacks)
+
+    def test_capture_writes_folded_file(self, tmp_path):
+        """Test a background capture writes 'frame;frame count' lines"""
+        stop = threading.Event()
+        idle = threading.Thread(target=stop.wait, name='idle-worker')
+        idle.start()
+        profiler = SamplingProfiler(interval=0.005)
+        path = str(tmp_path / 'out' / 'profile.folded')
+        try:
+            assert profiler.start(0.1, path, MODE_WALL)['path'] == path
+            # Đang chạy thì không nhận capture thứ 2
+            assert profiler.start(1, path) is None
+            assert profiler.wait(timeout=5)
+        finally:
+            stop.set()
+            idle.join()
+
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert any(line.startswith('idle-worker;') for line in lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) >= 1 and ' (' in stack
+        assert profiler.last_result['samples'] >= 1
+        assert not profiler.running()
+
+    def test_invalid_mode(self, tmp_path):
+        """Test unknown modes are rejected before any thread starts"""
+        with pytest.raises(ValueError):
+            SamplingProfiler().start(1, str(tmp_path / 'p.folded'), 'gpu')
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter:
+    """Test cases for the per-connection / per-room token buckets"""
+
+    def setup_method(self):
+        self.clock = _FakeClock()
+        self.limiter = RateLimiter({'chat': (2, 3), 'draw': (10, 5), 'room.draw': (10, 8)}, clock=self.clock)
+
+    def test_connection_bucket_burst_and_refill(self):
+        """Test a burst is allowed, then tokens come back at the configured rate"""
+        assert [self.limiter.acquire('a', 'send_message') for _ in range(4)] == [True, True, True, False]
+        assert self.limiter.retry_after('a', 'send_message') == pytest.approx(0.5)
+        # Connection khác có bucket riêng
+        assert self.limiter.acquire('b', 'send_message')
+
+        self.clock.now += 0.5
+        assert self.limiter.acquire('a', 'send_message')
+        assert not self.limiter.acquire('a', 'send_message')
+        # Event không có giới hạn luôn qua
+        assert self.limiter.acquire('a', 'clear_canvas')
+
+    def test_room_bucket_is_shared(self):
+        """Test the room bucket caps the sum of its connections without eating their tokens"""
+        self.limiter.set_room('a', 'R1')
+        self.limiter.set_room('b', 'R1')
+        allowed = [self.limiter.acquire(sid, 'drawing_move') for sid in 'abababab']
+        assert allowed == [True] * 8
+        assert not self.limiter.acquire('a', 'drawing_move')
+
+        # Rời phòng → chỉ còn bucket riêng (a đã dùng 4/5 token, được hoàn 1 lần bị chặn)
+        self.limiter.set_room('a', None)
+        assert self.limiter.acquire('a', 'drawing_move')
+        assert not self.limiter.acquire('a', 'drawing_move')
+
+    def test_merge_keeps_latest_payload(self):
+        """Test merged events keep only the newest payload per event, oldest event first"""
+        assert self.limiter.defer('a', 'drawing_move', {'x': 1})
+        assert not self.limiter.defer('a', 'change_color', {'color': '#f00'})
+        assert not self.limiter.defer('a', 'drawing_move', {'x': 2})
+
+        assert self.limiter.pending_event('a') == 'change_color'
+        assert self.limiter.release('a') == ('change_color', {'color': '#f00'})
+        assert self.limiter.release('a') == ('drawing_move', {'x': 2})
+        assert self.limiter.release('a') is None
+        assert not self.limiter.has_pending('a')
+
+    def test_stroke_boundaries_are_queued_in_order(self):
+        """Test start/end are never merged and moves don't merge across a stroke boundary"""
+        self.limiter.defer('a', 'drawing_move', {'x': 1})
+        self.limiter.defer('a', 'drawing_end', {'n': 1})
+        self.limiter.defer('a', 'drawing_start', {'n': 2})
+        self.limiter.defer('a', 'drawing_move', {'x': 2})
+        self.limiter.defer('a', 'drawing_move', {'x': 3})
+        self.limiter.defer('a', 'drawing_end', {'n': 2})
+        self.limiter.defer('a', 'drawing_start', {'n': 3})
+
+        released = []
+        while self.limiter.has_pending('a'):
+            event = self.limiter.release('a')
+            if event is None:
+                self.clock.now += 0.1
+            else:
+                released.append(event)
+        assert released == [
+            ('drawing_move', {'x': 1}), ('drawing_end', {'n': 1}),
+            ('drawing_start', {'n': 2}), ('drawing_move', {'x': 3}), ('drawing_end', {'n': 2}),
+            ('drawing_start', {'n': 3}),
+        ]
+
+    def test_queued_burst_is_released_at_the_configured_rate(self):
+        """Test queued start/end are capped per connection and released one per token"""
+        for i in range(1000):
+            self.limiter.defer('a', 'drawing_start' if i % 2 == 0 else 'drawing_end', {'n': i})
+        # Tối đa PENDING_PER_EVENT mỗi event, phần còn lại bị bỏ (đếm vào metric)
+        assert self.limiter.pending_event('a') == 'drawing_start'
+        queued = 0
+        while self.limiter.release('a'):
+            queued += 1
+        assert queued == 5   # burst
+        assert self.limiter.release('a') is None
+
+        # Sau đó đúng rate: 10 token/s → 1 event mỗi 0.1s
+        for _ in range(2 * PENDING_PER_EVENT - 5):
+            assert self.limiter.retry_after('a', 'drawing_start') == pytest.approx(0.1, abs=0.01)
+            self.clock.now += 0.101
+            assert self.limiter.release('a') is not None
+            assert self.limiter.release('a') is None
+        assert not self.limiter.has_pending('a')
+
+        labels = (('event', 'drawing_end'), ('scope', 'connection'), ('action', 'dropped'))
+        counters, _ = metrics_registry.snapshot()
+        assert counters[(RATE_LIMITED_TOTAL, labels)] >= 500 - PENDING_PER_EVENT
+
+    def test_release_after_forget_keeps_no_state(self):
+        """Test a flush that fires after disconnect does not recreate the connection"""
+        assert self.limiter.defer('a', 'drawing_start', {'n': 1})
+        self.limiter.forget('a')
+
+        assert self.limiter.lock('a', create=False) is None
+        assert self.limiter.release('a') is None
+        assert self.limiter.pending_event('a') is None
+        assert 'a' not in self.limiter._connections
+
+    def test_concurrent_acquire_takes_each_token_once(self):
+        """Test handler threads of one connection never share a token"""
+        results = []
+        barrier = threading.Barrier(20)
+
+        def worker():
+            barrier.wait()
+            for _ in range(10):
+                results.append(self.limiter.acquire('a', 'drawing_move'))
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # Đồng hồ đứng yên → đúng burst (5) event được qua
+        assert results.count(True) == 5
+
+    def test_notify_once_per_streak_and_counters(self):
+        """Test the client is told once per throttled streak and drops are counted"""
+        for _ in range(5):
+            self.limiter.acquire('a', 'send_message')
+        assert self.limiter.should_notify('a', 'send_message')
+        assert not self.limiter.should_notify('a', 'send_message')
+        self.clock.now += 1
+        self.limiter.acquire('a', 'send_message')
+        assert self.limiter.should_notify('a', 'send_message')
+
+        labels = (('event', 'send_message'), ('scope', 'connection'), ('action', 'dropped'))
+        counters, _ = metrics_registry.snapshot()
+        assert counters[(RATE_LIMITED_TOTAL, labels)] >= 2
+
+    def test_parse_limits(self):
+        """Test env overrides on top of the defaults"""
+        limits = parse_limits('chat=5/10, room.draw=0,bad,style=x/1', {'chat': (3, 8), 'style': (10, 10)})
+        assert limits == {'chat': (5.0, 10.0), 'room.draw': (0.0, 1.0), 'style': (10, 10)}
+
+        # rate 0 = tắt bucket
+        limiter = RateLimiter(limits, clock=self.clock)
+        limiter.set_room('a', 'R1')
+        assert all(limiter.acquire('a', 'drawing_move') for _ in range(100))
+
+
+class TestRoomIdAllocator:
+    """Test cases for the counter-permuting room ID allocator"""
+
+    def test_permutation_is_a_bijection(self):
+        """Test every counter value maps to a distinct ID of the space"""
+        for length, shard in ((3, None), (4, None), (4, 'B')):
+            allocator = RoomIdAllocator(key='k', length=length, shard=shard, alphabet='AB012')
+            ids = [allocator.allocate() for _ in range(allocator.space)]
+            assert len(set(ids)) == allocator.space == 5 ** (length - (1 if shard else 0))
+            assert all(len(room_id) == length for room_id in ids)
+            if shard:
+                assert all(room_id[0] == 'B' for room_id in ids)
+
+    def test_default_ids_are_valid_and_keyed(self):
+        """Test IDs use the full [A-Z0-9]{6} space and depend on the key"""
+        allocator = RoomIdAllocator(key='secret')
+        sample = [allocator.allocate() for _ in range(2000)]
+
+        assert RoomIdAllocator(key='secret').allocate() == sample[0]
+        assert RoomIdAllocator(key='other').allocate() != sample[0]
+        assert all(validate_room_id(room_id) for room_id in sample)
+        assert len(set(sample)) == 2000
+        assert any(c.isdigit() for c in ''.join(sample)) and any(c in 'XYZ' for c in ''.join(sample))
+
+    def test_skips_ids_in_use_after_wrap(self):
+        """Test in_use lets a wrapped counter skip live IDs"""
+        allocator = RoomIdAllocator(alphabet='AB', length=2)
+        live = {allocator.allocate() for _ in range(3)}
+
+        free = allocator.allocate(in_use=live.__contains__)
+        assert free not in live
+        live.add(free)
+        with pytest.raises(RuntimeError):
+            allocator.allocate(in_use=live.__contains__)
+
+    def test_invalid_config(self):
+        """Test bad shard / odd rounds are rejected"""
+        with pytest.raises(ValueError):
+            RoomIdAllocator(shard='ab')
+        with pytest.raises(ValueError):
+            RoomIdAllocator(shard='a')
+        with pytest.raises(ValueError):
+            RoomIdAllocator(rounds=3)
+
+
+class TestResumeTokens:
+    """Test cases for signed resume tokens"""
+
+    def test_round_trip(self):
+        """Test an issued token verifies back to its sid and room"""
+        tokens = ResumeTokens('secret')
+        token = tokens.issue('sid-1', 'ROOM01')
+
+        assert tokens.verify(token) == ('sid-1', 'ROOM01')
+        assert ResumeTokens(b'secret').verify(token) == ('sid-1', 'ROOM01')
+
+    def test_rejects_forged_and_malformed(self):
+        """Test tampered, foreign-key and malformed tokens are rejected"""
+        tokens = ResumeTokens('secret')
+        token = tokens.issue('sid-1', 'ROOM01')
+        sid, room_id, signature = token.split('.')
+
+        assert tokens.verify(f"sid-2.{room_id}.{signature}") is None
+        assert tokens.verify(f"{sid}.ROOM02.{signature}") is None
+        assert ResumeTokens('other').verify(token) is None
+        for bad in (None, 42, '', 'abc', '..', f"{sid}.{room_id}."):
+            assert tokens.verify(bad) is None
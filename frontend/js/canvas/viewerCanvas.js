@@ -7,6 +7,21 @@
  *  - Canvas clear & snapshot support
  *  - Basic performance metrics for debugging
  */
+// Palette phải trùng thứ tự với COLORS trong backend/src/config/constants.py
+const STROKE_PALETTE = [
+  "#000000",
+  "#FF0000",
+  "#00FF00",
+  "#0000FF",
+  "#FFFF00",
+  "#FF00FF",
+  "#00FFFF",
+  "#FFA500",
+  "#800080",
+  "#FFC0CB",
+];
+const STROKE_FORMAT_VERSION = 1;
+
 class ViewerCanvas {
   /**
    * Initialize ViewerCanvas
@@ -357,12 +372,81 @@ class ViewerCanvas {
 
   _normalizeEvents(data) {
     if (!data) return [];
+    if (data instanceof ArrayBuffer || ArrayBuffer.isView(data)) {
+      return this._decodeBinaryEvents(data);
+    }
     if (Array.isArray(data)) return data.filter(Boolean);
     if (Array.isArray(data?.events)) return data.events.filter(Boolean);
     if (typeof data === "object" && data.type) return [data];
     return [];
   }
 
+  /**
+   * Decode binary stroke batch (xem backend/src/utils/stroke_codec.py)
+   * @param {ArrayBuffer|ArrayBufferView} buffer
+   * @returns {Array} canvas events
+   */
+  _decodeBinaryEvents(buffer) {
+    const view = ArrayBuffer.isView(buffer)
+      ? new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength)
+      : new DataView(buffer);
+    const events = [];
+    if (!view.byteLength || view.getUint8(0) !== STROKE_FORMAT_VERSION) {
+      console.warn("Unknown binary stroke format");
+      return events;
+    }
+
+    let pos = 1;
+    let lastX = 0;
+    let lastY = 0;
+    try {
+      while (pos < view.byteLength) {
+        const op = view.getUint8(pos);
+        switch (op) {
+          case 0x01: // start
+          case 0x03: // move (absolute)
+            lastX = view.getInt16(pos + 1);
+            lastY = view.getInt16(pos + 3);
+            events.push({ type: op === 0x01 ? "start" : "move", x: lastX, y: lastY });
+            pos += 5;
+            break;
+          case 0x02: // move (delta)
+            lastX += view.getInt8(pos + 1);
+            lastY += view.getInt8(pos + 2);
+            events.push({ type: "move", x: lastX, y: lastY });
+            pos += 3;
+            break;
+          case 0x04:
+            events.push({ type: "end" });
+            pos += 1;
+            break;
+          case 0x05:
+            events.push({ type: "color", color: STROKE_PALETTE[view.getUint8(pos + 1)] });
+            pos += 2;
+            break;
+          case 0x06: {
+            const hex = [1, 2, 3]
+              .map((i) => view.getUint8(pos + i).toString(16).padStart(2, "0"))
+              .join("");
+            events.push({ type: "color", color: `#${hex.toUpperCase()}` });
+            pos += 4;
+            break;
+          }
+          case 0x07:
+            events.push({ type: "brush_size", size: view.getUint8(pos + 1) });
+            pos += 2;
+            break;
+          default:
+            console.warn("Unknown binary stroke opcode:", op);
+            return events;
+        }
+      }
+    } catch (error) {
+      console.error("Error decoding binary strokes:", error);
+    }
+    return events;
+  }
+
   _scheduleQueueFlush() {
     if (this.frameRequest) return;
 
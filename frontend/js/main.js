@@ -15,6 +15,52 @@ const notifications = new Notifications();
 
 window.currentRoomId = null;
 window.isRoomHost = false;
+// Token từ 'room_joined' / 'resumed': socket mới gửi 'resume' để giữ chỗ trong phòng
+window.resumeToken = null;
+
+// ================== SCOREBOARD VERSION ==================
+// Server gửi bảng điểm theo delta kèm version tăng dần mỗi phòng.
+// null = chưa có snapshot (chưa vào phòng) → bỏ qua delta cho tới khi có.
+let scoreboardVersion = null;
+let scoreboardResyncPending = false;
+
+function resetScoreboard(players, version) {
+  scoreboardVersion = typeof version === "number" ? version : null;
+  scoreboardResyncPending = false;
+  if (window.scoreboard && Array.isArray(players)) {
+    window.scoreboard.update(players);
+  }
+}
+
+/**
+ * Áp dụng delta {version, changes}; trả về true nếu đã áp dụng.
+ * Version cũ/trùng → bỏ qua; nhảy cóc (mất event) → xin lại snapshot.
+ */
+function applyScoreboardUpdate(update) {
+  if (!update || typeof update.version !== "number") return false;
+  if (scoreboardVersion === null || update.version <= scoreboardVersion) {
+    return false;
+  }
+  if (update.version !== scoreboardVersion + 1) {
+    if (!scoreboardResyncPending) {
+      scoreboardResyncPending = true;
+      socketClient.emit("scoreboard_resync", {
+        room_id: window.currentRoomId,
+        version: scoreboardVersion,
+      });
+    }
+    return false;
+  }
+  scoreboardVersion = update.version;
+  if (window.scoreboard) window.scoreboard.applyChanges(update.changes);
+  return true;
+}
+
+function refreshPlayersList() {
+  if (window.gameUI && window.scoreboard) {
+    window.gameUI.updatePlayersList(window.scoreboard.sortedPlayers);
+  }
+}
 
 // Nếu muốn vẫn nhớ tên player, dùng đoạn này:
 const savedName = localStorage.getItem("playerName");
@@ -47,12 +93,48 @@ if (canvas) {
       window.viewerCanvas.handleCanvasUpdate(data);
     }
   });
+
+  // Nét vẽ đã có của round (khi vào giữa round / resume), cùng định dạng binary
+  socketClient.on("canvas_replay", (data) => {
+    console.log("Canvas replay");
+    if (window.viewerCanvas) {
+      window.viewerCanvas.handleCanvasUpdate(data);
+    }
+  });
 }
 
 // Socket event handlers
 socketClient.on("connected", () => {
   console.log("Connected to game server");
   notifications.info("Đã kết nối với server");
+
+  // Kết nối lại sau khi rớt mạng → xin lại chỗ cũ trong phòng
+  if (window.resumeToken && window.currentRoomId) {
+    socketClient.emit("resume", { token: window.resumeToken });
+  }
+});
+
+socketClient.on("resumed", (data) => {
+  console.log("Session resumed:", data.room_id);
+  window.currentRoomId = data.room_id;
+  window.isRoomHost = !!data.is_host;
+  window.resumeToken = data.resume_token || null;
+
+  resetScoreboard(data.players, data.scoreboard_version);
+  if (window.scoreboard) window.scoreboard.setDrawer(data.round?.drawer_id || null);
+  refreshPlayersList();
+
+  // Nét vẽ hiện tại được gửi lại ngay sau event này
+  if (window.viewerCanvas) window.viewerCanvas.clearCanvas(true);
+  if (window.gameUI) window.gameUI.handleResumed(data.round);
+  notifications.success("Đã kết nối lại phòng");
+});
+
+socketClient.on("resume_failed", () => {
+  window.resumeToken = null;
+  if (!window.currentRoomId) return;
+  notifications.error("Không thể quay lại phòng cũ");
+  goToLobby();
 });
 
 socketClient.on("room_created", (data) => {
@@ -110,8 +192,9 @@ socketClient.on("room_joined", (data) => {
     if (typeof window.scoreboard.clear === "function") {
       window.scoreboard.clear(); // 🔥 xoá state cũ trước
     }
-    window.scoreboard.update(data.players);
+    resetScoreboard(data.players, data.scoreboard_version);
   }
+  window.resumeToken = data.resume_token || null;
   if (data?.room_id) {
     socketClient.emit("request_chat_history", { room_id: data.room_id });
     if (window.chat)
@@ -152,8 +235,9 @@ socketClient.on("round_started", (data) => {
     window.scoreboard.setDrawer(data.drawer_id);
   }
 
-  notifications.info("Vòng mới bắt đầu!");
-  if (window.chat) window.chat.displaySystemMessage("Vòng mới bắt đầu!");
+  const progress = data.round ? ` ${data.round}/${data.total_rounds}` : " mới";
+  notifications.info(`Vòng${progress} bắt đầu!`);
+  if (window.chat) window.chat.displaySystemMessage(`Vòng${progress} bắt đầu!`);
 });
 
 socketClient.on("round_ended", (data) => {
@@ -167,16 +251,16 @@ socketClient.on("round_ended", (data) => {
   if (window.scoreboard && data && Array.isArray(data.scores)) {
     window.scoreboard.applyRoundResults(data.scores);
   }
-  const startGameBtn = document.getElementById("start-game-btn");
-  if (startGameBtn && window.isRoomHost) {
-    startGameBtn.disabled = false;
-    startGameBtn.classList.remove("btn-disabled"); // nếu có CSS
-  }
+  // Server tự bắt đầu round kế tiếp (nút bắt đầu chỉ bật lại khi game_ended)
   // Thông báo + system line (hiển thị từ khoá nếu có)
   const revealed = data?.word ? ` Từ khóa: ${data.word}` : "";
+  const next =
+    typeof data?.next_round_in === "number"
+      ? ` Vòng tiếp theo sau ${data.next_round_in} giây.`
+      : "";
   notifications.info(`Vòng kết thúc.${revealed}`);
   if (window.chat)
-    window.chat.displaySystemMessage(`Vòng kết thúc.${revealed}`);
+    window.chat.displaySystemMessage(`Vòng kết thúc.${revealed}${next}`);
 });
 
 socketClient.on("game_ended", (data) => {
@@ -202,15 +286,20 @@ socketClient.on("game_ended", (data) => {
     startGameBtn.classList.remove("btn-disabled");
   }
 
-  // Thông báo + system line
-  notifications.info("Trận đấu đã kết thúc!");
-  if (window.chat) window.chat.displaySystemMessage("Trận đấu đã kết thúc!");
+  // Thông báo + system line (kèm người thắng)
+  const winners = (data?.results || [])
+    .filter((row) => row.rank === 1)
+    .map((row) => row.name);
+  const summary = winners.length ? ` Người thắng: ${winners.join(", ")}` : "";
+  notifications.info(`Trận đấu đã kết thúc!${summary}`);
+  if (window.chat)
+    window.chat.displaySystemMessage(`Trận đấu đã kết thúc!${summary}`);
 });
 
 socketClient.on("game_started", (data) => {
   console.log("Game started");
-  if (window.scoreboard && data && Array.isArray(data.players)) {
-    window.scoreboard.update(data.players);
+  if (data && Array.isArray(data.players)) {
+    resetScoreboard(data.players, data.scoreboard_version);
   }
 
   // Thông báo + system line
@@ -220,9 +309,7 @@ socketClient.on("game_started", (data) => {
 
 // Scoreboard related events
 socketClient.on("player_joined", (data) => {
-  if (data && data.player && window.scoreboard) {
-    window.scoreboard.addPlayer(data.player);
-  }
+  if (applyScoreboardUpdate(data?.scoreboard)) refreshPlayersList();
   // Toast + system line
   const name = data?.player?.name || "Người chơi";
   notifications.info(`${name} đã tham gia phòng`);
@@ -231,15 +318,26 @@ socketClient.on("player_joined", (data) => {
 });
 
 socketClient.on("player_left", (data) => {
-  if (data && data.player_id && window.scoreboard) {
-    window.scoreboard.removePlayer(data.player_id);
-  }
+  if (applyScoreboardUpdate(data?.scoreboard)) refreshPlayersList();
   // Toast + system line
   const name = data?.player_name || "Người chơi";
   notifications.info(`${name} đã rời phòng`);
   if (window.chat) window.chat.displaySystemMessage(`${name} đã rời phòng`);
 });
 
+socketClient.on("player_disconnected", (data) => {
+  if (applyScoreboardUpdate(data?.scoreboard)) refreshPlayersList();
+  const name = data?.player_name || "Người chơi";
+  if (window.chat)
+    window.chat.displaySystemMessage(`${name} mất kết nối, đang chờ kết nối lại...`);
+});
+
+socketClient.on("player_resumed", (data) => {
+  if (applyScoreboardUpdate(data?.scoreboard)) refreshPlayersList();
+  const name = data?.player_name || "Người chơi";
+  if (window.chat) window.chat.displaySystemMessage(`${name} đã kết nối lại`);
+});
+
 socketClient.on("kicked", (data) => {
   const name = data?.player_name || "Người chơi";
 
@@ -247,6 +345,7 @@ socketClient.on("kicked", (data) => {
   if (window.drawerCanvas) window.drawerCanvas.disable();
   if (window.viewerCanvas) window.viewerCanvas.reset();
   if (window.scoreboard) window.scoreboard.setDrawer(null);
+  resetScoreboard(null, null);
   notifications.info(`${name} đã bị kick khỏi phòng`);
   if (window.chat) {
     window.chat.displaySystemMessage(`${name} đã bị kick khỏi phòng`);
@@ -266,9 +365,15 @@ socketClient.on("kicked", (data) => {
 });
 
 socketClient.on("scores_updated", (data) => {
-  if (data && data.players && window.scoreboard) {
-    window.scoreboard.update(data.players, { animate: true });
-  }
+  // Chỉ các dòng đổi điểm: {room_id, version, changes: [{id, delta, score, flags}]}
+  applyScoreboardUpdate(data);
+});
+
+// Trả lời cho scoreboard_resync: toàn bộ bảng điểm ở version hiện tại
+socketClient.on("scoreboard_snapshot", (data) => {
+  if (!data || data.room_id !== window.currentRoomId) return;
+  resetScoreboard(data.players, data.version);
+  refreshPlayersList();
 });
 
 socketClient.on("player_score_updated", (data) => {
@@ -310,6 +415,20 @@ socketClient.on("correct_guess", (data) => {
     window.chat.displaySystemMessage(`🎉 ${name} đã đoán đúng: ${word}`);
 });
 
+socketClient.on("close_guess", (data) => {
+  // Chỉ người đoán nhận được: sai 1 ký tự so với từ khóa
+  const guess = data?.message || "";
+  notifications.info(`🔥 "${guess}" gần đúng rồi!`);
+  if (window.chat) window.chat.displaySystemMessage(`🔥 "${guess}" gần đúng rồi!`);
+});
+
+socketClient.on("rate_limited", (data) => {
+  // Server bỏ bớt event vì gửi quá nhanh (chỉ báo 1 lần mỗi đợt bị chặn)
+  if (data?.event === "send_message") {
+    notifications.info("Bạn đang gửi tin nhắn quá nhanh, chờ một chút nhé!");
+  }
+});
+
 socketClient.on("disconnect", () => {
   console.warn("Disconnected from server");
   notifications.error("Mất kết nối với server");
@@ -370,6 +489,8 @@ function goToLobby() {
   // Reset biến global
   window.currentRoomId = null;
   window.isRoomHost = false;
+  window.resumeToken = null;
+  resetScoreboard(null, null);
   if (window.roomUI) {
     window.roomUI.currentRoomId = null; // NEW: reset luôn state trong RoomUI
   }
@@ -452,7 +573,9 @@ socketClient.on("room_closed", (data) => {
   const reason =
     data?.reason === "host_left"
       ? "Chủ phòng đã rời, phòng đã đóng."
-      : "Phòng đã đóng.";
+      : data?.reason === "idle"
+        ? "Phòng đã đóng do lâu không hoạt động."
+        : "Phòng đã đóng.";
   notifications.info(reason);
   if (window.chat) window.chat.displaySystemMessage(reason);
 
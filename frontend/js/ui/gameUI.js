@@ -34,28 +34,8 @@ class GameUI {
       this.updateTimer(data.seconds);
     });
 
-    this.socket.on("player_joined", (data) => {
-      // Update players list when possible
-      if (Array.isArray(data?.players)) {
-        this.updatePlayersList(data.players);
-      } else if (
-        window.scoreboard &&
-        Array.isArray(window.scoreboard.sortedPlayers)
-      ) {
-        this.updatePlayersList(window.scoreboard.sortedPlayers);
-      }
-    });
-
-    this.socket.on("player_left", (data) => {
-      if (Array.isArray(data?.players)) {
-        this.updatePlayersList(data.players);
-      } else if (
-        window.scoreboard &&
-        Array.isArray(window.scoreboard.sortedPlayers)
-      ) {
-        this.updatePlayersList(window.scoreboard.sortedPlayers);
-      }
-    });
+    // player_joined / player_left: danh sách người chơi được vẽ lại trong
+    // main.js sau khi áp dụng delta bảng điểm (xem applyScoreboardUpdate)
   }
 
   handleGameStarted(data) {
@@ -99,7 +79,24 @@ class GameUI {
     if (window.drawerCanvas) {
       window.drawerCanvas.clearCanvas(); // xóa local + emit clear_canvas cho phòng
     }
+    this._applyRound(data);
+  }
+
+  /**
+   * Resume sau khi mất kết nối: khôi phục round đang chạy (không xoá canvas,
+   * server gửi lại nét vẽ ngay sau 'resumed')
+   * @param {Object|null} round - {drawer_id, drawer_name, is_drawer, seconds, word?}
+   */
+  handleResumed(round) {
+    if (!round) {
+      this.resetState();
+      if (window.drawerCanvas) window.drawerCanvas.disable();
+      return;
+    }
+    this._applyRound(round);
+  }
 
+  _applyRound(data) {
     this.isDrawer = data.is_drawer || false;
     this.currentWord = data.word || "";
 
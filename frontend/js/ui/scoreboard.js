@@ -47,6 +47,7 @@ class Scoreboard {
         name: p.name || existing.name || "Unknown",
         score: newScore,
         is_drawer: !!p.is_drawer,
+        connected: p.connected !== false,
         lastDelta: animate ? delta : 0,
       };
 
@@ -127,6 +128,50 @@ class Scoreboard {
     this._scheduleDeltaClear(playerId);
   }
 
+  /**
+   * Apply scoreboard delta rows [{id, delta, score, flags, name?, previous_id?}]
+   * (flags: "joined" | "left" | "guessed" | "disconnected" | "resumed");
+   * score là điểm tuyệt đối sau thay đổi
+   * @param {Array} changes
+   */
+  applyChanges(changes) {
+    if (!Array.isArray(changes) || changes.length === 0) return;
+    const highlightIds = [];
+
+    changes.forEach((row) => {
+      if (!row || !row.id) return;
+      const flags = Array.isArray(row.flags) ? row.flags : [];
+
+      if (flags.includes("left")) {
+        delete this.players[row.id];
+        this._clearDeltaTimeout(row.id);
+        return;
+      }
+
+      // Resume: player giữ nguyên dòng cũ (điểm, người vẽ) dưới id mới
+      const existing =
+        this.players[row.id] ||
+        (row.previous_id && this.players[row.previous_id]) ||
+        {};
+      const delta = Number.isFinite(row.delta) ? row.delta : 0;
+      this.players[row.id] = {
+        id: row.id,
+        name: row.name || existing.name || "Unknown",
+        score: Number.isFinite(row.score) ? row.score : existing.score || 0,
+        is_drawer: !!existing.is_drawer,
+        connected: !flags.includes("disconnected"),
+        lastDelta: delta,
+      };
+      if (delta !== 0) highlightIds.push(row.id);
+    });
+
+    this._resortAndRender(
+      highlightIds.length > 0,
+      highlightIds.length ? highlightIds : null
+    );
+    highlightIds.forEach((playerId) => this._scheduleDeltaClear(playerId));
+  }
+
   /**
    * Apply round results payload [{player_id, player_name, score, points_earned}]
    * @param {Array} scores
@@ -234,6 +279,7 @@ class Scoreboard {
       else if (idx === 1) row.classList.add("scoreboard-row-2nd");
       else if (idx === 2) row.classList.add("scoreboard-row-3rd");
       if (p.is_drawer) row.classList.add("scoreboard-row-drawer");
+      if (p.connected === false) row.classList.add("scoreboard-row-offline");
 
       const rank = document.createElement("div");
       rank.className = "scoreboard-col rank";